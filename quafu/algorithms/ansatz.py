@@ -146,12 +146,18 @@ class QuantumNeuralNetwork(Ansatz):
 
     # TODO(zhaoyilun): docs
     def __init__(
-        self, num_qubits: int, layers: List[Any], interface="torch", backend="sim"
+        self,
+        num_qubits: int,
+        layers: List[Any],
+        interface="torch",
+        backend="sim",
+        diff_method="parameter-shift",
     ):
         """"""
         # Get transformer according to specified interface
         self._transformer = InterfaceProvider.get(interface)
         self._layers = layers
+        self._diff_method = diff_method
 
         # FIXME(zhaoyilun): don't use this default value
         self._weights = np.empty((1, 1))
@@ -164,7 +170,9 @@ class QuantumNeuralNetwork(Ansatz):
         from .estimator import Estimator
 
         estimator = Estimator(self, backend=self._backend)
-        return self._transformer.execute(self, features, estimator=estimator)
+        return self._transformer.execute(
+            self, features, estimator=estimator, diff_method=self._diff_method
+        )
 
     def _build(self):
         """Essentially initialize weights using transformer"""
@@ -12,20 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Pre-build wrapper to calculate expectation value"""
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
+
+import numpy as np
+
 from ..circuits.quantum_circuit import QuantumCircuit
+from ..simulators import simulate
 from ..tasks.tasks import Task
 from .hamiltonian import Hamiltonian
-from ..simulators import simulate
+
+# default number of tasks submitted to a real machine at once by `Estimator.run_batch`
+MAX_SUBMISSIONS = 4
 
 
 def execute_circuit(circ: QuantumCircuit, observables: Hamiltonian):
     """Execute circuit on quafu simulator"""
-    sim_res = simulate(circ, hamiltonian= observables)
+    sim_res = simulate(circ, hamiltonian=observables)
     expectations = sim_res["pauli_expects"]
     return sum(expectations)
 
 
+def _sum_by_observable(expectations, sizes: List[int]) -> np.ndarray:
+    """Sum the expectations of the concatenated terms of the observables, `sizes` being their numbers of terms."""
+    ends = np.cumsum(sizes)
+    return np.array(
+        [np.sum(expectations[end - size : end]) for end, size in zip(ends, sizes)]
+    )
+
+
 class Estimator:
     """Estimate expectation for quantum circuits and observables"""
 
@@ -34,6 +50,7 @@ class Estimator:
         circ: QuantumCircuit,
         backend: str = "sim",
         task: Optional[Task] = None,
+        grouping: str = "dsatur",
         **task_options
     ) -> None:
         """
@@ -41,10 +58,13 @@ class Estimator:
             circ: quantum circuit.
             backend: run on simulator (sim) or real machines (ScQ-PXX)
             task: task instance for real machine execution (should be none if backend is "sim")
+            grouping: coloring strategy grouping the observables into measurement bases
+                on real machines, see `quafu.utils.grouping`.
             task_options: options to config a task instance
         """
         self._circ = circ
         self._backend = backend
+        self._grouping = grouping
         self._task = None
         if backend != "sim":
             if task is not None:
@@ -62,7 +82,7 @@ class Estimator:
         #   investigate the best implementation for calculating
         #   expectation on real devices.
         obs = observables.to_legacy_quafu_pauli_list()
-        _, obsexp = self._task.submit(self._circ, obs)
+        _, obsexp = self._task.submit(self._circ, obs, self._grouping)
         return sum(obsexp)
 
     def _run_simulation(self, observables: Hamiltonian):
@@ -74,6 +94,95 @@ class Estimator:
         # return expectation
         return execute_circuit(self._circ, observables)
 
+    def _run_real_machine_batch(
+        self,
+        observables: List[Hamiltonian],
+        params: np.ndarray,
+        max_workers: Optional[int],
+    ):
+        """Submit one task of all the observables for each parameter set, concurrently"""
+        if not isinstance(self._task, Task):
+            raise ValueError("task not set")
+        obslists = [obs.to_legacy_quafu_pauli_list() for obs in observables]
+        obslist = [ob for obs in obslists for ob in obs]
+
+        if max_workers is None:
+            max_workers = MAX_SUBMISSIONS
+
+        def submit(paras):
+            # the circuit is modified by `submit`, so each task has its own copy
+            circ = copy.deepcopy(self._circ)
+            if paras is not None:
+                circ.update_params(list(paras))
+            _, obsexp = self._task.submit(circ, obslist, self._grouping)
+            return _sum_by_observable(obsexp, [len(obs) for obs in obslists])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return np.array(list(executor.map(submit, params)))
+
+    def _run_simulation_batch(
+        self,
+        observables: List[Hamiltonian],
+        params: np.ndarray,
+        max_workers: Optional[int],
+    ):
+        """Simulate each parameter set once, all the observables are estimated on the same state"""
+        merged = Hamiltonian.concatenate(observables)
+        sizes = [len(obs) for obs in observables]
+
+        def estimate(circ, paras):
+            if paras is not None:
+                circ.update_params(list(paras))
+            sim_res = simulate(circ, hamiltonian=merged)
+            return _sum_by_observable(sim_res["pauli_expects"], sizes)
+
+        if max_workers is None or max_workers <= 1:
+            return np.array([estimate(self._circ, paras) for paras in params])
+        # the simulation releases the GIL, each thread updates its own copy of the circuit
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            res = executor.map(
+                lambda paras: estimate(copy.deepcopy(self._circ), paras), params
+            )
+            return np.array(list(res))
+
+    def run_batch(
+        self,
+        observables: List[Hamiltonian],
+        params: Optional[np.ndarray],
+        max_workers: Optional[int] = None,
+    ) -> np.ndarray:
+        """Calculate estimations of many observables for many parameter sets
+
+        On the simulator, the circuit is simulated once for each distinct parameter set,
+        in `max_workers` threads if given. On real machines, the tasks of the distinct
+        parameter sets are submitted concurrently, at most `max_workers` at once,
+        `MAX_SUBMISSIONS` if not given.
+
+        Args:
+            observables: observables to be estimated.
+            params: parameters of self.circ, with shape [batch_size, num_params].
+                If None, the current parameters are used, as a batch of size 1.
+            max_workers: maximal number of simulations or tasks running at once.
+                Defaults to sequential simulations, and `MAX_SUBMISSIONS` tasks.
+
+        Returns:
+            Expectation values with shape [batch_size, len(observables)]
+        """
+        if params is None:
+            points, inverse = [None], np.zeros(1, dtype=int)
+        else:
+            params = np.atleast_2d(np.asarray(params, dtype=float))
+            points, inverse = np.unique(params, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        if len(observables) == 0:
+            return np.zeros((len(inverse), 0))
+
+        if self._backend == "sim":
+            res = self._run_simulation_batch(observables, points, max_workers)
+        else:
+            res = self._run_real_machine_batch(observables, points, max_workers)
+        return res[inverse]
+
     def run(self, observables: Hamiltonian, params: List[float]):
         """Calculate estimation for given observables
 
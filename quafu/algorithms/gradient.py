@@ -1,10 +1,17 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from ..circuits.quantum_circuit import QuantumCircuit
 from ..simulators.simulator import SVSimulator
+from ..simulators.qfvm import applyop_statevec
 from ..elements import Parameter, ParameterExpression
 import numpy as np
 from ..exceptions import CircuitError
 from ..elements.matrices import XMatrix, YMatrix, ZMatrix
-from ..elements import QuantumGate, ControlledGate
+from ..elements import QuantumGate, ControlledGate, CircuitWrapper
+from ..elements.element_gates import RXGate, RYGate, RZGate
+
+# gates of the parameter shift rule, a shifted gate is the gate followed by the rotation of the shift
+_SHIFT_GATES = {"RX": RXGate, "RY": RYGate, "RZ": RZGate}
 
 def assemble_grads(para_grads, gate_grads):
     grads = []
@@ -19,25 +26,68 @@ def assemble_grads(para_grads, gate_grads):
     
     return grads
 
-def grad_para_shift(qc:QuantumCircuit, hamiltonian, backend=SVSimulator()):
+def _is_variable(op):
+    return len(op.paras) > 0 and isinstance(op.paras[0], (Parameter, ParameterExpression))
+
+
+def _shifted_expectation(backend, psi, shift, rest, hamiltonian):
+    """Expectation of the hamiltonian after applying the shift gate and the rest of the circuit to psi, in place."""
+    psi = applyop_statevec(shift, psi)
+    return sum(backend.run(rest, psi=psi, hamiltonian=hamiltonian)["pauli_expects"])
+
+
+def grad_para_shift(qc:QuantumCircuit, hamiltonian, backend=SVSimulator(), max_workers=1):
     """
     Parameter shift gradients. Each gate must have one parameter
+
+    The states along the circuit are computed once. A rotation
+    shifted by s is the rotation followed by the rotation of s on the same axis,
+    so both shifts of a gate resume from the state after it and only simulate
+    the rest of the circuit.
+
+    Args:
+        max_workers: Number of threads simulating the shifted circuits. The
+            simulation releases the GIL, but each thread holds its own copy of the state.
     """
     para_grads = qc._calc_parameter_grads()
-    gate_grads= [[] for _ in qc.gates]
+    gates = qc.gates
+    gate_grads= [[] for _ in gates]
+    for op in gates:
+        if _is_variable(op) and op.name not in _SHIFT_GATES:
+            raise CircuitError("It seems the circuit can not apply parameter-shift rule to calculate gradient.You may need compile the circuit first")
+
+    def shifted_circuits():
+        psi = np.zeros(2**qc.num, dtype=complex)
+        psi[0] = 1.
+        for i, op in enumerate(gates):
+            if isinstance(op, (QuantumGate, CircuitWrapper)):
+                psi = backend._apply_op(op, psi)
+            if _is_variable(op):
+                rest = QuantumCircuit(qc.num)
+                for g in gates[i+1:]:
+                    rest.add_ins(g)
+                for shift in (np.pi/2, -np.pi/2):
+                    yield i, (backend, np.copy(psi), _SHIFT_GATES[op.name](op.pos[0], shift), rest, hamiltonian)
+
+    inds, res = [], []
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # at most 2 * max_workers states are held at once
+            pending = deque()
+            for i, args in shifted_circuits():
+                inds.append(i)
+                pending.append(executor.submit(_shifted_expectation, *args))
+                if len(pending) >= 2 * max_workers:
+                    res.append(pending.popleft().result())
+            res.extend(f.result() for f in pending)
+    else:
+        for i, args in shifted_circuits():
+            inds.append(i)
+            res.append(_shifted_expectation(*args))
+
+    for k in range(0, len(res), 2):
+        gate_grads[inds[k]].append((res[k] - res[k+1]) / 2.)
 
-    for i, op in enumerate(qc.gates):
-        if len(op.paras) > 0:
-            if isinstance(op.paras[0], Parameter) or isinstance(op.paras[0],ParameterExpression):
-                if op.name not in ["RX", "RY", "RZ"]:
-                    raise CircuitError("It seems the circuit can not apply parameter-shift rule to calculate gradient.You may need compile the circuit first")
-                op.paras[0] = op.paras[0] + np.pi/2
-                res1 = sum(backend.run(qc, hamiltonian=hamiltonian)["pauli_expects"])
-                op.paras[0] = op.paras[0] - np.pi
-                res2 = sum(backend.run(qc, hamiltonian=hamiltonian)["pauli_expects"])
-                op.paras[0]._undo(2)
-                gate_grads[i].append((res1 - res2) / 2.)
-        
     return assemble_grads(para_grads, gate_grads)
 
 def grad_finit_diff(qc, hamiltonian, backend=SVSimulator()):
@@ -13,7 +13,7 @@
 # limitations under the License.
 """Quafu parameter shift"""
 
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
@@ -24,8 +24,14 @@ from ..hamiltonian import Hamiltonian
 class ParamShift:
     """Parameter shift rule to calculate gradients"""
 
-    def __init__(self, estimator: Estimator) -> None:
+    def __init__(self, estimator: Estimator, max_workers: Optional[int] = None) -> None:
+        """
+        Args:
+            estimator (Estimator): estimator to calculate expectation values
+            max_workers (Optional[int]): number of shifted circuits estimated at once
+        """
         self._est = estimator
+        self._max_workers = max_workers
 
     def __call__(self, obs: Hamiltonian, params: List[float]):
         """Calculate gradients using paramshift.
@@ -52,12 +58,26 @@ class ParamShift:
             obs (Hamiltonian): obs
             params (List[float]): params
         """
-        shifted_params_lists = self._gen_param_shift_vals(params)
+        return self.jacobian([obs], np.array([params]))[0, 0]
 
-        res = np.zeros(len(shifted_params_lists))
-        for i, shifted_params in enumerate(shifted_params_lists):
-            res[i] = self._est.run(obs, shifted_params)
+    def jacobian(self, obs_list: List[Hamiltonian], params: np.ndarray):
+        """Gradients of many observables for many parameter sets. The shifted
+        parameter sets of the whole batch are estimated together, each one being
+        simulated once for all the observables.
+
+        Args:
+            obs_list (List[Hamiltonian]): observables
+            params (np.ndarray): params, with shape [batch_size, num_params]
+
+        Returns:
+            Gradients with shape [batch_size, len(obs_list), num_params]
+        """
+        batch_size, num_params = params.shape
+        shifted_params = np.concatenate(
+            [self._gen_param_shift_vals(paras) for paras in params]
+        ).reshape(batch_size * 2 * num_params, num_params)
 
-        num_shift_params = len(res)
-        grads = (res[: num_shift_params // 2] - res[num_shift_params // 2 :]) / 2
-        return grads
+        res = self._est.run_batch(obs_list, shifted_params, self._max_workers)
+        res = res.reshape(batch_size, 2, num_params, len(obs_list))
+        grads = (res[:, 0] - res[:, 1]) / 2
+        return grads.transpose(0, 2, 1)
@@ -16,11 +16,20 @@ from typing import List, Optional
 
 import numpy as np
 from quafu.algorithms.estimator import Estimator
+from quafu.algorithms.gradient import grad_gate
 from quafu.algorithms.gradients import ParamShift
 from quafu.algorithms.hamiltonian import Hamiltonian
+from quafu.elements import Barrier, ControlledGate, Delay, QuantumGate
+from quafu.simulators.simulator import SVSimulator
 
 from quafu import QuantumCircuit
 
+# parameterized gates, or targets of controlled gates, differentiated by `grad_gate`
+_ADJOINT_GATES = ["RX", "RY", "RZ"]
+
+# instructions that do not change the state, skipped by the adjoint method
+_NO_OPS = (Barrier, Delay)
+
 
 def _generate_expval_z(num_qubits: int):
     obs_list = []
@@ -49,10 +58,9 @@ def run_circ(
     obs_list = _generate_expval_z(circ.num)
     if estimator is None:
         estimator = Estimator(circ, backend=backend)
-    if params is None:
-        params = [g.paras for g in circ.parameterized_gates]
-    output = [estimator.run(obs, params) for obs in obs_list]
-    return np.array(output)
+    # all the <Z_i> are read from the same state
+    output = estimator.run_batch(obs_list, None if params is None else [params])
+    return output[0]
 
 
 # TODO(zhaoyilun): support more gradient methods
@@ -67,19 +75,11 @@ def jacobian(
         circ (QuantumCircuit): circ
         params_input (np.ndarray): params_input, with shape [batch_size, num_params]
     """
-    batch_size, num_params = params_input.shape
     obs_list = _generate_expval_z(circ.num)
-    num_outputs = len(obs_list)
     if estimator is None:
         estimator = Estimator(circ)
     calc_grad = ParamShift(estimator)
-    output = np.zeros((batch_size, num_outputs, num_params))
-    for i in range(batch_size):
-        grad_list = [
-            np.array(calc_grad(obs, params_input[i, :].tolist())) for obs in obs_list
-        ]
-        output[i, :, :] = np.stack(grad_list)
-    return output
+    return calc_grad.jacobian(obs_list, np.asarray(params_input, dtype=float))
 
 
 def compute_vjp(jac: np.ndarray, dy: np.ndarray):
@@ -119,6 +119,94 @@ def compute_vjp(jac: np.ndarray, dy: np.ndarray):
     return vjp
 
 
+def _supports_adjoint(circ: QuantumCircuit):
+    """Whether the derivatives of the parameterized gates are known to the adjoint method"""
+    parameterized = set(id(g) for g in circ.parameterized_gates)
+    for op in circ.gates:
+        if isinstance(op, _NO_OPS):
+            continue
+        if not isinstance(op, QuantumGate):
+            return False
+        if id(op) in parameterized:
+            name = op._targ_name if isinstance(op, ControlledGate) else op.name
+            if name not in _ADJOINT_GATES or len(op.paras) != 1:
+                return False
+    return True
+
+
+def _z_diagonal(num_qubits: int, dy: np.ndarray):
+    """Diagonal of sum_i dy_i Z_i, qubit i being bit i of the basis index"""
+    basis = np.arange(2**num_qubits)
+    diag = np.zeros(2**num_qubits)
+    for i in range(num_qubits):
+        diag += dy[i] * (1 - 2 * ((basis >> i) & 1))
+    return diag
+
+
+def _adjoint_vjp(circ: QuantumCircuit, params: np.ndarray, dy: np.ndarray):
+    """Reverse mode gradients of sum_i dy_i <Z_i>, see `grad_adjoint`"""
+    backend = SVSimulator()
+    num_params = params.shape[1]
+    output = np.zeros((len(params), num_params))
+    for b, paras in enumerate(params):
+        circ.update_params(paras.tolist())
+        index = {id(g): j for j, g in enumerate(circ.parameterized_gates)}
+        phi = backend.run(circ)["statevector"]
+        lam = phi * _z_diagonal(circ.num, dy[b])
+        for op in circ.gates[::-1]:
+            if isinstance(op, _NO_OPS):
+                continue
+            dagger = op.dagger()
+            phi = backend._apply_op(dagger, phi)
+            if id(op) in index:
+                mu = backend._apply_op(grad_gate(op), np.copy(phi))
+                output[b, index[id(op)]] = np.real(2.0 * np.vdot(lam, mu))
+            lam = backend._apply_op(dagger, lam)
+    return output
+
+
+def vjp(
+    circ: QuantumCircuit,
+    params: np.ndarray,
+    dy: np.ndarray,
+    estimator: Optional[Estimator] = None,
+):
+    """Calculate vector-jacobian product without the jacobian
+
+    `dy` is folded into the observable sum_i dy_i Z_i of each batch element, whose
+    gradient is the vector-jacobian product. On the simulator it is computed by the
+    adjoint method, with one forward and one backward pass over the circuit, if the
+    parameterized gates are rotations. Otherwise the parameter shift rule is applied
+    to the folded observable, with 2 * num_params estimations per batch element.
+
+    Args:
+        circ (QuantumCircuit): circ
+        params (np.ndarray): params, with shape [batch_size, num_params]
+        dy (np.ndarray): dy, with shape [batch_size, num_outputs]
+
+    Returns:
+        vjp with shape [batch_size, num_params]
+    """
+    params = np.asarray(params, dtype=float)
+    dy = np.asarray(dy, dtype=float)
+    assert dy.shape == (params.shape[0], circ.num)
+
+    on_simulator = estimator is None or estimator._backend == "sim"
+    if on_simulator and _supports_adjoint(circ):
+        return _adjoint_vjp(circ, params, dy)
+
+    if estimator is None:
+        estimator = Estimator(circ)
+    calc_grad = ParamShift(estimator)
+    output = np.zeros(params.shape)
+    for b in range(len(params)):
+        obs = Hamiltonian.from_pauli_list(
+            [("Z%d" % i, dy[b, i]) for i in range(circ.num)]
+        )
+        output[b] = calc_grad.jacobian([obs], params[b : b + 1])[0, 0]
+    return output
+
+
 # class QNode:
 #     """Quantum node which essentially wraps the execution of a quantum circuit"""
 #
@@ -13,10 +13,13 @@
 # limitations under the License.
 
 from typing import Iterable
-import scipy.sparse as sp
-import numpy as np
 
+import numpy as np
+import scipy.sparse as sp
 from quafu.exceptions.quafu_error import QuafuError
+from quafu.utils.basis import popcount
+from quafu.utils.grouping import group_paulis, measurement_basis
+from scipy.sparse.linalg import LinearOperator
 
 IMat = sp.coo_matrix(np.array([[1.0, 0.0], [0.0, 1.0]], dtype=complex))
 
@@ -29,9 +32,83 @@ ZMat = sp.coo_matrix(np.array([[1.0, 0.0], [0.0, -1.0]], dtype=complex))
 PauliMats = {"X": XMat, "Y": YMat, "Z": ZMat, "I": IMat}
 
 
+# power of i of the product of two paulis, counted on each qubit by the pauli
+# of the left factor (X, Y, Z) and of the right one, with Y = iXZ
+def _product_phase(x1, z1, x2, z2):
+    y1, y2 = x1 & z1, x2 & z2
+    px1, px2 = x1 & ~z1, x2 & ~z2
+    pz1, pz2 = z1 & ~x1, z2 & ~x2
+    plus = popcount(px1 & y2) + popcount(y1 & pz2) + popcount(pz1 & px2)
+    minus = popcount(y1 & px2) + popcount(px1 & pz2) + popcount(pz1 & y2)
+    return np.sum(plus - minus, axis=-1) % 4
+
+
+_PHASES = np.array([1, 1j, -1, -1j])
+
+
+def _num_words(num_qubits):
+    return max(1, -(-num_qubits // 64))
+
+
+def _pack_qubits(bits):
+    """Pack rows of bits of the qubits into uint64 words, qubit q being bit q % 64 of word q // 64."""
+    terms, num = bits.shape
+    padded = np.zeros((terms, _num_words(num) * 64), dtype=np.uint8)
+    padded[:, :num] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8").astype(np.uint64)
+
+
+def _unpack_qubits(words, num_qubits):
+    bits = np.unpackbits(words.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+    return bits[:, :num_qubits].astype(bool)
+
+
+def _pad_words(words, num_words):
+    if words.shape[1] == num_words:
+        return words
+    padded = np.zeros((len(words), num_words), dtype=np.uint64)
+    padded[:, : words.shape[1]] = words
+    return padded
+
+
+def _walsh_hadamard(v):
+    """Unnormalized Walsh-Hadamard transform, out[k] = sum_z v[z] (-1)^popcount(k & z)."""
+    n = v.size
+    h = 1
+    while h < n:
+        v = v.reshape(-1, 2, h)
+        v = np.stack([v[:, 0] + v[:, 1], v[:, 0] - v[:, 1]], axis=1)
+        h *= 2
+    return v.reshape(-1)
+
+
+def _signs(masks, num_bits):
+    """(-1)^popcount(k & mask) for each mask and each k of num_bits bits, with shape [masks, 2**num_bits]"""
+    basis = np.arange(2**num_bits, dtype=np.uint64)
+    return 1.0 - 2.0 * (popcount(masks[:, None] & basis[None, :]) & 1)
+
+
+def _signed_sum(zs, coeffs, qnum):
+    """
+    sum_t coeffs_t (-1)^popcount(k & zs_t) for each basis state k. Many terms are
+    summed by a Walsh-Hadamard transform, few of them by splitting k into its high
+    and low bits, the signs being products of those of the halves, as a matrix product.
+    """
+    if len(zs) > 4 * qnum:
+        v = np.zeros(2**qnum, dtype=complex)
+        np.add.at(v, zs.astype(np.intp), coeffs)
+        return _walsh_hadamard(v)
+    lo = qnum // 2
+    signs_hi = _signs(zs >> np.uint64(lo), qnum - lo)
+    signs_lo = _signs(zs & np.uint64(2**lo - 1), lo)
+    real = (signs_hi * coeffs.real[:, None]).T @ signs_lo
+    imag = (signs_hi * coeffs.imag[:, None]).T @ signs_lo
+    return (real + 1j * imag).reshape(-1)
+
+
 class PauliOp:
     def __init__(self, paulis: str, coeff: complex = 1.0):
-        paulist = paulis.split(" ")
+        paulist = paulis.split()
         self.paulistr = ""
         self.pos = []
         for p in paulist:
@@ -48,51 +125,74 @@ class PauliOp:
             repstr += self.paulistr[i]
             repstr += str(self.pos[i])
             repstr += "*"
-        return repstr[:-1]
+        return repstr[:-1] if self.pos else repstr + "I"
 
     def __str__(self):
         return self.__repr__()
 
     def __mul__(self, obj):
-        pass
+        if isinstance(obj, PauliOp):
+            return (Hamiltonian([self]) * Hamiltonian([obj])).paulis[0]
+        return PauliOp(
+            " ".join(p + str(q) for p, q in zip(self.paulistr, self.pos)),
+            self.coeff * obj,
+        )
 
     def __rmul__(self, obj):
-        pass
+        return self.__mul__(obj)
 
     def commutator(self, obj):
-        pass
+        """The commutator [self, obj] as a Hamiltonian, empty if they commute."""
+        return Hamiltonian([self]).commutator(Hamiltonian([obj]))
 
     def get_matrix(self, qnum, big_endian=False):
-        if qnum - 1 < max(self.pos):
-            raise ValueError("The support of the paulis exceed the total qubit number")
-
-        pos = np.array(self.pos)
-        if not big_endian:
-            pos = qnum - 1 - pos
-        inds = np.argsort(pos)
-        iq = 0
-        ip = 0
-        mat = 1.0
-        while iq < qnum:
-            if ip < len(pos):
-                if iq == pos[inds[ip]]:
-                    opstr = self.paulistr[inds[ip]]
-                    mat = sp.kron(mat, PauliMats[opstr])
-                    iq += 1
-                    ip += 1
-                else:
-                    mat = sp.kron(mat, PauliMats["I"])
-                    iq += 1
-            else:
-                mat = sp.kron(mat, PauliMats["I"])
-                iq += 1
-
-        return self.coeff * mat
+        return Hamiltonian([self]).get_matrix(qnum, big_endian)
 
 
 class Hamiltonian:
+    """
+    Sum of pauli strings stored in the symplectic representation: the x and z
+    bits of the terms packed into uint64 words of shape (terms, words), qubit q
+    being bit q % 64 of word q // 64 and Y having both bits, and a vector of
+    coefficients. Arithmetic works on the arrays without building `PauliOp`.
+
+    Attributes:
+        x (np.ndarray): Packed x bits of the terms.
+        z (np.ndarray): Packed z bits of the terms.
+        coeffs (np.ndarray): Coefficients of the terms.
+        num_qubits (int): Number of qubits up to the largest one acted on.
+    """
+
     def __init__(self, paulis: list[PauliOp]):
-        self.paulis = paulis
+        num_qubits = max([max(p.pos) + 1 for p in paulis if p.pos], default=0)
+        x = np.zeros((len(paulis), num_qubits), dtype=bool)
+        z = np.zeros((len(paulis), num_qubits), dtype=bool)
+        for t, pauli in enumerate(paulis):
+            for p, q in zip(pauli.paulistr, pauli.pos):
+                x[t, q] = p in "XY"
+                z[t, q] = p in "YZ"
+        self._set(
+            _pack_qubits(x),
+            _pack_qubits(z),
+            np.array([p.coeff for p in paulis]),
+            num_qubits,
+        )
+        self._paulis = tuple(paulis)
+
+    def _set(self, x, z, coeffs, num_qubits):
+        self.x = x
+        self.z = z
+        if coeffs.dtype.kind not in "fc":
+            coeffs = coeffs.astype(float)
+        self.coeffs = coeffs
+        self.num_qubits = num_qubits
+        self._paulis = None
+
+    @classmethod
+    def _from_packed(cls, x, z, coeffs, num_qubits):
+        ham = cls.__new__(cls)
+        ham._set(x, z, np.asarray(coeffs), num_qubits)
+        return ham
 
     @staticmethod
     def from_pauli_list(pauli_list: Iterable[tuple[str, complex]]):
@@ -111,19 +211,262 @@ class Hamiltonian:
 
         return Hamiltonian(pauli_op_list)
 
+    @staticmethod
+    def from_symplectic(x: np.ndarray, z: np.ndarray, coeffs: np.ndarray = None):
+        """Generate Hamiltonian from the bits of the terms
+
+        Args:
+            x: x bits with shape [terms, qubits].
+            z: z bits with the same shape, a term acts by Y on the qubits where both are set.
+            coeffs: coefficients of the terms, all 1 by default.
+        """
+        x = np.asarray(x, dtype=bool)
+        z = np.asarray(z, dtype=bool)
+        if x.ndim != 2 or x.shape != z.shape:
+            raise QuafuError("x and z must have the same shape [terms, qubits].")
+        coeffs = np.ones(len(x)) if coeffs is None else np.asarray(coeffs)
+        if coeffs.shape != (len(x),):
+            raise QuafuError("There must be one coefficient for each term.")
+        return Hamiltonian._from_packed(
+            _pack_qubits(x), _pack_qubits(z), coeffs, x.shape[1]
+        )
+
+    @staticmethod
+    def concatenate(hamiltonians):
+        """The terms of all the hamiltonians in order, like terms are not simplified."""
+        num_qubits = max(h.num_qubits for h in hamiltonians)
+        num_words = _num_words(num_qubits)
+        return Hamiltonian._from_packed(
+            np.concatenate([_pad_words(h.x, num_words) for h in hamiltonians]),
+            np.concatenate([_pad_words(h.z, num_words) for h in hamiltonians]),
+            np.concatenate([h.coeffs for h in hamiltonians]),
+            num_qubits,
+        )
+
+    @property
+    def paulis(self):
+        """
+        The terms as a tuple of `PauliOp`, built on first access. It is a read-only
+        view of `x`, `z` and `coeffs`, changing its `PauliOp` does not change the
+        hamiltonian, build a new one instead.
+        """
+        if self._paulis is None:
+            x = _unpack_qubits(self.x, self.num_qubits)
+            z = _unpack_qubits(self.z, self.num_qubits)
+            names = np.array(["", "X", "Z", "Y"])[x + 2 * z]
+            paulis = []
+            for t in range(len(self.coeffs)):
+                qubits = np.flatnonzero(x[t] | z[t])
+                label = " ".join(names[t, q] + str(q) for q in qubits)
+                paulis.append(PauliOp(label, self.coeffs[t].item()))
+            self._paulis = tuple(paulis)
+        return self._paulis
+
+    def __len__(self):
+        return len(self.coeffs)
+
     def __repr__(self):
         return "+".join([str(pauli) for pauli in self.paulis])
 
     def __str__(self):
         return self.__repr__()
 
+    def simplify(self, atol: float = 1e-12):
+        """Sum the coefficients of like terms and drop the terms with coefficients below `atol`."""
+        keys = np.concatenate([self.x, self.z], axis=1)
+        keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        coeffs = np.zeros(len(keys), dtype=self.coeffs.dtype)
+        np.add.at(coeffs, inverse.reshape(-1), self.coeffs)
+        keep = np.abs(coeffs) > atol
+        num_words = self.x.shape[1]
+        return Hamiltonian._from_packed(
+            keys[keep, :num_words],
+            keys[keep, num_words:],
+            coeffs[keep],
+            self.num_qubits,
+        )
+
+    def _as_hamiltonian(self, obj):
+        return Hamiltonian([obj]) if isinstance(obj, PauliOp) else obj
+
+    def __add__(self, obj):
+        return Hamiltonian.concatenate([self, self._as_hamiltonian(obj)]).simplify()
+
+    def __neg__(self):
+        return self * -1
+
+    def __sub__(self, obj):
+        return self + (-self._as_hamiltonian(obj))
+
+    def __mul__(self, obj):
+        if not isinstance(obj, (Hamiltonian, PauliOp)):
+            return Hamiltonian._from_packed(
+                self.x, self.z, self.coeffs * obj, self.num_qubits
+            )
+        obj = self._as_hamiltonian(obj)
+        num_qubits = max(self.num_qubits, obj.num_qubits)
+        num_words = _num_words(num_qubits)
+        x1, z1 = (
+            _pad_words(self.x, num_words)[:, None],
+            _pad_words(self.z, num_words)[:, None],
+        )
+        x2, z2 = _pad_words(obj.x, num_words)[None], _pad_words(obj.z, num_words)[None]
+        phases = _product_phase(x1, z1, x2, z2).reshape(-1)
+        coeffs = np.outer(self.coeffs, obj.coeffs).reshape(-1)
+        if np.all(phases % 2 == 0):
+            coeffs = coeffs * (1 - phases)
+        else:
+            coeffs = coeffs * _PHASES[phases]
+        return Hamiltonian._from_packed(
+            (x1 ^ x2).reshape(-1, num_words),
+            (z1 ^ z2).reshape(-1, num_words),
+            coeffs,
+            num_qubits,
+        ).simplify()
+
+    def __rmul__(self, obj):
+        return self.__mul__(obj)
+
+    def commutes(self, obj):
+        """Whether each term commutes with each term of obj, with shape [len(self), len(obj)]."""
+        obj = self._as_hamiltonian(obj)
+        num_words = _num_words(max(self.num_qubits, obj.num_qubits))
+        x1, z1 = (
+            _pad_words(self.x, num_words)[:, None],
+            _pad_words(self.z, num_words)[:, None],
+        )
+        x2, z2 = _pad_words(obj.x, num_words)[None], _pad_words(obj.z, num_words)[None]
+        return np.sum(popcount((x1 & z2) ^ (z1 & x2)), axis=-1) % 2 == 0
+
+    def commutator(self, obj):
+        """The commutator [self, obj], empty if they commute."""
+        obj = self._as_hamiltonian(obj)
+        return self * obj - obj * self
+
+    def group_commuting(self, qubitwise: bool = True, strategy: str = "dsatur"):
+        """Partition the terms into groups measured together, see `quafu.utils.grouping`.
+
+        Args:
+            qubitwise: group qubit-wise commuting terms, otherwise commuting terms.
+            strategy: greedy coloring strategy of the graph of the conflicting terms.
+
+        Returns:
+            A Hamiltonian for each group.
+        """
+        groups = group_paulis(self.x, self.z, qubitwise, strategy)
+        return [
+            Hamiltonian._from_packed(
+                self.x[g], self.z[g], self.coeffs[g], self.num_qubits
+            )
+            for g in groups
+        ]
+
+    def _grouped_terms(self, qnum, big_endian):
+        """
+        The terms grouped by the basis states they flip, as (flip mask, z masks,
+        coefficients) with the phases of Y in the coefficients, so that a group maps
+        |k> to sum_t c_t (-1)^popcount(k & z_t) |k ^ flip>.
+        """
+        if self.num_qubits > qnum:
+            raise ValueError("The support of the paulis exceed the total qubit number")
+        x = _unpack_qubits(_pad_words(self.x, _num_words(qnum)), qnum)
+        z = _unpack_qubits(_pad_words(self.z, _num_words(qnum)), qnum)
+        if big_endian:
+            x, z = x[:, ::-1], z[:, ::-1]
+        xm, zm = _pack_qubits(x)[:, 0], _pack_qubits(z)[:, 0]
+        coeffs = self.coeffs * _PHASES[popcount(xm & zm) % 4]
+        flips, inverse = np.unique(xm, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        return [
+            (flip, zm[inverse == g], coeffs[inverse == g])
+            for g, flip in enumerate(flips)
+        ]
+
     def get_matrix(self, qnum, big_endian=False):
-        mat = 0.0
-        for pauli in self.paulis:
-            mat += pauli.get_matrix(qnum, big_endian)
+        """
+        Sparse matrix of the hamiltonian. Each group of terms flipping the same
+        qubits fills one permutation pattern, whose values are their signed sums.
 
+        Args:
+            qnum: number of qubits.
+            big_endian: whether qubit 0 is the most significant bit of the basis index.
+        """
+        dim = 2**qnum
+        basis = np.arange(dim, dtype=np.uint64)
+        groups = self._grouped_terms(qnum, big_endian)
+        # row k has one entry in each group, at column k ^ flip
+        indices = np.empty((len(groups), dim), dtype=np.intp)
+        data = np.empty((len(groups), dim), dtype=complex)
+        for g, (flip, zs, coeffs) in enumerate(groups):
+            indices[g] = basis ^ flip
+            data[g] = _signed_sum(zs, coeffs, qnum)[indices[g]]
+        indptr = np.arange(dim + 1) * len(groups)
+        mat = sp.csr_matrix(
+            (data.T.reshape(-1), indices.T.reshape(-1), indptr), shape=(dim, dim)
+        )
+        mat.eliminate_zeros()
+        mat.sort_indices()
         return mat
 
+    def get_linear_operator(self, qnum, big_endian=False, precompute=True):
+        """
+        The hamiltonian as a `scipy.sparse.linalg.LinearOperator` applied term group
+        by term group, without building its sparse matrix, e.g. for `eigsh`.
+
+        A group of terms flipping the same qubits is a diagonal, the signed sums of its
+        terms, followed by flipping the axes of those qubits. With `precompute`, the
+        diagonals are computed once and stored, len(groups) * 2**qnum complex values,
+        the data of `get_matrix` without its indices, and a matvec takes about twice
+        as long as one of the matrix. Otherwise only O(2**qnum) memory is used, but
+        every matvec recomputes the diagonals by a Walsh-Hadamard transform or a sign
+        table product, about 5 times slower again, so that it is only worth it when
+        neither the matrix nor the diagonals fit in memory. When they fit and many
+        matvecs are needed, e.g. by `eigsh`, `get_matrix` is the fastest.
+
+        Args:
+            qnum: number of qubits.
+            big_endian: whether qubit 0 is the most significant bit of the basis index.
+            precompute: whether to store the diagonals of the groups.
+        """
+        dim = 2**qnum
+        shape = (2,) * qnum
+        groups = self._grouped_terms(qnum, big_endian)
+        # bit i of the basis index is axis qnum - 1 - i of the state reshaped to `shape`
+        axes = [
+            tuple(qnum - 1 - i for i in range(qnum) if (int(flip) >> i) & 1)
+            for flip, _, _ in groups
+        ]
+        if precompute:
+            diagonals = [
+                _signed_sum(zs, coeffs, qnum).reshape(shape) for _, zs, coeffs in groups
+            ]
+
+        def terms():
+            for g, (_, zs, coeffs) in enumerate(groups):
+                diag = (
+                    diagonals[g]
+                    if precompute
+                    else _signed_sum(zs, coeffs, qnum).reshape(shape)
+                )
+                yield axes[g], diag
+
+        # a group maps |k> to diag[k] |k ^ flip>
+        def matvec(v):
+            v = np.asarray(v).reshape(shape)
+            out = np.zeros(shape, dtype=complex)
+            for flipped, diag in terms():
+                out += np.flip(diag * v, flipped)
+            return out.reshape(dim)
+
+        def rmatvec(v):
+            v = np.asarray(v).reshape(shape)
+            out = np.zeros(shape, dtype=complex)
+            for flipped, diag in terms():
+                out += diag.conj() * np.flip(v, flipped)
+            return out.reshape(dim)
+
+        return LinearOperator((dim, dim), matvec=matvec, rmatvec=rmatvec, dtype=complex)
+
     # TODO(zhaoyilun): delete this in the future
     def to_legacy_quafu_pauli_list(self):
         """Transform to legacy quafu pauli list format,
@@ -136,64 +479,50 @@ class Hamiltonian:
 
 
 def intersec(a, b):
-    inter = []
-    aind = []
-    bind = []
-    for i in range(len(a)):
-        for j in range(len(b)):
-            if a[i] == b[j]:
-                inter.append(a[i])
-                aind.append(i)
-                bind.append(j)
-
+    """
+    The common elements of a and b, with their indices in a and in b. Kept for
+    compatibility, the grouping is done by `quafu.utils.grouping`.
+    """
+    positions = {}
+    for j, item in enumerate(b):
+        positions.setdefault(item, []).append(j)
+    inter, aind, bind = [], [], []
+    for i, item in enumerate(a):
+        for j in positions.get(item, []):
+            inter.append(item)
+            aind.append(i)
+            bind.append(j)
     return inter, aind, bind
 
 
 def diff(a, b):
-    diff = []
-    aind = []
-    for i in range(len(a)):
-        if a[i] not in b:
-            diff.append(a[i])
-            aind.append(i)
-
-    return diff, aind
-
-
-def merge_paulis(obslist):
+    """
+    The elements of a not in b, with their indices in a. Kept for compatibility,
+    the grouping is done by `quafu.utils.grouping`.
+    """
+    others = set(b)
+    aind = [i for i, item in enumerate(a) if item not in others]
+    return [a[i] for i in aind], aind
+
+
+def merge_paulis(obslist, strategy: str = "dsatur"):
+    """
+    Group pauli operators into qubit-wise commuting groups.
+
+    Returns:
+        The `PauliOp` measuring each group, and the index of the group of each operator.
+    """
+    hamiltonian = Hamiltonian(obslist)
+    groups = group_paulis(
+        hamiltonian.x, hamiltonian.z, qubitwise=True, strategy=strategy
+    )
     measure_basis = []
-    targ_basis = []
-    for obs in obslist:
-        if len(measure_basis) == 0:
-            measure_basis.append(obs)
-            targ_basis.append(len(measure_basis) - 1)
-        else:
-            added = 0
-            for mi in range(len(measure_basis)):
-                measure_base = measure_basis[mi]
-                interset, intobsi, intbasei = intersec(obs.pos, measure_base.pos)
-                diffset, diffobsi = diff(obs.pos, measure_base.pos)
-                if not len(interset) == 0:
-                    if all(
-                        np.array(list(obs.paulistr))[intobsi]
-                        == np.array(list(measure_base.paulistr))[intbasei]
-                    ):
-                        measure_base.paulistr += "".join(
-                            np.array(list(obs.paulistr))[diffobsi]
-                        )
-                        measure_base.pos.extend(diffset)
-                        targ_basis.append(mi)
-                        added = 1
-                        break
-                else:
-                    measure_base.paulistr += obs.paulistr
-                    measure_base.pos.extend(obs.pos)
-                    targ_basis.append(mi)
-                    added = 1
-                    break
-
-            if not added:
-                measure_basis.append(obs)
-                targ_basis.append(len(measure_basis) - 1)
-
-    return measure_basis, targ_basis
+    for group in groups:
+        paulistr, pos = measurement_basis(hamiltonian.x, hamiltonian.z, group)
+        measure_basis.append(
+            PauliOp(" ".join(p + str(q) for p, q in zip(paulistr, pos)))
+        )
+    targ_basis = np.zeros(len(obslist), dtype=int)
+    for mi, group in enumerate(groups):
+        targ_basis[group] = mi
+    return measure_basis, targ_basis.tolist()
@@ -18,10 +18,12 @@ from typing import Optional
 import numpy as np
 import torch
 from quafu.algorithms.estimator import Estimator
+from quafu.simulators.torch import expval_z, simulate_torch
 
 from quafu import QuantumCircuit
 
-from ..gradients import compute_vjp, jacobian, run_circ
+from ..gradients import run_circ
+from ..gradients.vjp import vjp
 
 
 # TODO(zhaoyilun): impl a ABC for transformers
@@ -40,6 +42,7 @@ class TorchTransformer:
         grad_fn=None,
         method="internal",
         estimator: Optional[Estimator] = None,
+        diff_method: str = "parameter-shift",
     ):
         """execute.
 
@@ -47,6 +50,9 @@ class TorchTransformer:
             circ:
             run_fn:
             grad_fn:
+            diff_method: `"parameter-shift"` runs each circuit of the batch and computes
+                gradients by parameter shift, `"backprop"` simulates the whole batch with
+                the torch simulator and computes gradients by autograd.
         """
 
         kwargs = {
@@ -56,14 +62,21 @@ class TorchTransformer:
             "estimator": estimator,
         }
 
-        if method == "external":
-            return ExecuteCircuits.apply(parameters, kwargs)
         if method == "internal":
             from ..ansatz import QuantumNeuralNetwork
 
             assert isinstance(circ, QuantumNeuralNetwork)
-            return ExecuteCircuits.apply(circ.weights, kwargs)
-        raise NotImplementedError(f"Unsupported execution method: {method}")
+            parameters = circ.weights
+        elif method != "external":
+            raise NotImplementedError(f"Unsupported execution method: {method}")
+
+        if diff_method == "parameter-shift":
+            return ExecuteCircuits.apply(parameters, kwargs)
+        if diff_method == "backprop":
+            if estimator is not None and estimator._backend != "sim":
+                raise NotImplementedError("backprop is only supported by simulator")
+            return expval_z(simulate_torch(circ, parameters))
+        raise NotImplementedError(f"Unsupported differentiation method: {diff_method}")
 
 
 class ExecuteCircuits(torch.autograd.Function):
@@ -87,7 +100,8 @@ class ExecuteCircuits(torch.autograd.Function):
     @staticmethod
     def backward(ctx, grad_out):
         (parameters,) = ctx.saved_tensors
-        jac = jacobian(ctx.circ, parameters.numpy(), estimator=ctx.estimator)
-        vjp = compute_vjp(jac, grad_out.numpy())
-        vjp = torch.from_numpy(vjp)
-        return vjp, None
+        grad = vjp(
+            ctx.circ, parameters.numpy(), grad_out.numpy(), estimator=ctx.estimator
+        )
+        grad = torch.from_numpy(grad)
+        return grad, None
@@ -19,6 +19,7 @@ The ideal about structuring is roughly "Gate + Ctrl-Gate".
 
 """
 
+from functools import partial
 from typing import Dict, List
 from abc import ABC
 
@@ -31,10 +32,12 @@ from ..parameters import ParameterType
 class _C11Gate(ControlledGate, ABC):
     ct_dims = (1, 1, 2)
 
+def _call_with_paras(matfunc, paras:List[ParameterType]):
+    return matfunc(*paras)
+
 def wrap_para(matfunc):
-    def wrap_func(paras:List[ParameterType]):
-        return matfunc(*paras) 
-    return wrap_func
+    # a partial of module level functions, so that gates can be pickled
+    return partial(_call_with_paras, matfunc)
 
 # # # # # # # # # # # # # # # Paulis # # # # # # # # # # # # # # #
 @QuantumGate.register()
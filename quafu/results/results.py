@@ -1,10 +1,13 @@
-import copy
+import ast
+import json
+import re
 from collections import OrderedDict
 
 import matplotlib.pyplot as plt
 
-from ..algorithms.hamiltonian import Hamiltonian
+from ..algorithms.hamiltonian import Hamiltonian, diff, intersec  # noqa: F401
 from ..utils.basis import *
+from ..utils.grouping import group_paulis, measurement_basis, pack_paulis
 
 
 class Result(object):
@@ -13,6 +16,40 @@ class Result(object):
     pass
 
 
+# measurement of a single qubit to a single cbit, as written by the backend
+_MEASURE_RE = re.compile(
+    r"^\s*measure\s+\w+\s*\[\s*(\d+)\s*\]\s*->\s*\w+\s*\[\s*(\d+)\s*\]\s*;", re.M
+)
+
+
+def _parse_counts(res):
+    """Parse the counts returned by the backend, a JSON object or a python dict literal."""
+    if isinstance(res, dict):
+        return res
+    try:
+        return json.loads(res)
+    except ValueError:
+        return ast.literal_eval(res)
+
+
+def _scan_measures(openqasm: str):
+    """
+    Read the measurements of an OpenQASM program with a single quantum and classical
+    register without parsing it. Return None if it is not that simple.
+    """
+    if (
+        len(re.findall(r"\bqreg\b", openqasm)) != 1
+        or len(re.findall(r"\bcreg\b", openqasm)) != 1
+    ):
+        return None
+    matches = _MEASURE_RE.findall(openqasm)
+    if len(matches) != len(re.findall(r"\bmeasure\b", openqasm)) or re.search(
+        r"\b(if|gate)\b", openqasm
+    ):
+        return None
+    return {int(q): int(c) for q, c in matches}
+
+
 class ExecResult(Result):
     """
     Class that save the execute results returned from backend.
@@ -35,29 +72,70 @@ class ExecResult(Result):
         self.taskid = input_dict["task_id"]
         self.taskname = input_dict["task_name"]
         self.transpiled_openqasm = input_dict["openqasm"]
-        from ..circuits.quantum_circuit import QuantumCircuit
-
-        self.transpiled_circuit = QuantumCircuit(0)
-        self.transpiled_circuit.from_openqasm(self.transpiled_openqasm)
         self.measure_base = []
-
-        self.measures = self.transpiled_circuit.measures
         self.task_status = status_map[input_dict["status"]]
-        self.res = eval(input_dict["res"])
-        self.counts = OrderedDict(sorted(self.res.items(), key=lambda s: s[0]))
-
-        self.logicalq_res = {}
-        cbits = list(self.measures.values())
-        indexed_cbits = {bit: i for i, bit in enumerate(sorted(cbits))}
-        squeezed_cbits = [indexed_cbits[bit] for bit in cbits]
-        for key, values in self.counts.items():
-            newkey = "".join([key[i] for i in squeezed_cbits])
-            self.logicalq_res[newkey] = values
-
-        total_counts = sum(self.counts.values())
-        self.probabilities = {}
-        for bit_str in self.counts:
-            self.probabilities[bit_str] = self.counts[bit_str] / total_counts
+        self.res = _parse_counts(input_dict["res"])
+
+        # parsed on first access, retrieving many results is dominated by parsing otherwise
+        self._transpiled_circuit = None
+        self._measures = None
+        self._counts = None
+        self._logicalq_res = None
+        self._probabilities = None
+        self._logicalq_counts = None
+
+    @property
+    def transpiled_circuit(self):
+        """The transpiled circuit, parsed from `transpiled_openqasm` on first access."""
+        if self._transpiled_circuit is None:
+            from ..circuits.quantum_circuit import QuantumCircuit
+
+            self._transpiled_circuit = QuantumCircuit(0)
+            self._transpiled_circuit.from_openqasm(self.transpiled_openqasm)
+        return self._transpiled_circuit
+
+    @property
+    def measures(self):
+        if self._measures is None:
+            self._measures = _scan_measures(self.transpiled_openqasm)
+            if self._measures is None:
+                self._measures = self.transpiled_circuit.measures
+        return self._measures
+
+    @property
+    def counts(self):
+        if self._counts is None:
+            self._counts = OrderedDict(sorted(self.res.items(), key=lambda s: s[0]))
+        return self._counts
+
+    @property
+    def logicalq_res(self):
+        """Counts with the bits ordered by the measured qubits."""
+        if self._logicalq_res is None:
+            cbits = list(self.measures.values())
+            indexed_cbits = {bit: i for i, bit in enumerate(sorted(cbits))}
+            squeezed_cbits = [indexed_cbits[bit] for bit in cbits]
+            self._logicalq_res = {}
+            for key, values in self.counts.items():
+                newkey = "".join([key[i] for i in squeezed_cbits])
+                self._logicalq_res[newkey] = values
+        return self._logicalq_res
+
+    @property
+    def probabilities(self):
+        if self._probabilities is None:
+            total_counts = sum(self.counts.values())
+            self._probabilities = {}
+            for bit_str in self.counts:
+                self._probabilities[bit_str] = self.counts[bit_str] / total_counts
+        return self._probabilities
+
+    @property
+    def logicalq_counts(self):
+        """`logicalq_res` stored as arrays, see `CountsArray`."""
+        if self._logicalq_counts is None:
+            self._logicalq_counts = CountsArray.from_dict(self.logicalq_res)
+        return self._logicalq_counts
 
     def calculate_obs(self, pos):
         """
@@ -66,7 +144,16 @@ class ExecResult(Result):
         Args:
             pos (list[int]): Positions of observalbes.
         """
-        return measure_obs(pos, self.logicalq_res)
+        return measure_obs(pos, self.logicalq_counts)
+
+    def calculate_obs_list(self, obslist):
+        """
+        Calculate many observables Z at once
+
+        Args:
+            obslist (list[list[int]]): Positions of each observable.
+        """
+        return measure_obs_list(obslist, self.logicalq_counts)
 
     def plot_probabilities(self):
         """
@@ -84,21 +171,32 @@ class SimuResult(Result):
     def __init__(self, res_info: dict):
         """
         Args:
-            res_info: data from simulator
+            res_info: data from simulator. The counts are either a dict of bitstrings or of
+                integer outcomes, or a tuple of the arrays of outcomes and of their counts.
+                Integer outcomes are kept as arrays and only formatted as bitstrings when
+                `counts` is accessed.
         """
         self._meta_data = res_info
-        counts = res_info["counts"]
-        if counts:
-            if isinstance(list(counts.keys())[0], int):
-                cbits_num = len(res_info["measures"])
-                newcounts = {}
-                for key, value in counts.items():
-                    bitstr = bin(key)[2:].zfill(cbits_num)
-                    newcounts[bitstr] = value
-                self._meta_data["counts"] = newcounts
-
+        self._set_counts(res_info["counts"])
         self._probabilities = []
 
+    def _set_counts(self, counts):
+        self._outcomes = None
+        self._outcome_counts = None
+        if isinstance(counts, tuple):
+            self._outcomes = np.asarray(counts[0], dtype=np.uint64)
+            self._outcome_counts = np.asarray(counts[1])
+            counts = None
+        elif counts and isinstance(next(iter(counts)), (int, np.integer)):
+            self._outcomes = np.fromiter(
+                counts.keys(), dtype=np.uint64, count=len(counts)
+            )
+            self._outcome_counts = np.fromiter(
+                counts.values(), dtype=np.int64, count=len(counts)
+            )
+            counts = None
+        self._meta_data["counts"] = counts
+
     def __getitem__(self, key: str):
         """
         Get meta_data of simulate results.
@@ -106,9 +204,69 @@ class SimuResult(Result):
             `"statevector"`: full state vector
             `"counts"`: sampled  bitstring counts
             `"pauli_expects"`: pauli expectations of input paulistrings
+            `"simulator"`: name of the simulator
+            `"cost_estimates"`: estimated costs of the simulators if chosen automatically
         """
+        if key == "counts" and self._meta_data["counts"] is None:
+            width = len(self._meta_data["measures"])
+            self._meta_data["counts"] = {
+                format(int(outcome), "0%db" % width): int(count)
+                for outcome, count in zip(self._outcomes, self._outcome_counts)
+            }
         return self._meta_data[key]
 
+    def __setitem__(self, key: str, value):
+        if key == "counts":
+            self._set_counts(value)
+        else:
+            self._meta_data[key] = value
+
+    def get_counts_array(self):
+        """
+        The counts as arrays of the integer outcomes and of their counts, the smallest
+        measured cbit being the most significant bit of an outcome.
+        """
+        if self._outcomes is None:
+            counts = self._meta_data["counts"]
+            self._outcomes = np.array([int(key, 2) for key in counts], dtype=np.uint64)
+            self._outcome_counts = np.array(list(counts.values()))
+        return self._outcomes, self._outcome_counts
+
+    def _counts_array(self) -> CountsArray:
+        outcomes, counts = self.get_counts_array()
+        width = len(self._meta_data["measures"])
+        if width > 64:
+            raise ValueError(
+                "Counts of more than 64 measured bits are only available as bitstrings"
+            )
+        words = (
+            (outcomes << np.uint64(64 - width))
+            if width > 0
+            else np.zeros_like(outcomes)
+        )
+        return CountsArray(words[:, None], counts.astype(float), width)
+
+    def calc_marginal_probabilities(self, pos):
+        """
+        Probabilities of the bits at positions `pos` of the sampled bitstrings, pos[0]
+        being the most significant bit.
+        """
+        return self._counts_array().reduce_probs(pos)
+
+    def calc_counts_probabilities(self):
+        """Probabilities of the sampled outcomes, as the arrays of outcomes and probabilities."""
+        outcomes, counts = self.get_counts_array()
+        return outcomes, counts / np.sum(counts)
+
+    def calc_expectations(self, obslist):
+        """
+        Expectations of products of Z from the sampled counts.
+
+        Args:
+            obslist (list[list[int]]): Positions in the bitstrings of each observable.
+        """
+        return self._counts_array().expectations(obslist)
+
     def get_statevector(self):
         try:
             return self["statevector"]
@@ -125,21 +283,23 @@ class SimuResult(Result):
     def counts(self):
         return self["counts"]
 
+    def _measured_qubits(self):
+        """Measured qubits ordered by their cbits, or all the qubits if nothing is measured."""
+        measures = self["measures"]
+        if not measures:
+            return list(range(self["qbitnum"]))
+        return sorted(measures, key=lambda q: measures[q])
+
     def calc_probabilities(self):
-        psi = self.get_statevector()
-        num = self["qbitnum"]
-        measures = list(self["measures"].keys())
-        values_tmp = list(self["measures"].values())
-        values = np.argsort(values_tmp)
-
-        from ..simulators.default_simulator import permutebits, ptrace
-
-        psi = permutebits(psi, range(num)[::-1])
-        if measures:
-            self._probabilities = ptrace(psi, measures)
-            self._probabilities = permutebits(self._probabilities, values)
-        else:
-            self._probabilities = np.abs(psi) ** 2
+        """
+        Probabilities of the measured qubits, the qubit of the smallest cbit being the
+        most significant bit, computed natively without permuting the state vector.
+        """
+        from ..simulators.qfvm import marginal_probabilities
+
+        self._probabilities = marginal_probabilities(
+            self.get_statevector(), self._measured_qubits()
+        )
 
     def plot_probabilities(
         self,
@@ -154,10 +314,10 @@ class SimuResult(Result):
         import matplotlib.pyplot as plt
 
         if from_counts:
-            counts = self._meta_data["counts"]
+            counts = self.counts
             total_counts = sum(counts.values())
             probabilities = {}
-            for key in self._meta_data["counts"]:
+            for key in counts:
                 probabilities[key] = counts[key] / total_counts
 
             bitstrs = list(probabilities.keys())
@@ -195,81 +355,28 @@ class SimuResult(Result):
             raise ValueError("No data for ploting")
 
     def calc_density_matrix(self):
-        psi = self.get_statevector()
-        num = self["qbitnum"]
-        measures = list(self["measures"].keys())
-        values_tmp = list(self["measures"].values())
-        values = np.argsort(values_tmp)
-        if len(measures) == 0:
-            measures = list(range(num))
-            values = list(range(num))
-        from ..simulators.default_simulator import permutebits, ptrace
-
-        psi = permutebits(psi, range(num)[::-1])
-        rho = ptrace(psi, measures, diag=False)
-        rho = permutebits(rho, values)
-        return rho
-
-
-# TODO:These should merge to paulis
-def intersec(a, b):
-    inter = []
-    aind = []
-    bind = []
-    for i in range(len(a)):
-        for j in range(len(b)):
-            if a[i] == b[j]:
-                inter.append(a[i])
-                aind.append(i)
-                bind.append(j)
-
-    return inter, aind, bind
-
-
-def diff(a, b):
-    diff = []
-    aind = []
-    for i in range(len(a)):
-        if a[i] not in b:
-            diff.append(a[i])
-            aind.append(i)
-
-    return diff, aind
-
-
-def merge_measure(obslist):
-    obslist = copy.deepcopy(obslist)
-    measure_basis = []
-    targ_basis = []
-    for obs in obslist:
-        if len(measure_basis) == 0:
-            measure_basis.append(obs)
-            targ_basis.append(len(measure_basis) - 1)
-        else:
-            added = 0
-            for mi in range(len(measure_basis)):
-                measure_base = measure_basis[mi]
-                interset, intobsi, intbasei = intersec(obs[1], measure_base[1])
-                diffset, diffobsi = diff(obs[1], measure_base[1])
-                if not len(interset) == 0:
-                    if all(
-                        np.array(list(obs[0]))[intobsi]
-                        == np.array(list(measure_base[0]))[intbasei]
-                    ):
-                        measure_base[0] += "".join(np.array(list(obs[0]))[diffobsi])
-                        measure_base[1].extend(diffset)
-                        targ_basis.append(mi)
-                        added = 1
-                        break
-                else:
-                    measure_base[0] += obs[0]
-                    measure_base[1].extend(obs[1])
-                    targ_basis.append(mi)
-                    added = 1
-                    break
-
-            if not added:
-                measure_basis.append(obs)
-                targ_basis.append(len(measure_basis) - 1)
-
-    return measure_basis, targ_basis
+        """
+        Reduced density matrix of the measured qubits ordered by cbits, or of all the
+        qubits with qubit 0 the most significant if nothing is measured.
+        """
+        from ..simulators.qfvm import reduced_density_matrix
+
+        return reduced_density_matrix(self.get_statevector(), self._measured_qubits())
+
+
+def merge_measure(obslist, strategy: str = "dsatur"):
+    """
+    Group observables given as pauli strings and their positions into measurement
+    bases, by coloring the graph of the observables that act by different paulis on
+    a qubit.
+
+    Returns:
+        The measurement bases, and the index of the basis of each observable.
+    """
+    x, z = pack_paulis(obslist)
+    groups = group_paulis(x, z, qubitwise=True, strategy=strategy)
+    measure_basis = [measurement_basis(x, z, group) for group in groups]
+    targ_basis = np.zeros(len(obslist), dtype=int)
+    for mi, group in enumerate(groups):
+        targ_basis[group] = mi
+    return measure_basis, targ_basis.tolist()
@@ -3,6 +3,7 @@ from typing import Union
 
 import numpy as np
 from quafu import QuantumCircuit
+from ..exceptions import QuafuError
 from ..results.results import SimuResult
 
 def simulate(
@@ -13,6 +14,8 @@ def simulate(
     hamiltonian = None,
     use_gpu: bool = False,
     use_custatevec: bool = False,
+    noise_model = None,
+    readout_error = None,
 ) -> SimuResult:
     """Simulate quantum circuit
     Args:
@@ -20,12 +23,19 @@ def simulate(
         psi : Input state vector
         simulator:
             `"statevector"`: The high performance C++ circuit simulator with optional GPU support.
-            `"clifford"`: The high performance C++ cifford circuit simulator.
-            `"noisy statevetor"`: Nosiy circuit simulator implemented with statevector simulator.
-
+            `"clifford"`: The high performance C++ cifford circuit simulator, Pauli channels are supported.
+            `"noisy statevetor"`: Nosiy circuit simulator implemented with statevector simulator,
+                also accepted as `"noisy statevector"`.
+            `"hybrid"`: Run the clifford prefix of the circuit with the clifford simulator, and continue
+                from its state vector with the statevector simulator.
+            `"auto"`: Choose the simulator with the least estimated cost, see `cost_model.estimate_costs`.
+                The estimates are saved as `"cost_estimates"` of the result.
         shots: The shots of simulator executions.
         use_gpu: Use the GPU version of `statevector` simulator.
         use_custatevec: Use cuStateVec-based `statevector` simulator. The argument `use_gpu` must also be True.
+        noise_model: A `NoiseModel` applied by the `noisy statevetor` and `clifford` simulators,
+            the circuit itself is not changed.
+        readout_error: A `ReadoutErrorModel` applied to the sampled counts.
 
     Returns:
         SimuResult object that contain the results."""
@@ -36,18 +46,39 @@ def simulate(
         qc = QuantumCircuit(0)
         qc.from_openqasm(qasm)
 
+    if simulator == "noisy statevector":
+        simulator = "noisy statevetor"
+
+    costs = None
+    if simulator == "auto":
+        from .cost_model import choose_simulator
+        noisy_qc = noise_model.apply(qc) if noise_model else qc
+        simulator, costs = choose_simulator(noisy_qc, shots, psi, use_gpu)
+
+    if noise_model and simulator in ("statevector", "hybrid"):
+        raise QuafuError("Can not apply noise model with %s simulator, please use the noisy version." % simulator)
+
     # simulate
     if simulator == "statevector":
         from .simulator import SVSimulator
         backend = SVSimulator(use_gpu, use_custatevec)
-        return backend.run(qc, psi, shots, hamiltonian)
+        result = backend.run(qc, psi, shots, hamiltonian)
     elif simulator == "noisy statevetor":
         from .simulator import NoiseSVSimulator
         backend = NoiseSVSimulator(use_gpu, use_custatevec)
-        return backend.run(qc, psi, shots, hamiltonian)
+        result = backend.run(qc, psi, shots, hamiltonian, noise_model)
+    elif simulator == "hybrid":
+        from .simulator import HybridSimulator
+        backend = HybridSimulator(use_gpu, use_custatevec)
+        result = backend.run(qc, psi, shots, hamiltonian)
     elif simulator == "clifford":
         from .simulator import CliffordSimulator
-        return CliffordSimulator().run(qc, shots)
-
+        result = CliffordSimulator().run(qc, shots, hamiltonian, noise_model)
     else:
         raise ValueError("invalid simulator name")
+
+    if costs is not None:
+        result["cost_estimates"] = costs
+    if readout_error:
+        result["counts"] = readout_error.apply(result["counts"], result["measures"])
+    return result
@@ -0,0 +1,241 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Clifford circuit analysis"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..circuits import QuantumCircuit
+from ..elements import (
+    Barrier,
+    Cif,
+    CircuitWrapper,
+    Delay,
+    KrausChannel,
+    Measure,
+    QuantumGate,
+    Reset,
+)
+from ..elements.element_gates import (
+    CXGate,
+    HGate,
+    SdgGate,
+    SGate,
+    SwapGate,
+    XGate,
+    YGate,
+    ZGate,
+)
+from ..elements.noise import BitFlip, Dephasing, Depolarizing
+from ..exceptions import QuafuError
+
+# gates natively supported by the clifford simulator
+_PRIMITIVES = {
+    "x": XGate,
+    "y": YGate,
+    "z": ZGate,
+    "h": HGate,
+    "s": SGate,
+    "sdg": SdgGate,
+    "cx": CXGate,
+    "swap": SwapGate,
+}
+
+# rz(k * pi / 2) up to global phase
+_RZ_QUARTERS = [[], ["s"], ["z"], ["sdg"]]
+
+ANGLE_ATOL = 1e-9
+
+
+def clifford_angle(theta: float) -> Optional[int]:
+    """Return k in 0..3 if theta is k * pi / 2 modulo 2 * pi, otherwise None."""
+    k = np.round(theta / (np.pi / 2))
+    if abs(theta - k * np.pi / 2) > ANGLE_ATOL:
+        return None
+    return int(k) % 4
+
+
+def _rz(q, k):
+    return [(name, [q]) for name in _RZ_QUARTERS[k]]
+
+
+def _rx(q, k):
+    return [("h", [q])] + _rz(q, k) + [("h", [q])]
+
+
+def _ry(q, k):
+    return [("sdg", [q])] + _rx(q, k) + [("s", [q])]
+
+
+def _cz(a, b):
+    return [("h", [b]), ("cx", [a, b]), ("h", [b])]
+
+
+def _rzz(a, b, k):
+    return [("cx", [a, b])] + _rz(b, k) + [("cx", [a, b])]
+
+
+def _rxx(a, b, k):
+    return [("h", [a]), ("h", [b])] + _rzz(a, b, k) + [("h", [a]), ("h", [b])]
+
+
+def _ryy(a, b, k):
+    return [("sdg", [a]), ("sdg", [b])] + _rxx(a, b, k) + [("s", [a]), ("s", [b])]
+
+
+def _decompose(gate: QuantumGate) -> Optional[List]:
+    """
+    Decompose a gate into the primitive clifford gates, as a list of (name, pos)
+    in circuit order, equal to the gate up to global phase. Return None if the gate
+    is not recognized as clifford.
+    """
+    name = gate.name.lower()
+    pos = list(gate.pos)
+    if name in _PRIMITIVES:
+        return [(name, pos)]
+    if name == "cnot":
+        return [("cx", pos)]
+    if name == "id":
+        return []
+
+    q = pos[0]
+    # the matrices of sx and sxdg are rx(-pi/2) and rx(pi/2)
+    if name == "sx":
+        return [("h", [q]), ("sdg", [q]), ("h", [q])]
+    if name == "sxdg":
+        return [("h", [q]), ("s", [q]), ("h", [q])]
+    if name == "sy":
+        return [("z", [q]), ("h", [q])]
+    if name == "sydg":
+        return [("h", [q]), ("z", [q])]
+    if name == "cz":
+        return _cz(*pos)
+    if name == "cy":
+        return [("sdg", [pos[1]]), ("cx", pos), ("s", [pos[1]])]
+    if name == "iswap":
+        return [("s", [pos[0]]), ("s", [pos[1]])] + _cz(*pos) + [("swap", pos)]
+
+    ks = [clifford_angle(theta) for theta in gate._paras]
+    if not ks or None in ks:
+        return None
+    if name in ("rz", "p"):
+        return _rz(q, ks[0])
+    if name == "rx":
+        return _rx(q, ks[0])
+    if name == "ry":
+        return _ry(q, ks[0])
+    if name == "u3":
+        theta, phi, lam = ks
+        return _rz(q, lam) + _ry(q, theta) + _rz(q, phi)
+    if name == "rzz":
+        return _rzz(*pos, ks[0])
+    if name == "rxx":
+        return _rxx(*pos, ks[0])
+    if name == "ryy":
+        return _ryy(*pos, ks[0])
+    if name == "cp" and ks[0] % 2 == 0:
+        return [] if ks[0] == 0 else _cz(*pos)
+    return None
+
+
+def _canonicalize(instructions, new_qc: QuantumCircuit):
+    """Append the canonical form of instructions to new_qc, return False if any of them is not clifford."""
+    for op in instructions:
+        if isinstance(op, CircuitWrapper):
+            if not _canonicalize(op.circuit.instructions, new_qc):
+                return False
+        elif isinstance(op, QuantumGate):
+            gates = _decompose(op)
+            if gates is None:
+                return False
+            for name, pos in gates:
+                new_qc.add_ins(_PRIMITIVES[name](*pos))
+        elif isinstance(op, KrausChannel):
+            if not isinstance(op, (BitFlip, Dephasing, Depolarizing)):
+                return False
+            new_qc.add_ins(op)
+        elif isinstance(op, Measure):
+            new_qc._measures.append(op)
+            new_qc.add_ins(op)
+        elif isinstance(op, Cif):
+            body = QuantumCircuit(new_qc.num, new_qc.cbits_num)
+            if not _canonicalize(op.instructions, body):
+                return False
+            new_qc.add_ins(Cif(op.cbits, op.condition, body.instructions))
+            new_qc.executable_on_backend = False
+        elif isinstance(op, Reset):
+            new_qc.add_ins(op)
+        elif not isinstance(op, (Barrier, Delay)):
+            return False
+    return True
+
+
+def canonicalize_clifford(qc: QuantumCircuit) -> Optional[QuantumCircuit]:
+    """
+    Rewrite a circuit with the gates natively supported by the clifford simulator.
+    Rotations and phase gates at multiples of pi/2 are rewritten as S, Sdg and Z,
+    other clifford gates are decomposed up to global phase. Pauli channels,
+    measurements, resets and classical control are kept.
+
+    Returns:
+        The canonical circuit, or None if the circuit is not clifford.
+    """
+    new_qc = QuantumCircuit(qc.num, qc.cbits_num)
+    if not _canonicalize(qc.instructions, new_qc):
+        return None
+    return new_qc
+
+
+def is_clifford(qc: QuantumCircuit) -> bool:
+    """Whether the circuit can be simulated by the clifford simulator."""
+    return canonicalize_clifford(qc) is not None
+
+
+def to_clifford_circuit(qc: QuantumCircuit) -> QuantumCircuit:
+    """Same as `canonicalize_clifford`, but raise QuafuError if the circuit is not clifford."""
+    new_qc = QuantumCircuit(qc.num, qc.cbits_num)
+    for op in qc.instructions:
+        if not _canonicalize([op], new_qc):
+            raise QuafuError("%s is not supported by the clifford simulator" % op.name)
+    return new_qc
+
+
+def split_clifford_prefix(qc: QuantumCircuit) -> Tuple[QuantumCircuit, QuantumCircuit]:
+    """
+    Split a circuit into its maximal unitary clifford prefix, rewritten with the
+    gates of the clifford simulator, and the rest of the circuit. The prefix stops
+    at the first non-clifford gate, measurement, reset, noise or classical control.
+    """
+    prefix = QuantumCircuit(qc.num, qc.cbits_num)
+    rest = QuantumCircuit(qc.num, qc.cbits_num)
+    instructions = qc.instructions
+    start = 0
+    for op in instructions:
+        if isinstance(op, QuantumGate):
+            canonical = QuantumCircuit(qc.num, qc.cbits_num)
+            if not _canonicalize([op], canonical):
+                break
+            for gate in canonical.instructions:
+                prefix.add_ins(gate)
+        elif not isinstance(op, (Barrier, Delay)):
+            break
+        start += 1
+
+    for op in instructions[start:]:
+        if isinstance(op, Measure):
+            rest._measures.append(op)
+        rest.add_ins(op)
+    rest.executable_on_backend = qc.executable_on_backend
+    return prefix, rest
@@ -0,0 +1,132 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Cost model for choosing a simulator"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+from ..circuits import QuantumCircuit
+from ..elements import Barrier, Cif, Delay, KrausChannel, Measure
+from ..exceptions import QuafuError
+from .clifford import canonicalize_clifford, split_clifford_prefix
+
+# largest number of qubits of the dense state vector simulators
+MAX_STATEVECTOR_QUBITS = 30
+
+# number of shots of a pauli frame batch of the clifford simulator
+FRAME_BATCH_SIZE = 64
+
+
+def _is_dynamic(qc: QuantumCircuit) -> bool:
+    """Whether any operation follows a measurement, then each shot is simulated separately."""
+    measured = False
+    for op in qc.instructions:
+        if isinstance(op, Measure):
+            measured = True
+        elif measured and not isinstance(op, (Barrier, Delay)):
+            return True
+    return False
+
+
+def estimate_costs(
+    qc: QuantumCircuit,
+    shots: int = 100,
+    psi: np.ndarray = np.array([]),
+    use_gpu: bool = False,
+) -> Dict[str, float]:
+    """
+    Estimate the cost of simulating a circuit with each simulator, as the number of
+    elementary updates of amplitudes or tableau rows. A simulator that can not run
+    the circuit costs inf.
+
+    - `"statevector"`: one sweep of 2^n amplitudes per operation, repeated for each
+      shot if any operation follows a measurement, and one update per sample.
+    - `"noisy statevetor"`: the same sweeps, repeated for each shot.
+    - `"clifford"`: n rows per gate and n^2 / 64 per measurement, repeated for each
+      batch of 64 shots with noise or mid-circuit measurements, or for each shot with
+      classical control. One update per measured bit of each sample. The clifford
+      simulator saves no state vector, so it is only chosen to sample measurements.
+    - `"hybrid"`: the clifford prefix, 2^n for its state vector, then the same as
+      `"statevector"` for the rest of the circuit.
+
+    Only the statevector simulators accept an input state or run on GPU.
+    """
+    n = qc.num
+    sampled = shots > 0
+    shots = max(shots, 1)
+    noisy = any(isinstance(op, KrausChannel) for op in qc.instructions)
+    dynamic = _is_dynamic(qc)
+    num_ops = len(qc.instructions)
+    dense = 2.0**n
+
+    costs = {
+        "statevector": np.inf,
+        "noisy statevetor": np.inf,
+        "clifford": np.inf,
+        "hybrid": np.inf,
+    }
+    if n <= MAX_STATEVECTOR_QUBITS:
+        if noisy:
+            costs["noisy statevetor"] = shots * num_ops * dense
+        else:
+            costs["statevector"] = (shots if dynamic else 1) * num_ops * dense + shots
+    if len(psi) > 0 or use_gpu:
+        return costs
+
+    clifford_qc = canonicalize_clifford(qc)
+    num_measures = 0
+    if clifford_qc is not None:
+        num_measures = sum(
+            len(op.qbits) for op in clifford_qc.instructions if isinstance(op, Measure)
+        )
+    if clifford_qc is not None and sampled and num_measures > 0:
+        cost = len(clifford_qc.instructions) * n + num_measures * n * n / 64
+        if any(isinstance(op, Cif) for op in clifford_qc.instructions):
+            cost *= shots
+        elif noisy or dynamic:
+            cost *= np.ceil(shots / FRAME_BATCH_SIZE)
+        costs["clifford"] = cost + shots * num_measures
+    elif not noisy and n <= MAX_STATEVECTOR_QUBITS:
+        prefix, rest = split_clifford_prefix(qc)
+        if prefix.instructions:
+            costs["hybrid"] = (
+                len(prefix.instructions) * n
+                + n * dense
+                + (shots if dynamic else 1) * len(rest.instructions) * dense
+                + shots
+            )
+    return costs
+
+
+def choose_simulator(
+    qc: QuantumCircuit,
+    shots: int = 100,
+    psi: np.ndarray = np.array([]),
+    use_gpu: bool = False,
+) -> Tuple[str, Dict[str, float]]:
+    """
+    Choose the simulator with the least estimated cost.
+
+    Returns:
+        The name of the simulator and the estimated costs of all the simulators.
+    """
+    costs = estimate_costs(qc, shots, psi, use_gpu)
+    simulator = min(costs, key=costs.get)
+    if np.isinf(costs[simulator]):
+        raise QuafuError(
+            "No simulator can run the circuit of %d qubits, the statevector simulators support at most %d qubits"
+            % (qc.num, MAX_STATEVECTOR_QUBITS)
+        )
+    return simulator, costs
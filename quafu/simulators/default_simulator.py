@@ -1,122 +1,145 @@
-# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
-#
-# Licensed under the Apache License, Version 2.0 (the "License");
-# you may not use this file except in compliance with the License.
-# You may obtain a copy of the License at
-#
-#    http://www.apache.org/licenses/LICENSE-2.0
-#
-# Unless required by applicable law or agreed to in writing, software
-# distributed under the License is distributed on an "AS IS" BASIS,
-# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
-# See the License for the specific language governing permissions and
-# limitations under the License.
-"""default circuit simulator for state vector"""
-
-import copy
-from typing import Iterable, List, Union
-
-import numpy as np
-from quafu.circuits.quantum_circuit import QuantumCircuit
-from scipy.sparse import coo_matrix, eye, kron
-from sparse import COO, SparseArray
-
-from ..elements import (
-    Barrier,
-    Delay,
-    QuantumGate,
-    XYResonance,
-)
-from ..results.results import SimuResult
-
-
-def global_op(gate: QuantumGate, global_qubits: List) -> coo_matrix:
-    """Local operators to global operators"""
-    num = len(global_qubits)
-    if len(gate.pos) == 1:
-        local_mat = coo_matrix(gate.matrix)
-        pos = global_qubits.index(gate.pos)
-        local_mat = kron(kron(eye(2**pos), local_mat), eye(2 ** (num - pos - 1)))
-        return local_mat
-
-    else:
-        local_mat = coo_matrix(gate.matrix)
-        pos = [global_qubits.index(p) for p in gate.pos]
-        num_left = min(pos)
-        num_right = num - max(pos) - 1
-        num_center = max(pos) - min(pos) + 1
-        center_mat = kron(local_mat, eye(2 ** (num_center - len(pos))))
-        origin_order = sorted(pos)
-        origin_order.extend([p for p in range(min(pos), max(pos) + 1) if p not in pos])
-        new_order = np.argsort(origin_order)
-        center_mat = COO.from_scipy_sparse(center_mat)
-        center_mat = permutebits(center_mat, new_order).to_scipy_sparse()
-        center_mat = kron(kron(eye(2**num_left), center_mat), eye(2**num_right))
-        return center_mat
-
-
-def permutebits(
-    mat: Union[SparseArray, np.ndarray], order: Iterable
-) -> Union[SparseArray, np.ndarray]:
-    """permute qubits for operators or states"""
-    num = len(order)
-    order = np.array(order)
-    r = len(mat.shape)
-    mat = np.reshape(mat, [2] * r * num)
-    order = np.concatenate([order + len(order) * i for i in range(r)])
-    mat = np.transpose(mat, order)
-    mat = np.reshape(mat, [2**num] * r)
-    return mat
-
-
-def ptrace(psi, ind_A: List, diag: bool = True) -> np.ndarray:
-    """partial trace on a state vector"""
-    num = int(np.log2(psi.shape[0]))
-    order = copy.deepcopy(ind_A)
-    order.extend([p for p in range(num) if p not in ind_A])
-
-    psi = permutebits(psi, order)
-    if diag:
-        psi = np.abs(psi) ** 2
-        psi = np.reshape(psi, [2 ** len(ind_A), 2 ** (num - len(ind_A))])
-        psi = np.sum(psi, axis=1)
-        return psi
-    else:
-        psi = np.reshape(psi, [2 ** len(ind_A), 2 ** (num - len(ind_A))])
-        rho = psi @ np.conj(np.transpose(psi))
-        return rho
-
-
-def py_simulate(
-    qc: QuantumCircuit, state_ini: np.ndarray = np.array([]), output: str = "amplitudes"
-) -> SimuResult:
-    """Simulate quantum circuit
-    Args:
-        qc: quantum circuit need to be simulated.
-        state_ini (numpy.ndarray): Input state vector
-        output (str): `"amplitudes"`: Return ampliteds on measured qubits.
-                      `"density_matrix"`: Return reduced density_amtrix on measured qubits.
-                      `"state_vector`: Return full statevector.
-    Returns:
-       SimuResult object that contain the results.
-    """
-
-    used_qubits = qc.used_qubits
-    num = len(used_qubits)
-    if not state_ini:
-        psi = np.zeros(2**num)
-        psi[0] = 1
-
-    else:
-        psi = state_ini
-
-    for gate in qc.gates:
-        if not (
-            (isinstance(gate, Delay))
-            or (isinstance(gate, Barrier))
-            or isinstance(gate, XYResonance)
-        ):
-            op = global_op(gate, used_qubits)
-            psi = op @ psi
-
-    return psi
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""default circuit simulator for state vector, implemented with numpy only"""
+
+import copy
+import itertools
+from typing import Iterable, List
+
+import numpy as np
+from quafu.circuits.quantum_circuit import QuantumCircuit
+
+from ..elements import (
+    Barrier,
+    CircuitWrapper,
+    Delay,
+    KrausChannel,
+    QuantumGate,
+    XYResonance,
+)
+from ..exceptions import QuafuError
+
+
+def apply_matrix(psi: np.ndarray, matrix: np.ndarray, pos: List[int]) -> np.ndarray:
+    """
+    Apply a local operator to a batch of state vectors.
+    Args:
+        psi: states of shape (batch, 2**num), qubit 0 being the least significant bit.
+        matrix: the operator on qubits `pos`, pos[0] being the most significant qubit.
+        pos: the qubits the operator acts on.
+    Returns:
+        The new states of shape (batch, 2**num).
+    """
+    batch, dim = psi.shape
+    num = dim.bit_length() - 1
+    k = len(pos)
+    # axis 0 is the batch, qubit q is the axis num - q
+    axes = [num - q for q in pos]
+    tensor = psi.reshape([batch] + [2] * num)
+    local = np.reshape(matrix, [2] * (2 * k))
+    tensor = np.tensordot(local, tensor, axes=(list(range(k, 2 * k)), axes))
+    tensor = np.moveaxis(tensor, list(range(k)), axes)
+    return tensor.reshape(batch, dim)
+
+
+def _apply_gates(gates: List[QuantumGate], psi: np.ndarray) -> np.ndarray:
+    for gate in gates:
+        if isinstance(gate, CircuitWrapper):
+            psi = _apply_gates(gate.circuit.gates, psi)
+        elif isinstance(gate, KrausChannel):
+            raise QuafuError(
+                "Noise channel %s is not supported by the default simulator" % gate.name
+            )
+        elif not isinstance(gate, (Delay, Barrier, XYResonance)):
+            psi = apply_matrix(psi, gate._get_raw_matrix(), gate.pos)
+    return psi
+
+
+def permutebits(mat: np.ndarray, order: Iterable) -> np.ndarray:
+    """permute qubits for operators or states"""
+    num = len(order)
+    order = np.array(order)
+    r = len(mat.shape)
+    mat = np.reshape(mat, [2] * r * num)
+    order = np.concatenate([order + len(order) * i for i in range(r)])
+    mat = np.transpose(mat, order)
+    mat = np.reshape(mat, [2**num] * r)
+    return mat
+
+
+def ptrace(psi, ind_A: List, diag: bool = True) -> np.ndarray:
+    """partial trace on a state vector"""
+    num = int(np.log2(psi.shape[0]))
+    order = copy.deepcopy(ind_A)
+    order.extend([p for p in range(num) if p not in ind_A])
+
+    psi = permutebits(psi, order)
+    if diag:
+        psi = np.abs(psi) ** 2
+        psi = np.reshape(psi, [2 ** len(ind_A), 2 ** (num - len(ind_A))])
+        psi = np.sum(psi, axis=1)
+        return psi
+    else:
+        psi = np.reshape(psi, [2 ** len(ind_A), 2 ** (num - len(ind_A))])
+        rho = psi @ np.conj(np.transpose(psi))
+        return rho
+
+
+def reduced_density_matrix(psi: np.ndarray, pos: List[int]) -> np.ndarray:
+    """
+    Reduced density matrix of a state vector on qubits `pos`, pos[0] being the most
+    significant qubit like the matrices of gates. Qubit 0 of psi is the least significant bit.
+    The entries are inner products of views of psi, without permuting a copy of the state.
+    """
+    num = psi.shape[0].bit_length() - 1
+    tensor = psi.reshape([2] * num)
+    blocks = []
+    for bits in itertools.product((0, 1), repeat=len(pos)):
+        index = [slice(None)] * num
+        for q, bit in zip(pos, bits):
+            index[num - 1 - q] = bit
+        blocks.append(tensor[tuple(index)])
+
+    dim = len(blocks)
+    rho = np.empty((dim, dim), dtype=complex)
+    for i in range(dim):
+        for j in range(i, dim):
+            rho[i, j] = np.vdot(blocks[j], blocks[i])
+            rho[j, i] = np.conj(rho[i, j])
+    return rho
+
+
+def py_simulate(qc: QuantumCircuit, state_ini: np.ndarray = np.array([])) -> np.ndarray:
+    """Simulate quantum circuit without measurements, by contracting each gate with the
+    axes of its qubits. Only numpy is needed.
+    Args:
+        qc: quantum circuit need to be simulated.
+        state_ini (numpy.ndarray): Input state vector of shape (2**num,), or a batch of
+                                   input state vectors of shape (batch, 2**num).
+    Returns:
+       The final state vector, or the batch of final state vectors, with the same layout
+       as the `statevector` simulator, qubit 0 being the least significant bit.
+    """
+    dim = 2**qc.num
+    if len(state_ini) == 0:
+        psi = np.zeros((1, dim), dtype=complex)
+        psi[0, 0] = 1
+    else:
+        psi = np.array(state_ini, dtype=complex).reshape(-1, dim)
+
+    psi = _apply_gates(qc.gates, psi)
+
+    if np.ndim(state_ini) == 2:
+        return psi
+    return psi[0]
@@ -0,0 +1,241 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Noise model applied by the simulators"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..circuits import QuantumCircuit
+from ..elements import Instruction, KrausChannel, Measure, QuantumGate
+
+# other names of gates in `QuantumGate.gate_classes`
+_GATE_ALIASES = {"cnot": "cx", "toffoli": "ccx", "fredon": "cswap"}
+
+
+def _gate_name(name: str) -> str:
+    name = name.lower()
+    return _GATE_ALIASES.get(name, name)
+
+
+class NoiseModel:
+    """
+    Noise channels applied after the gates of a circuit by the simulators, without
+    adding them to the circuit. The same circuit can be simulated with different
+    noise models.
+
+    Example:
+        model = NoiseModel().add_channel("depolarizing", (0.01,), gates=["cx"])
+        simulate(qc, simulator="noisy statevector", noise_model=model)
+    """
+
+    def __init__(self):
+        self.rules = []
+        self._channels = {}
+
+    def add_channel(
+        self,
+        channel: str,
+        channel_args: Iterable,
+        qubits: Optional[List[int]] = None,
+        gates: Optional[List[str]] = None,
+    ) -> "NoiseModel":
+        """
+        Apply a channel after each gate in `gates` on each of its qubits in `qubits`.
+        `qubits` or `gates` being None or empty match all of them.
+
+        Args:
+            channel: Name of the channel, e.g. `"bitflip"`, `"dephasing"`, `"depolarizing"`,
+                `"amplitudedamping"` or `"decoherence"`.
+            channel_args: Arguments of the channel after its qubit.
+        """
+        qubits = qubits or []
+        gates = gates or []
+        channel = channel.lower()
+        if channel not in Instruction.ins_classes or not issubclass(
+            Instruction.ins_classes[channel], KrausChannel
+        ):
+            raise ValueError("Invalid channel name %s" % channel)
+        for g in gates:
+            if g.lower() not in QuantumGate.gate_classes:
+                raise ValueError("Invalid gate name %s" % g)
+
+        self.rules.append(
+            (
+                channel,
+                tuple(channel_args),
+                set(qubits) if qubits else None,
+                set(_gate_name(g) for g in gates) if gates else None,
+            )
+        )
+        return self
+
+    def _channel(self, channel: str, q: int, args: tuple) -> KrausChannel:
+        key = (channel, q, args)
+        if key not in self._channels:
+            self._channels[key] = Instruction.ins_classes[channel](q, *args)
+        return self._channels[key]
+
+    def channels(self, gate: QuantumGate) -> List[KrausChannel]:
+        """The channels applied after a gate, in the order of the rules."""
+        name = _gate_name(gate.name)
+        channels = []
+        for channel, args, qubits, gates in self.rules:
+            if gates is not None and name not in gates:
+                continue
+            for q in gate.pos:
+                if qubits is None or q in qubits:
+                    channels.append(self._channel(channel, q, args))
+        return channels
+
+    def apply(self, qc: QuantumCircuit) -> QuantumCircuit:
+        """
+        Return a new circuit with the channels inserted after the gates. The
+        instructions of `qc` are shared, not copied.
+        """
+        if qc._has_wrap:
+            qc.unwarp()
+        new_qc = QuantumCircuit(qc.num, qc.cbits_num)
+        for op in qc.instructions:
+            if isinstance(op, Measure):
+                new_qc._measures.append(op)
+            new_qc.add_ins(op)
+            if isinstance(op, QuantumGate):
+                for channel in self.channels(op):
+                    new_qc.add_ins(channel)
+        new_qc.executable_on_backend = qc.executable_on_backend
+        return new_qc
+
+
+class ReadoutErrorModel:
+    """
+    Readout errors applied to sampled counts, by flipping the bits of each shot
+    instead of simulating noise channels. Works on the counts of simulators and
+    of `ExecResult`.
+
+    Example:
+        model = ReadoutErrorModel().add_qubit_error(0, 0.02, 0.05)
+        noisy_counts = model.apply(result.counts, result.measures)
+    """
+
+    def __init__(self):
+        self.errors = []
+
+    def add_qubit_error(
+        self, qubit: int, p01: float, p10: float
+    ) -> "ReadoutErrorModel":
+        """
+        Independent readout error of a qubit.
+
+        Args:
+            p01: Probability of reading 1 when the qubit is 0.
+            p10: Probability of reading 0 when the qubit is 1.
+        """
+        self.errors.append(([qubit], np.array([p01, p10], dtype=float)))
+        return self
+
+    def add_correlated_error(
+        self, qubits: List[int], matrix: np.ndarray
+    ) -> "ReadoutErrorModel":
+        """
+        Correlated readout error of several qubits.
+
+        Args:
+            matrix: Confusion matrix of shape (2**k, 2**k), `matrix[i, j]` being the probability
+                of reading i when the qubits are j, with qubits[0] the most significant bit.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        dim = 2 ** len(qubits)
+        if matrix.shape != (dim, dim):
+            raise ValueError(
+                "Confusion matrix of %d qubits must have shape (%d, %d)"
+                % (len(qubits), dim, dim)
+            )
+        if not np.allclose(matrix.sum(axis=0), 1):
+            raise ValueError("Columns of the confusion matrix must sum to 1")
+        self.errors.append((list(qubits), matrix))
+        return self
+
+    def apply_samples(self, samples: np.ndarray, shifts: Dict[int, int]) -> np.ndarray:
+        """
+        Apply the readout errors to an array of sampled outcomes.
+
+        Args:
+            samples: Outcomes of the shots as uint64.
+            shifts: Bit position in the outcomes of each measured qubit. Errors on other qubits are ignored.
+        """
+        samples = np.array(samples, dtype=np.uint64)
+        one = np.uint64(1)
+        for qubits, error in self.errors:
+            if not all(q in shifts for q in qubits):
+                continue
+            if error.ndim == 1:
+                shift = np.uint64(shifts[qubits[0]])
+                bits = (samples >> shift) & one
+                flips = np.random.random(len(samples)) < error[bits.astype(np.intp)]
+                samples ^= flips.astype(np.uint64) << shift
+            else:
+                values = np.zeros(len(samples), dtype=np.intp)
+                for q in qubits:
+                    values = (values << 1) | (
+                        (samples >> np.uint64(shifts[q])) & one
+                    ).astype(np.intp)
+                cumulative = np.cumsum(error, axis=0)
+                r = np.random.random(len(samples))
+                read = np.minimum(
+                    np.sum(r > cumulative[:, values], axis=0), len(cumulative) - 1
+                )
+                changed = (values ^ read).astype(np.uint64)
+                for i, q in enumerate(qubits[::-1]):
+                    samples ^= ((changed >> np.uint64(i)) & one) << np.uint64(shifts[q])
+        return samples
+
+    def apply(self, counts: Dict, measures: Dict[int, int]) -> Dict:
+        """
+        Apply the readout errors to counts.
+
+        Args:
+            counts: Counts of bitstrings, or of integer outcomes, ordered by cbit with
+                the smallest cbit being the most significant bit.
+            measures: Measured qubits and their cbits.
+
+        Returns:
+            The counts with readout errors, with keys of the same type.
+        """
+        if not counts:
+            return {}
+        keys = list(counts.keys())
+        str_keys = isinstance(keys[0], str)
+        cbits = sorted(measures.values())
+        width = len(keys[0]) if str_keys else len(cbits)
+        if width > 64:
+            raise ValueError("Readout errors support at most 64 measured bits")
+        # the position of a cbit in the bitstrings, all cbits are present if the keys are longer
+        if width == len(cbits):
+            positions = {cbit: i for i, cbit in enumerate(cbits)}
+        else:
+            positions = {cbit: cbit for cbit in cbits}
+        shifts = {q: width - 1 - positions[cbit] for q, cbit in measures.items()}
+
+        outcomes = np.array(
+            [int(key, 2) if str_keys else key for key in keys], dtype=np.uint64
+        )
+        samples = np.repeat(outcomes, np.array([counts[key] for key in keys]))
+        samples = self.apply_samples(samples, shifts)
+        outcomes, numbers = np.unique(samples, return_counts=True)
+        if str_keys:
+            return {
+                bin(int(k))[2:].zfill(width): int(n) for k, n in zip(outcomes, numbers)
+            }
+        return {int(k): int(n) for k, n in zip(outcomes, numbers)}
@@ -13,14 +13,20 @@
 # limitations under the License.
 """simulator for quantum circuit"""
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 from ..elements import CircuitWrapper, QuantumGate, KrausChannel, UnitaryChannel
 from ..circuits import QuantumCircuit
 from abc  import ABC, abstractmethod
-from .qfvm import simulate_circuit, applyop_statevec, expect_statevec, sampling_statevec,simulate_circuit_clifford
+from .qfvm import simulate_circuit, applyop_statevec, expect_paulis, sampling_statevec,simulate_circuit_clifford, expect_clifford, statevector_clifford
 import numpy as np
 from ..exceptions import QuafuError
 from ..results.results import SimuResult
 from ..algorithms.hamiltonian import Hamiltonian
+from .clifford import split_clifford_prefix, to_clifford_circuit
+from .default_simulator import reduced_density_matrix
+from .noise_model import NoiseModel
 
 class Simulator(ABC):
     @abstractmethod
@@ -28,6 +34,8 @@ class Simulator(ABC):
         raise NotImplementedError
     
 class SVSimulator(Simulator):
+    name = "statevector"
+
     def __init__(self, use_gpu:bool=False, use_custatevec:bool=False):
         self.use_gpu  = use_gpu
         self.use_custatevec = use_custatevec
@@ -48,20 +56,17 @@ class SVSimulator(Simulator):
             psi = applyop_statevec(op, psi)
             return psi
         elif isinstance(op, KrausChannel):
-            temppsi = np.copy(psi)
-            norm0 = np.linalg.norm(psi)
-            s = 0.
-            r = np.random.rand()
+            # the probabilities of all the branches from the reduced density matrix,
+            # then only the chosen Kraus operator is applied
+            rho = reduced_density_matrix(psi, op.pos)
+            probs = []
             for kop in op.gatelist:
-                temppsi = applyop_statevec(kop, temppsi)
-                norm1 = np.linalg.norm(temppsi)
-                s += norm1 / norm0
-                if r < s:
-                    psi = temppsi
-                    psi = psi / norm1
-                    return psi
-                else:
-                    temppsi = np.copy(psi)
+                mat = kop._get_raw_matrix()
+                probs.append(np.real(np.vdot(mat.conj().T @ mat, rho)))
+            cumprobs = np.cumsum(probs)
+            k = min(np.searchsorted(cumprobs, np.random.rand() * cumprobs[-1], side="right"), len(probs) - 1)
+            psi = applyop_statevec(op.gatelist[k], psi)
+            psi *= 1 / np.sqrt(probs[k])
             return psi
         else:
             raise NotImplementedError
@@ -103,102 +108,293 @@ class SVSimulator(Simulator):
                     raise QuafuError("you are not using the GPU version of pyquafu")
                 psi = simulate_circuit_gpu(qc, psi)
                 count_dict = sampling_statevec(qc.measures, psi, shots)
+                res_info["statevector"] = psi
+                res_info["counts"] = count_dict
         else:
             count_dict, psi = simulate_circuit(qc, psi, shots)
             res_info["statevector"] = psi
             res_info["counts"] = count_dict
 
         if hamiltonian:
-            paulis = hamiltonian.paulis
-            res = expect_statevec(res_info["statevector"], paulis)
-            for i in range(len(paulis)):
-                res[i] *= paulis[i].coeff
-            res_info["pauli_expects"] = res
+            res_info["pauli_expects"] = _expect_hamiltonian(res_info["statevector"], hamiltonian)
         else:
             res_info["pauli_expects"] = []
         res_info["qbitnum"] = qc.num
         res_info["measures"] =  qc.measures
-        res_info["simulator"] = "statevector"
+        res_info["simulator"] = self.name
         return SimuResult(res_info)
 
+def _expect_hamiltonian(psi, hamiltonian):
+    """Expectations of the terms of a hamiltonian times their coefficients, read from its bit arrays."""
+    return expect_paulis(psi, hamiltonian.x, hamiltonian.z) * hamiltonian.coeffs
+
+def _sample_counts(measures, psi, shots):
+    """Sample a state vector, return the counts of the integer outcomes."""
+    outcomes, counts = sampling_statevec(measures, psi, shots)
+    return dict(zip(outcomes.tolist(), counts.tolist()))
+
+
+class NoisePlan:
+    """
+    A noisy circuit compiled once into an execution plan. The steps are either
+    lists of consecutive gates or indices into the table of channels, so that a
+    trajectory only draws the outcomes of the channels. The channels of a noise
+    model are added to the plan, not to the circuit.
+    """
+    def __init__(self, qc:QuantumCircuit, noise_model:NoiseModel=None):
+        if qc._has_wrap:
+            qc.unwarp()
+        self.num = qc.num
+        self.measures = qc.measures
+        self.steps = []
+        self.channels = []
+        segment = []
+        for op in qc.instructions:
+            if isinstance(op, QuantumGate):
+                segment.append(op)
+                channels = noise_model.channels(op) if noise_model else []
+            elif isinstance(op, KrausChannel):
+                channels = [op]
+            else:
+                continue
+            for channel in channels:
+                if segment:
+                    self.steps.append(segment)
+                    segment = []
+                self.steps.append(len(self.channels))
+                self.channels.append(channel)
+        if segment:
+            self.steps.append(segment)
+        self.unitary_channels = [op for op in self.channels if isinstance(op, UnitaryChannel)]
+
+    def sample_choices(self, shots:int):
+        """
+        Sample the gates of the unitary channels for all the shots.
+
+        Returns:
+            The distinct choices as an array of shape (groups, unitary channels), whose entries
+            are indices into the gatelist of each channel, and the number of shots of each group.
+        """
+        if not self.unitary_channels:
+            return np.zeros((1, 0), dtype=int), np.array([shots])
+        choices = np.stack(
+            [np.random.choice(len(op.gatelist), size=shots, p=op.probs) for op in self.unitary_channels],
+            axis=1,
+        )
+        return np.unique(choices, axis=0, return_counts=True)
+
+    def trajectory(self, choice):
+        """
+        Fuse the gates between the non-unitary Kraus channels, with the gates chosen for
+        the unitary channels.
+
+        Returns:
+            Alternating circuits of gates and Kraus channels, starting and ending with a circuit.
+        """
+        ops = []
+        segment = QuantumCircuit(self.num)
+        k = 0
+        for step in self.steps:
+            if isinstance(step, list):
+                for gate in step:
+                    segment.add_ins(gate)
+            elif isinstance(self.channels[step], UnitaryChannel):
+                gate = self.channels[step].gatelist[choice[k]]
+                k += 1
+                if gate.name != "ID":
+                    segment.add_ins(gate)
+            else:
+                ops.append(segment)
+                ops.append(self.channels[step])
+                segment = QuantumCircuit(self.num)
+        ops.append(segment)
+        return ops
+
+
+def _init_trajectory_worker(simulator, plan, psi, hamiltonian):
+    global _trajectory_task
+    _trajectory_task = (simulator, plan, psi, hamiltonian)
+
+
+def _run_trajectory_group(choice, shots):
+    simulator, plan, psi, hamiltonian = _trajectory_task
+    return simulator.run_group(plan, psi, choice, shots, hamiltonian)
+
+
 class NoiseSVSimulator(Simulator):
-    def __init__(self, use_gpu:bool=False, use_custatevec:bool=False):
+    """
+    Simulate noisy circuits by sampling trajectories. The gates of all the
+    `UnitaryChannel`s are sampled for every shot at once, and the shots sharing
+    the same gates are simulated together. Other Kraus channels are sampled from
+    the state of each shot.
+    """
+    name = "noisy statevector"
+
+    def __init__(self, use_gpu:bool=False, use_custatevec:bool=False, max_workers:int=1):
+        """
+        Args:
+            max_workers: Number of processes simulating the groups of shots in parallel. The processes
+                are spawned, so a script using more than one of them needs the `if __name__ == "__main__"` guard.
+        """
         self.backend = SVSimulator(use_gpu=use_gpu, use_custatevec=use_custatevec)
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _init_state(num:int, psi:np.ndarray):
+        if len(psi) == 0:
+            psi = np.zeros(2**num, dtype=complex)
+            psi[0] = 1.0
+        return np.copy(psi)
+
+    def _expect(self, psi, hamiltonian):
+        return _expect_hamiltonian(psi, hamiltonian)
+
+    def _apply_ops(self, ops, psi):
+        for op in ops:
+            if isinstance(op, KrausChannel):
+                psi = self.backend._apply_op(op, psi)
+            elif not op.instructions:
+                continue
+            elif self.backend.use_gpu:
+                psi = self.backend.run(op, psi)["statevector"]
+            else:
+                psi = simulate_circuit(op, psi, 0)[1]
+        return psi
 
     def run_once(self, qc : QuantumCircuit, psi, hamiltonian=None):
-        newqc = self.gen_circuit(qc)
-        for op in newqc.instructions:
-            psi = self.backend._apply_op(op, psi)
-        sample = list(sampling_statevec(qc.measures, psi, 1).keys())[0]
+        plan = NoisePlan(qc)
+        choice = [np.random.choice(len(op.gatelist), p=op.probs) for op in plan.unitary_channels]
+        psi = self._apply_ops(plan.trajectory(choice), self._init_state(qc.num, psi))
+        sample = next(iter(_sample_counts(qc.measures, psi, 1)), None)
 
         if hamiltonian:
-            paulis = hamiltonian.paulis
-            res = expect_statevec(psi, paulis)
-            for i in range(len(paulis)):
-                res[i] *= paulis[i].coeff
-            return sample, res
+            return sample, self._expect(psi, hamiltonian)
         return sample, None
 
-    def run(self, qc:QuantumCircuit,  psi : np.ndarray= np.array([]), shots:int=0, hamiltonian:Hamiltonian=None):
-        counts = {}
+    def run_group(self, plan:NoisePlan, psi:np.ndarray, choice:np.ndarray, shots:int, hamiltonian:Hamiltonian=None):
+        """
+        Simulate the shots of a group with the same choices of the unitary channels.
+        The gates before the first Kraus channel are simulated once for the group.
+
+        Returns:
+            The counts of the group and the sum of the pauli expectations over its shots.
+        """
+        ops = plan.trajectory(choice)
+        psi = self._apply_ops(ops[:1], self._init_state(plan.num, psi))
         pauli_expects = 0.
-        
+        if len(ops) == 1:
+            counts = _sample_counts(plan.measures, psi, shots)
+            if hamiltonian:
+                pauli_expects = shots * self._expect(psi, hamiltonian)
+            return counts, pauli_expects
+
+        counts = {}
         for _ in range(shots):
-            if not psi:
-                tpsi = np.zeros(2**qc.num, dtype=complex)
-                tpsi[0] = 1.0
-            else:
-                tpsi = np.copy(psi)
-            sample, pauli_res = self.run_once(qc, tpsi, hamiltonian)
-            if sample in counts.keys():
-                counts[sample] += 1
-            else:
-                counts[sample] = 1
+            tpsi = self._apply_ops(ops[1:], np.copy(psi))
+            for sample in _sample_counts(plan.measures, tpsi, 1):
+                counts[sample] = counts.get(sample, 0) + 1
             if hamiltonian:
-                pauli_expects += np.array(pauli_res)
-        pauli_expects /= shots
+                pauli_expects += self._expect(tpsi, hamiltonian)
+        return counts, pauli_expects
+
+    def run(self, qc:QuantumCircuit,  psi : np.ndarray= np.array([]), shots:int=0, hamiltonian:Hamiltonian=None, noise_model:NoiseModel=None):
+        plan = NoisePlan(qc, noise_model)
+        choices, group_shots = plan.sample_choices(shots)
+        max_workers = self.max_workers
+        tasks = [(choice, n) for choice, n in zip(choices, group_shots) if n > 0]
+        if max_workers > 1 and len(tasks) > 1 and not self.backend.use_gpu:
+            # spawn the workers, as forking a process that has started OpenMP threads is unsafe
+            with ProcessPoolExecutor(
+                max_workers=min(max_workers, len(tasks)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_trajectory_worker,
+                initargs=(self, plan, psi, hamiltonian),
+            ) as executor:
+                results = list(executor.map(_run_trajectory_group, *zip(*tasks)))
+        else:
+            results = [self.run_group(plan, psi, choice, n, hamiltonian) for choice, n in tasks]
+
+        counts = {}
+        pauli_expects = 0.
+        for group_counts, group_expects in results:
+            for sample, n in group_counts.items():
+                counts[sample] = counts.get(sample, 0) + n
+            pauli_expects += group_expects
+
         if not hamiltonian:
             pauli_expects = []
         else:
-            pauli_expects = list(pauli_expects)
+            pauli_expects = list(pauli_expects / shots)
         res_info = {"counts":counts, "pauli_expects": pauli_expects}
         res_info["qbitnum"] = qc.num
         res_info["measures"] =  qc.measures 
-        res_info["simulator"] = "noisy statevector"
+        res_info["simulator"] = self.name
         return SimuResult(res_info)
 
     @staticmethod
-    def gen_circuit(qc):
+    def gen_circuit(qc, choice=None):
         """
         sample circuit from noise circuit
-        """ 
-        num = qc.num
-        new_qc = QuantumCircuit(num)
-        temp_qc = QuantumCircuit(num)
-        if qc._has_wrap:
-            qc.unwarp()
 
-        for op in qc.instructions:
-            if isinstance(op, QuantumGate):
-                temp_qc << op
-            elif isinstance(op, UnitaryChannel):
-                g = op.gen_gate()
-                if g.name != "ID":
-                    temp_qc << g
-            elif isinstance(op, KrausChannel):
-                new_qc << temp_qc.wrap()
+        Args:
+            choice: Indices of the gates chosen for the unitary channels, sampled if not given.
+        """ 
+        plan = NoisePlan(qc)
+        if choice is None:
+            choice = [np.random.choice(len(op.gatelist), p=op.probs) for op in plan.unitary_channels]
+        new_qc = QuantumCircuit(qc.num)
+        for op in plan.trajectory(choice):
+            if isinstance(op, KrausChannel):
                 new_qc << op
-                temp_qc =  QuantumCircuit(num)
-        new_qc << temp_qc.wrap()
+            else:
+                new_qc << op.wrap()
         return new_qc
     
 class CliffordSimulator(Simulator):
-     def run(self, qc : QuantumCircuit, shots:int=0):
+     def run(self, qc : QuantumCircuit, shots:int=0, hamiltonian:Hamiltonian=None, noise_model:NoiseModel=None):
+        """
+        The channels of `noise_model` are inserted into a copy of the circuit.
+        The circuit is then rewritten with the gates of the clifford simulator,
+        rotations at multiples of pi/2 are accepted as clifford gates.
+        Pauli channels (`BitFlip`, `Dephasing` and `Depolarizing`) are sampled as
+        random Pauli errors, other Kraus channels are not supported.
+
+        The pauli expectations of `hamiltonian` are exact on the stabilizer state,
+        each one is 0 or ±1 times the coefficient. For noisy circuits or circuits
+        with mid-circuit measurements they are averaged over the `shots` trajectories.
+        """
+        measures = qc.measures
+        if noise_model:
+            qc = noise_model.apply(qc)
+        qc = to_clifford_circuit(qc)
         res_info = {}
         count_dict = simulate_circuit_clifford(qc, shots)
+        if hamiltonian:
+            paulis = list(hamiltonian.paulis)
+            res = expect_clifford(qc, paulis, shots)
+            for i in range(len(paulis)):
+                res[i] *= paulis[i].coeff
+            res_info["pauli_expects"] = res
+        else:
+            res_info["pauli_expects"] = []
         res_info["qbitnum"] = qc.num
         res_info["counts"] = count_dict
-        res_info["measures"] = qc.measures
-        res_info["simuator"] = "clifford"
+        res_info["measures"] = measures
+        res_info["simulator"] = "clifford"
         return SimuResult(res_info)
-     
+
+
+class HybridSimulator(SVSimulator):
+    """
+    Simulate the maximal clifford prefix of a circuit with the clifford simulator,
+    convert the stabilizer state to a state vector, and continue the rest of the
+    circuit with the statevector simulator.
+    """
+    name = "hybrid"
+
+    def run(self, qc : QuantumCircuit, psi : np.ndarray= np.array([]), shots:int=0, hamiltonian:Hamiltonian=None):
+        if len(psi) > 0:
+            raise QuafuError("Hybrid simulator starts from |0...0>, an input state is not supported.")
+        prefix, rest = split_clifford_prefix(qc)
+        psi = statevector_clifford(prefix)
+        return super().run(rest, psi, shots, hamiltonian)
@@ -12,3 +12,163 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Simulate the execution of a quantum circuit using pytorch"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from ..circuits import QuantumCircuit
+from ..elements import (
+    Barrier,
+    CircuitWrapper,
+    Delay,
+    KrausChannel,
+    QuantumGate,
+    XYResonance,
+)
+from ..exceptions import QuafuError
+
+# The matrix of a standard gate with one parameter is a trigonometric polynomial
+# of theta / 2 with frequencies -2..2, i.e. sum_k C_k exp(i k theta / 2), which is
+# fitted from its matrix at 5 angles.
+_FREQUENCIES = np.arange(-2, 3)
+_SAMPLES = 4 * np.pi * np.arange(5) / 5
+_CHECK_ANGLE = 0.7
+
+_coefficients_cache: Dict[Tuple[str, int], torch.Tensor] = {}
+
+
+def _fourier_coefficients(gate: QuantumGate) -> torch.Tensor:
+    """Coefficients C_k of the matrix of a gate with one parameter, of shape (5, dim, dim)."""
+    key = (gate.name, len(gate.pos))
+    if key not in _coefficients_cache:
+        mats = np.stack([gate._raw_matrix([theta]) for theta in _SAMPLES])
+        dim = mats.shape[-1]
+        phases = np.exp(0.5j * np.outer(_SAMPLES, _FREQUENCIES))
+        coeffs = np.linalg.solve(phases, mats.reshape(len(_SAMPLES), -1))
+        check = np.exp(0.5j * _CHECK_ANGLE * _FREQUENCIES) @ coeffs
+        if not np.allclose(check.reshape(dim, dim), gate._raw_matrix([_CHECK_ANGLE])):
+            raise QuafuError(
+                "Parameterized gate %s is not supported by the torch simulator"
+                % gate.name
+            )
+        _coefficients_cache[key] = torch.from_numpy(coeffs.reshape(-1, dim, dim))
+    return _coefficients_cache[key]
+
+
+def gate_matrix(
+    gate: QuantumGate, theta: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """
+    Matrix of a gate in the order of its qubits.
+    Args:
+        gate: the quantum gate.
+        theta: the parameter of shape (batch,) for a gate with one parameter,
+               the current parameter of the gate is used if None.
+    Returns:
+        The matrix of shape (dim, dim), or (batch, dim, dim) if theta is given.
+    """
+    if theta is None:
+        return torch.from_numpy(np.asarray(gate._get_raw_matrix(), dtype=complex))
+    coeffs = _fourier_coefficients(gate)
+    frequencies = torch.from_numpy(_FREQUENCIES).to(theta.dtype)
+    phases = torch.exp(0.5j * theta[:, None] * frequencies)
+    return torch.einsum("bk,kij->bij", phases, coeffs)
+
+
+def apply_matrix(
+    psi: torch.Tensor, matrix: torch.Tensor, pos: List[int]
+) -> torch.Tensor:
+    """
+    Apply a local operator to a batch of states.
+    Args:
+        psi: states of shape (batch, 2, ..., 2), the axis of qubit q being num - q.
+        matrix: the operator on qubits `pos` of shape (dim, dim) or (batch, dim, dim),
+                pos[0] being the most significant qubit.
+        pos: the qubits the operator acts on.
+    """
+    num = psi.dim() - 1
+    axes = [num - q for q in pos]
+    dim = 2 ** len(pos)
+    tensor = torch.movedim(psi, axes, list(range(-len(pos), 0)))
+    shape = tensor.shape
+    tensor = tensor.reshape(shape[0], -1, dim) @ matrix.transpose(-1, -2)
+    tensor = tensor.reshape(shape)
+    return torch.movedim(tensor, list(range(-len(pos), 0)), axes)
+
+
+def _apply_gates(
+    gates: List[QuantumGate], psi: torch.Tensor, columns: Dict[int, torch.Tensor]
+) -> torch.Tensor:
+    for gate in gates:
+        if isinstance(gate, CircuitWrapper):
+            psi = _apply_gates(gate.circuit.gates, psi, columns)
+        elif isinstance(gate, KrausChannel):
+            raise QuafuError(
+                "Noise channel %s is not supported by the torch simulator" % gate.name
+            )
+        elif not isinstance(gate, (Delay, Barrier, XYResonance)):
+            psi = apply_matrix(psi, gate_matrix(gate, columns.get(id(gate))), gate.pos)
+    return psi
+
+
+def simulate_torch(
+    qc: QuantumCircuit,
+    params: Optional[torch.Tensor] = None,
+    psi: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """Simulate a batch of circuits with differentiable parameters, measurements are ignored.
+    Args:
+        qc: quantum circuit.
+        params: parameters of shape (batch, num_params), one column for each parameterized
+                gate as in `QuantumCircuit.update_params`. The current parameters of the
+                gates are used if None.
+        psi: input states of shape (batch, 2**num), |0...0> if None.
+    Returns:
+        The final states of shape (batch, 2**num), qubit 0 being the least significant bit.
+    """
+    num = qc.num
+    batch = 1
+    if params is not None:
+        batch = params.shape[0]
+    elif psi is not None:
+        batch = psi.shape[0]
+
+    columns = {}
+    if params is not None:
+        if params.shape[1] != len(qc.parameterized_gates):
+            raise QuafuError(
+                "`params` must have one column for each parameterized gate"
+            )
+        for i, gate in enumerate(qc.parameterized_gates):
+            if len(gate.paras) != 1:
+                raise QuafuError("Gate %s has more than one parameter" % gate.name)
+            columns[id(gate)] = params[:, i]
+
+    if psi is None:
+        psi = torch.zeros((batch, 2**num), dtype=torch.complex128)
+        psi[:, 0] = 1.0
+    psi = psi.to(torch.complex128).reshape([batch] + [2] * num)
+    psi = _apply_gates(qc.gates, psi, columns)
+    return psi.reshape(batch, 2**num)
+
+
+def expval_z(psi: torch.Tensor) -> torch.Tensor:
+    """
+    Expectations of Z on each qubit.
+    Args:
+        psi: states of shape (batch, 2**num).
+    Returns:
+        Expectations of shape (batch, num), column q for Z on qubit q.
+    """
+    batch, dim = psi.shape
+    num = dim.bit_length() - 1
+    probs = (psi.real**2 + psi.imag**2).reshape([batch] + [2] * num)
+    expects = []
+    for q in range(num):
+        axis = num - q
+        others = [a for a in range(1, num + 1) if a != axis]
+        marginal = probs.sum(dim=others) if others else probs
+        expects.append(marginal[:, 0] - marginal[:, 1])
+    return torch.stack(expects, dim=1)
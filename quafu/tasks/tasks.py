@@ -14,6 +14,7 @@
 
 import copy
 import logging
+import threading
 from typing import Dict, List, Optional, Tuple
 from urllib import parse
 
@@ -50,6 +51,8 @@ class Task:
         self.priority = self.user.priority
         self.runtime_job_id = ""
         self.submit_history = {}
+        # tasks may be sent from several threads, e.g. by `Estimator.run_batch`
+        self._history_lock = threading.Lock()
         self._available_backends = self.user.get_available_backends(print_info=False)
         self.backend = self._available_backends[
             list(self._available_backends.keys())[0]
@@ -103,13 +106,15 @@ class Task:
         return self.backend.get_chip_info(self.user)
 
     def submit(
-        self, qc: QuantumCircuit, obslist: List = []
+        self, qc: QuantumCircuit, obslist: List = [], strategy: str = "dsatur"
     ) -> Tuple[List[ExecResult], List[int]]:
         """
         Execute the circuit with observable expectation measurement task.
         Args:
             qc (QuantumCircuit): Quantum circuit that need to be executed on backend.
             obslist (list[str, list[int]]): List of pauli string and its position.
+            strategy (str): Coloring strategy grouping the qubit-wise commuting observables
+                into measurement bases, one task being run for each basis, see `quafu.utils.grouping`.
 
         Returns:
             List of executed results and list of measured observable
@@ -140,7 +145,7 @@ class Task:
                             "Qubit %d in observer %s is not measured." % (p, obs[0])
                         )
 
-            measure_basis, targlist = merge_measure(obslist)
+            measure_basis, targlist = merge_measure(obslist, strategy)
             print("Job start, need measured in ", measure_basis)
 
             exec_res = []
@@ -149,11 +154,13 @@ class Task:
                 qc.gates = copy.deepcopy(inputs)
                 exec_res.append(res)
 
-            measure_results = []
-            for obi in range(len(obslist)):
-                obs = obslist[obi]
-                rpos = [measures.index(p) for p in obs[1]]
-                measure_results.append(exec_res[targlist[obi]].calculate_obs(rpos))
+            # all the observables of a measurement basis are estimated at once
+            measure_results = np.zeros(len(obslist))
+            for mi, res in enumerate(exec_res):
+                inds = [obi for obi in range(len(obslist)) if targlist[obi] == mi]
+                rpos = [[measures.index(p) for p in obslist[obi][1]] for obi in inds]
+                measure_results[inds] = res.calculate_obs_list(rpos)
+            measure_results = list(measure_results)
 
         return exec_res, measure_results
 
@@ -253,10 +260,11 @@ class Task:
 
         task_id = res_dict["task_id"]
 
-        if group not in self.submit_history:
-            self.submit_history[group] = [task_id]
-        else:
-            self.submit_history[group].append(task_id)
+        with self._history_lock:
+            if group not in self.submit_history:
+                self.submit_history[group] = [task_id]
+            else:
+                self.submit_history[group].append(task_id)
 
         return ExecResult(res_dict)
 
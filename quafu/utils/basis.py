@@ -1,5 +1,97 @@
+from typing import Dict, List, Union
+
 import numpy as np
 
+# number of set bits of each byte
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits of each element of an array of uint64."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _POPCOUNT8[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """
+    Pack rows of bits into uint64 words, bit i of a row being bit 63 - i % 64
+    of word i // 64, so that bitstrings of any length are supported.
+    """
+    rows, num = bits.shape
+    num_words = max(1, -(-num // 64))
+    padded = np.zeros((rows, num_words * 64), dtype=np.uint8)
+    padded[:, :num] = bits
+    return np.packbits(padded, axis=1).view(">u8").astype(np.uint64)
+
+
+class CountsArray:
+    """
+    Counts of bitstrings stored as arrays, the bitstrings packed into uint64 words
+    and their counts, so that observables are estimated without looping over the
+    bitstrings in python.
+
+    Attributes:
+        words (np.ndarray): Packed bitstrings of shape (outcomes, words).
+        counts (np.ndarray): Counts of the bitstrings.
+        num_bits (int): Length of the bitstrings.
+    """
+
+    def __init__(self, words: np.ndarray, counts: np.ndarray, num_bits: int):
+        self.words = words
+        self.counts = counts
+        self.num_bits = num_bits
+
+    @classmethod
+    def from_dict(cls, res: Dict[str, int]) -> "CountsArray":
+        keys = list(res.keys())
+        num_bits = len(keys[0]) if keys else 0
+        chars = np.frombuffer("".join(keys).encode(), dtype=np.uint8)
+        bits = (chars - ord("0")).reshape(len(keys), num_bits)
+        counts = np.array([res[key] for key in keys], dtype=float)
+        return cls(_pack(bits), counts, num_bits)
+
+    @property
+    def shots(self) -> float:
+        return np.sum(self.counts)
+
+    def bits(self, pos: List[int]) -> np.ndarray:
+        """The bits at positions `pos` of the bitstrings, of shape (outcomes, len(pos))."""
+        pos = np.asarray(pos, dtype=np.uint64)
+        words = self.words[:, (pos // 64).astype(np.intp)]
+        return ((words >> (np.uint64(63) - pos % 64)) & np.uint64(1)).astype(np.intp)
+
+    def reduce_probs(self, pos: List[int]) -> np.ndarray:
+        """The probabilities of the bits at positions `pos`, with pos[0] the most significant bit."""
+        weights = 2 ** np.arange(len(pos))[::-1]
+        inds = self.bits(pos) @ weights
+        probs = np.bincount(inds, weights=self.counts, minlength=2 ** len(pos))
+        return probs / np.sum(probs)
+
+    def masks(self, obslist: List[List[int]]) -> np.ndarray:
+        """Packed masks of the positions of each observable, of shape (observables, words)."""
+        bits = np.zeros((len(obslist), self.num_bits), dtype=np.uint8)
+        for i, pos in enumerate(obslist):
+            bits[i, pos] = 1
+        return _pack(bits)
+
+    def expectations(self, obslist: List[List[int]]) -> np.ndarray:
+        """
+        Expectations of products of Z on the bits at the positions of each observable,
+        by the parity of the set bits under its mask.
+        """
+        masks = self.masks(obslist)
+        parity = np.zeros((len(obslist), len(self.counts)), dtype=np.intp)
+        for w in range(masks.shape[1]):
+            parity += popcount(masks[:, None, w] & self.words[None, :, w])
+        signs = 1 - 2 * (parity & 1)
+        return signs @ self.counts / self.shots
+
+
+def _as_counts(res: Union[Dict[str, int], CountsArray]) -> CountsArray:
+    return res if isinstance(res, CountsArray) else CountsArray.from_dict(res)
+
 
 def get_basis(ind, N):
     basisstr = bin(int(ind))[2:]
@@ -16,31 +108,18 @@ def get_ind(basis):
 
 def reduce_probs(bitsA, res):
     """The reduced probabilities from frequency"""
-    dim = 2 ** (len(bitsA))
-    probs = np.zeros(dim)
-    for basestr in res:
-        basis = np.array([int(i) for i in basestr])
-        ind = get_ind(basis[bitsA])
-        probs[ind] += res[basestr]
-
-    probs = probs / np.sum(probs)
-    return probs
+    return _as_counts(res).reduce_probs(bitsA)
 
 
 def measure_obs(bits, res):
-    n = len(bits)
-    baseobs = get_baselocal(n)
-    prob_r = reduce_probs(bits, res)
-    result = np.dot(prob_r, baseobs)
-    return result
+    return _as_counts(res).expectations([bits])[0]
+
+
+def measure_obs_list(obslist, res):
+    """Expectations of the observables given by the positions of their bits, at once."""
+    return _as_counts(res).expectations(obslist)
 
 
 def get_baselocal(n):
-    NA = n
-    basisN = int(2**NA)
-    baseobs = np.zeros(basisN)
-    for i in range(basisN):
-        basisA = get_basis(i, NA)
-        baseobs[i] = (-1) ** (np.sum(basisA))
-
-    return baseobs
+    parity = popcount(np.arange(2**n, dtype=np.uint64)) & 1
+    return 1.0 - 2.0 * parity
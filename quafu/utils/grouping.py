@@ -0,0 +1,192 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Grouping of pauli strings that are measured together.
+
+The terms are given by their x and z bits packed into uint64 words, qubit q being
+bit q % 64 of word q // 64 as in `Hamiltonian`, and Y having both bits set. Two
+terms conflict if they can not be measured together, the groups are the color
+classes of a greedy coloring of the conflict graph.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from ..exceptions import QuafuError
+from .basis import popcount
+
+# orders of the vertices of the greedy coloring
+STRATEGIES = ("sequential", "largest_first", "smallest_last", "dsatur")
+
+# largest number of words compared at once when building the conflict graph
+_BLOCK_WORDS = 1 << 22
+
+
+def pack_paulis(obslist: List, num_qubits: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packed x and z bits of observables given as pauli strings and their positions,
+    e.g. `[["XYX", [0, 1, 2]], ["Z", [1]]]`. Identities are ignored.
+
+    Returns:
+        x and z of shape (observables, words).
+    """
+    chars = [c for obs in obslist for c in obs[0]]
+    pos = np.array([q for obs in obslist for q in obs[1]], dtype=np.int64)
+    if len(chars) != len(pos):
+        raise QuafuError("Each pauli of an observable must have one position.")
+    if num_qubits is None:
+        num_qubits = int(pos.max()) + 1 if len(pos) else 0
+    rows = np.repeat(np.arange(len(obslist)), [len(obs[0]) for obs in obslist])
+    chars = np.array(chars, dtype="U1")
+    bits = np.uint64(1) << (pos % 64).astype(np.uint64)
+
+    shape = (len(obslist), max(1, -(-num_qubits // 64)))
+    x = np.zeros(shape, dtype=np.uint64)
+    z = np.zeros(shape, dtype=np.uint64)
+    is_x = (chars == "X") | (chars == "Y")
+    is_z = (chars == "Z") | (chars == "Y")
+    np.bitwise_or.at(x, (rows[is_x], pos[is_x] // 64), bits[is_x])
+    np.bitwise_or.at(z, (rows[is_z], pos[is_z] // 64), bits[is_z])
+    return x, z
+
+
+def conflict_graph(x: np.ndarray, z: np.ndarray, qubitwise: bool = True) -> np.ndarray:
+    """
+    Adjacency matrix of the terms that can not be measured together.
+
+    Args:
+        qubitwise: If True, two terms conflict if they act by different paulis on a
+            qubit, then a group is measured by single qubit rotations. Otherwise they
+            conflict if they anticommute, a group of commuting terms needs an entangling
+            circuit to be measured.
+    """
+    num = len(x)
+    adjacency = np.zeros((num, num), dtype=bool)
+    block = max(1, _BLOCK_WORDS // max(1, num * x.shape[1]))
+    for start in range(0, num, block):
+        xb, zb = x[start : start + block, None, :], z[start : start + block, None, :]
+        if qubitwise:
+            both = (xb | zb) & (x | z)
+            adjacency[start : start + block] = np.any(
+                both & ((xb ^ x) | (zb ^ z)), axis=-1
+            )
+        else:
+            parity = np.sum(popcount((xb & z) ^ (zb & x)), axis=-1) & 1
+            adjacency[start : start + block] = parity.astype(bool)
+    return adjacency
+
+
+def _smallest_last(adjacency: np.ndarray) -> np.ndarray:
+    """Remove a vertex of smallest degree until none is left, the order is the reverse of the removals."""
+    degrees = adjacency.sum(axis=1)
+    removed = np.zeros(len(adjacency), dtype=bool)
+    order = []
+    for _ in range(len(adjacency)):
+        v = int(np.argmin(np.where(removed, np.iinfo(degrees.dtype).max, degrees)))
+        order.append(v)
+        removed[v] = True
+        degrees -= adjacency[v]
+    return np.array(order[::-1], dtype=np.intp)
+
+
+def _greedy(adjacency: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """Color the vertices in order, each by the smallest color not used by its neighbors."""
+    colors = np.full(len(adjacency), -1, dtype=np.intp)
+    for v in order:
+        used = colors[adjacency[v]]
+        # one of the colors up to the number of neighbors is free
+        taken = np.zeros(len(used) + 1, dtype=bool)
+        taken[used[(used >= 0) & (used < len(taken))]] = True
+        colors[v] = np.argmin(taken)
+    return colors
+
+
+def _dsatur(adjacency: np.ndarray) -> np.ndarray:
+    """Color next the vertex with the most distinct colors among its neighbors, ties broken by degree."""
+    num = len(adjacency)
+    degrees = adjacency.sum(axis=1)
+    colors = np.full(num, -1, dtype=np.intp)
+    # the colors of the neighbors of each vertex
+    saturation = np.zeros((num, num + 1), dtype=bool)
+    counts = np.zeros(num, dtype=np.intp)
+    for _ in range(num):
+        keys = np.where(colors < 0, counts * (num + 1) + degrees, -1)
+        v = int(np.argmax(keys))
+        c = int(np.argmin(saturation[v]))
+        colors[v] = c
+        new = adjacency[v] & ~saturation[:, c]
+        saturation[new, c] = True
+        counts[new] += 1
+    return colors
+
+
+def color_graph(adjacency: np.ndarray, strategy: str = "dsatur") -> np.ndarray:
+    """
+    Greedy coloring of a graph, no two adjacent vertices have the same color.
+
+    Args:
+        adjacency: Symmetric boolean adjacency matrix.
+        strategy: Order in which the vertices are colored, one of `STRATEGIES`.
+            `"sequential"` colors them in order, `"largest_first"` by decreasing degree,
+            `"smallest_last"` by the reverse of removing vertices of smallest degree,
+            `"dsatur"` next the vertex whose neighbors have the most distinct colors.
+
+    Returns:
+        The color of each vertex, colors being 0, 1, 2, ...
+    """
+    if strategy == "sequential":
+        return _greedy(adjacency, np.arange(len(adjacency)))
+    if strategy == "largest_first":
+        return _greedy(adjacency, np.argsort(-adjacency.sum(axis=1), kind="stable"))
+    if strategy == "smallest_last":
+        return _greedy(adjacency, _smallest_last(adjacency))
+    if strategy == "dsatur":
+        return _dsatur(adjacency)
+    raise QuafuError(
+        "Unknown coloring strategy %s, must be one of %s"
+        % (strategy, ", ".join(STRATEGIES))
+    )
+
+
+def group_paulis(
+    x: np.ndarray,
+    z: np.ndarray,
+    qubitwise: bool = True,
+    strategy: str = "dsatur",
+) -> List[np.ndarray]:
+    """
+    Partition terms into groups that are measured together.
+
+    Returns:
+        The indices of the terms of each group, in increasing order.
+    """
+    colors = color_graph(conflict_graph(x, z, qubitwise), strategy)
+    order = np.argsort(colors, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(colors))[:-1]) if len(colors) else []
+
+
+def measurement_basis(x: np.ndarray, z: np.ndarray, group: np.ndarray) -> List:
+    """
+    The pauli string measuring all the terms of a qubit-wise commuting group, and
+    its positions in increasing order.
+    """
+    bx = np.bitwise_or.reduce(x[group], axis=0)
+    bz = np.bitwise_or.reduce(z[group], axis=0)
+    words = np.arange(len(bx) * 64) // 64
+    shifts = (np.arange(len(bx) * 64) % 64).astype(np.uint64)
+    xs = (bx[words] >> shifts) & np.uint64(1)
+    zs = (bz[words] >> shifts) & np.uint64(1)
+    pos = np.flatnonzero(xs | zs)
+    names = np.array(["", "X", "Z", "Y"])[(xs + 2 * zs)[pos].astype(np.intp)]
+    return ["".join(names), pos.tolist()]
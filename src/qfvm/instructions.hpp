@@ -181,7 +181,13 @@ std::unique_ptr<Instruction> from_pyops(py::object const& obj, bool get_full_mat
     RowMatrixXcd full_mat;
 
     name = obj.attr("name").attr("lower")().cast<string>();
-    if (!(name == "barrier" || name == "delay" || name == "id" ||
+    if (py::hasattr(obj, "gatelist")) {
+    //KrausChannel, only the channel parameters are needed
+        positions = obj.attr("pos").cast<vector<pos_t>>();
+        paras = obj.attr("paras").cast<vector<double>>();
+        return std::make_unique<QuantumOperator>(name, paras, positions, 0);
+
+    } else if (!(name == "barrier" || name == "delay" || name == "id" ||
         name == "measure" || name == "reset" || name == "cif")) {
     //QuantumGate
         positions = obj.attr("pos").cast<vector<pos_t>>();
@@ -32,6 +32,21 @@ py::array_t<T> to_numpy(const std::tuple<T*, size_t>& src) {
   return py::array_t<T>(src_size, src_ptr, capsule);
 }
 
+// counts of outcomes as two numpy arrays, the outcomes and their counts
+py::tuple counts_to_numpy(std::map<uint64_t, uint64_t> const& counts) {
+  py::array_t<uint64_t> outcomes(counts.size());
+  py::array_t<uint64_t> numbers(counts.size());
+  auto outcomes_ptr = outcomes.mutable_data();
+  auto numbers_ptr = numbers.mutable_data();
+  size_t i = 0;
+  for (auto& [outcome, number] : counts) {
+    outcomes_ptr[i] = outcome;
+    numbers_ptr[i] = number;
+    i++;
+  }
+  return py::make_tuple(outcomes, numbers);
+}
+
 py::object applyop_statevec(py::object const& pyop, py::array_t<complex<double>> &np_inputstate){
     py::buffer_info buf = np_inputstate.request();
     auto* data_ptr = reinterpret_cast<std::complex<double>*>(buf.ptr);
@@ -43,13 +58,17 @@ py::object applyop_statevec(py::object const& pyop, py::array_t<complex<double>>
     }
     else{
         StateVector<double> state(data_ptr, buf.size);
-        apply_op(*op, state);
+        {
+            // the op and the state are owned by c++, other python threads can run
+            py::gil_scoped_release release;
+            apply_op(*op, state);
+        }
         state.move_data_to_python();
         return np_inputstate;
     }
 }
 
-py::dict sampling_statevec(py::dict const& pymeas, py::array_t<complex<double>> &np_inputstate, int shots){
+py::tuple sampling_statevec(py::dict const& pymeas, py::array_t<complex<double>> &np_inputstate, int shots){
     std::vector<std::pair<uint, uint> > measures;
     for (auto item : pymeas){
         int qbit = item.first.cast<uint>();
@@ -62,10 +81,29 @@ py::dict sampling_statevec(py::dict const& pymeas, py::array_t<complex<double>>
     StateVector<double> state(data_ptr, buf.size);
     auto counts = state.measure_samples(measures, shots);
     state.move_data_to_python();
-    return py::cast(counts);
+    return counts_to_numpy(counts);
 }
 
-std::pair<std::map<uint, uint>, py::array_t<complex<double>>>
+py::array_t<double> marginal_probabilities(py::array_t<complex<double>> &np_inputstate, vector<pos_t> const& qubits){
+    py::buffer_info buf = np_inputstate.request();
+    auto* data_ptr = reinterpret_cast<std::complex<double>*>(buf.ptr);
+    StateVector<double> state(data_ptr, buf.size);
+    auto probs = state.marginal_probabilities(qubits);
+    state.move_data_to_python();
+    return py::array_t<double>(probs.size(), probs.data());
+}
+
+py::array_t<complex<double>> reduced_density_matrix(py::array_t<complex<double>> &np_inputstate, vector<pos_t> const& qubits){
+    py::buffer_info buf = np_inputstate.request();
+    auto* data_ptr = reinterpret_cast<std::complex<double>*>(buf.ptr);
+    StateVector<double> state(data_ptr, buf.size);
+    auto rho = state.reduced_density_matrix(qubits);
+    state.move_data_to_python();
+    size_t dim = 1ULL << qubits.size();
+    return py::array_t<complex<double>>({dim, dim}, rho.data());
+}
+
+std::pair<py::tuple, py::array_t<complex<double>>>
 simulate_circuit(py::object const& pycircuit,
                  py::array_t<complex<double>>& np_inputstate,
                  const int& shots) {
@@ -84,26 +122,26 @@ simulate_circuit(py::object const& pycircuit,
     }
 
     // Store outcome's count
-    std::map<uint, uint> outcount;
-    StateVector<double> state;
-    if (data_size != 0){
-        state.load_data(data_ptr, data_size);
-    }
+    std::map<uint64_t, uint64_t> outcount;
     if (circuit.final_measure()){
-        simulate(circuit, state);
-        if (!measures.empty()){
-            auto countstr = state.measure_samples(circuit.measure_vec(), shots);
-            for (auto it : countstr){
-                uint si = std::stoi(it.first, nullptr, 2);
-                outcount[si] = it.second;
-            }
+        // the state borrows the input buffer, which is handed back below
+        StateVector<double> state;
+        if (data_size != 0){
+            state.load_data(data_ptr, data_size);
+        }
+        {
+            // the circuit is converted and the state borrowed, other python
+            // threads can run meanwhile
+            py::gil_scoped_release release;
+            simulate(circuit, state);
+            outcount = state.measure_samples(measures, shots);
         }
         if (data_size == 0)
-            return std::make_pair(outcount,
+            return std::make_pair(counts_to_numpy(outcount),
                             to_numpy(state.move_data_to_python()));
         else
             state.move_data_to_python();
-            return std::make_pair(outcount, np_inputstate);
+            return std::make_pair(counts_to_numpy(outcount), np_inputstate);
     }
     else{
         for (uint i = 0; i < shots; i++) {
@@ -118,7 +156,7 @@ simulate_circuit(py::object const& pycircuit,
             simulate(circuit, buffer);
             // store reg
             vector<uint> tmpcreg = buffer.creg();
-            uint outcome = 0;
+            uint64_t outcome = 0;
             for (uint j = 0; j < tmpcreg.size(); j++) {
                 if (cbit_measured.find(j) == cbit_measured.end())
                 continue;
@@ -131,7 +169,7 @@ simulate_circuit(py::object const& pycircuit,
                 outcount[outcome] = 1;
 
             if (i == shots-1){
-                return std::make_pair(outcount,
+                return std::make_pair(counts_to_numpy(outcount),
                             to_numpy(buffer.move_data_to_python()));
             }
         }
@@ -143,75 +181,100 @@ std::map<uint, uint> simulate_circuit_clifford(py::object const& pycircuit,
 
   auto circuit = Circuit(pycircuit);
 
-  // If measure all at the end, simulate once
-  uint actual_shots = shots;
-
   // qbit, cbit
   vector<std::pair<uint, uint>> measures = circuit.measure_vec();
-  std::map<uint, bool> cbit_measured;
-  for (auto& pair : measures) {
-    cbit_measured[pair.second] = true;
-  }
 
   // Store outcome's count
   std::map<uint, uint> outcount;
 
-  circuit_simulator<_word_size> cs(circuit.qubit_num());
-
-  for (uint i = 0; i < actual_shots; i++) {
+  bool noisy = false;
+  bool classical_control = false;
+  for (auto& op : circuit.instructions()) {
+    noisy |= CLIFFORD_PAULI_CHANNELS.count(op->name()) > 0;
+    classical_control |= op->name() == "cif";
+  }
 
+  // If measure all at the end, simulate once and sample the outcomes from the
+  // final tableau
+  if (circuit.final_measure() && !noisy) {
+    circuit_simulator<_word_size> cs(circuit.qubit_num());
     simulate(circuit, cs);
-    uint outcome = 0;
-
-    if (!circuit.final_measure()) {
-      // qubit, cbit, measure result
-      auto measure_results = cs.current_measurement_record();
-
-      // make sure the order is the same with other simulators
-      std::sort(
-          measure_results.begin(), measure_results.end(),
-          [](auto& a, auto& b) { return std::get<1>(a) < std::get<1>(b); });
-
-      for (auto& measure_result : measure_results) {
-        outcome *= 2;
-        outcome += std::get<2>(measure_result);
-      }
-
-    } else if (circuit.final_measure() && !measures.empty()) {
-      for (auto& measure : measures) {
-        cs.do_circuit_instruction(
-            {"measure", std::vector<size_t>{measure.first},
-             std::vector<double>{static_cast<double>(measure.second)}});
-      }
-
-      // qubit, cbit, measure result
-      auto measure_results = cs.current_measurement_record();
-
-      // make sure the order is the same with other simulators
-      std::sort(
-          measure_results.begin(), measure_results.end(),
-          [](auto& a, auto& b) { return std::get<1>(a) < std::get<1>(b); });
-
-      for (auto& measure_result : measure_results) {
-        outcome *= 2;
-        outcome += std::get<2>(measure_result);
-      }
+    std::vector<std::pair<size_t, size_t>> terminal_measures(measures.begin(),
+                                                             measures.end());
+    auto counts = cs.sample_terminal_measurements(terminal_measures, shots);
+    for (auto& [outcome, count] : counts) {
+      outcount[outcome] = count;
     }
+    return outcount;
+  }
 
-    if (measures.empty()) {
-      continue;
+  // Without classical control, all the shots follow the same instructions,
+  // sample them in batches of pauli frames
+  if (!classical_control) {
+    frame_simulator<_word_size> fs(circuit.qubit_num());
+    auto counts = fs.sample(clifford_circuit(circuit), shots);
+    for (auto& [outcome, count] : counts) {
+      outcount[outcome] = count;
     }
+    return outcount;
+  }
 
-    if (outcount.find(outcome) != outcount.end())
-      outcount[outcome]++;
-    else
-      outcount[outcome] = 1;
+  // With classical control, the shots are simulated independently in
+  // parallel
+  return simulate_shots<_word_size>(circuit, shots);
+}
 
+py::array_t<complex<double>> statevector_clifford(py::object const& pycircuit) {
+  auto circuit = Circuit(pycircuit);
+  circuit_simulator<_word_size> cs(circuit.qubit_num());
+  for (auto& op : circuit.instructions()) {
+    apply_op(*op, cs);
+  }
+
+  if (circuit.qubit_num() >= 64)
+    throw std::invalid_argument("too many qubits for a state vector");
+  size_t size = size_t(1) << circuit.qubit_num();
+  std::unique_ptr<complex<double>[]> data(new complex<double>[size]());
+  cs.sim_tableau.to_state_vector(data.get());
+  return to_numpy(std::make_tuple(data.release(), size));
+}
+
+py::object expect_clifford(py::object const& pycircuit, py::list const paulis,
+                           const int& shots) {
+  auto circuit = Circuit(pycircuit);
+
+  std::vector<std::pair<std::string, std::vector<size_t>>> observables;
+  for (auto pauli_h : paulis) {
+    py::object pypauli = py::reinterpret_borrow<py::object>(pauli_h);
+    observables.emplace_back(pypauli.attr("paulistr").cast<string>(),
+                             pypauli.attr("pos").cast<std::vector<size_t>>());
+  }
+
+  // The state before the terminal measurements is fixed, otherwise noise,
+  // mid-circuit measurements and resets make it random, and the expectations
+  // are averaged over the trajectories of all the shots
+  bool random_state = !circuit.final_measure();
+  for (auto& op : circuit.instructions()) {
+    random_state |= CLIFFORD_PAULI_CHANNELS.count(op->name()) > 0;
+    random_state |= op->name() == "reset";
+  }
+  uint trajectories = random_state ? std::max(shots, 1) : 1;
+
+  circuit_simulator<_word_size> cs(circuit.qubit_num());
+  std::vector<double> expects(observables.size(), 0.);
+  for (uint i = 0; i < trajectories; i++) {
+    simulate(circuit, cs);
+    auto res = cs.pauli_expectations(observables);
+    for (size_t j = 0; j < res.size(); j++)
+      expects[j] += res[j];
     cs.reset_tableau();
     cs.sim_record.clear();
   }
 
-  return outcount;
+  py::list pyres;
+  for (auto expec : expects)
+    pyres.attr("append")(expec / trajectories);
+  return pyres;
 }
 
 #ifdef _USE_GPU
@@ -275,6 +338,46 @@ py::object expect_statevec(py::array_t<complex<double>> const&np_inputstate, py:
     return pyres;
 }
 
+py::array_t<double> expect_paulis(py::array_t<complex<double>> const& np_inputstate,
+                                  py::array_t<uint64_t, py::array::c_style | py::array::forcecast> const& x,
+                                  py::array_t<uint64_t, py::array::c_style | py::array::forcecast> const& z)
+{
+    // x and z of shape (terms, words) are read in place, the qubits of a state
+    // vector fit in the first word
+    py::buffer_info buf = np_inputstate.request();
+    auto* data_ptr = reinterpret_cast<std::complex<double>*>(buf.ptr);
+    size_t size = buf.size;
+    if (size == 0 || (size & (size - 1)) != 0)
+        throw std::invalid_argument("size of the state must be a power of 2");
+    if (x.ndim() != 2 || z.ndim() != 2 || x.shape(0) != z.shape(0) || x.shape(1) != z.shape(1))
+        throw std::invalid_argument("x and z must have the same shape (terms, words)");
+    size_t num_qubits = 0;
+    while ((size_t(1) << num_qubits) < size)
+        num_qubits++;
+    size_t terms = x.shape(0);
+    size_t words = x.shape(1);
+    auto xs = x.unchecked<2>();
+    auto zs = z.unchecked<2>();
+    for (size_t t = 0; t < terms; t++) {
+        if (words > 0 && ((xs(t, 0) | zs(t, 0)) >> num_qubits) != 0)
+            throw std::invalid_argument("pauli out of the qubits of the state");
+        for (size_t w = 1; w < words; w++)
+            if (xs(t, w) || zs(t, w))
+                throw std::invalid_argument("pauli out of the qubits of the state");
+    }
+
+    py::array_t<double> res(terms);
+    auto out = res.mutable_unchecked<1>();
+    StateVector<double> state(data_ptr, buf.size);
+    {
+        py::gil_scoped_release release;
+        for (size_t t = 0; t < terms; t++)
+            out(t) = state.expect_pauli_mask(xs(t, 0), zs(t, 0));
+    }
+    state.move_data_to_python();
+    return res;
+}
+
 PYBIND11_MODULE(qfvm, m) {
   m.doc() = "Qfvm simulator";
   m.def("simulate_circuit", &simulate_circuit, "Simulate with circuit",
@@ -285,12 +388,26 @@ PYBIND11_MODULE(qfvm, m) {
         "Simulate with circuit using clifford", py::arg("circuit"),
         py::arg("shots"));
 
+  m.def("statevector_clifford", &statevector_clifford,
+        "State vector of a clifford circuit without measurement",
+        py::arg("circuit"));
+
+  m.def("expect_clifford", &expect_clifford,
+        "Calculate paulis expectation using clifford", py::arg("circuit"),
+        py::arg("paulis"), py::arg("shots"));
+
   m.def("expect_statevec", &expect_statevec, "Calculate paulis expectation", py::arg("inputstate"), py::arg("paulis"));
 
+  m.def("expect_paulis", &expect_paulis, "Calculate expectations of paulis given by their x and z bits", py::arg("inputstate"), py::arg("x"), py::arg("z"));
+
   m.def("applyop_statevec", &applyop_statevec, "Apply single operator to state", py::arg("operation"), py::arg("inputstate"));
 
   m.def("sampling_statevec", &sampling_statevec, "sampling state", py::arg("measures"), py::arg("inputstate"), py::arg("shots"));
 
+  m.def("marginal_probabilities", &marginal_probabilities, "Marginal probabilities of qubits", py::arg("inputstate"), py::arg("qubits"));
+
+  m.def("reduced_density_matrix", &reduced_density_matrix, "Reduced density matrix of qubits", py::arg("inputstate"), py::arg("qubits"));
+
 
 #ifdef _USE_GPU
   m.def("simulate_circuit_gpu", &simulate_circuit_gpu, "Simulate with circuit",
@@ -2,10 +2,13 @@
 
 #include "circuit.hpp"
 #include "clifford_simulator.h"
+#include "frame_simulator.h"
 #include "qasm.hpp"
 #include "statevector.hpp"
 #include "types.hpp"
 #include <cstddef>
+#include <map>
+#include <random>
 #include <vector>
 
 void apply_op_general(StateVector<data_t> & state, Instruction const& op){
@@ -128,6 +131,39 @@ void simulate(Circuit & circuit, StateVector<data_t>& state) {
 
 
 //--------clifford simulator-----------------
+// pauli channels of pyquafu and the error gates of the clifford simulator
+const std::unordered_map<string, string> CLIFFORD_PAULI_CHANNELS{
+    {"bitflip", "x_error"},
+    {"dephasing", "z_error"},
+    {"depolarizing", "depolarize1"}};
+
+// gates of pyquafu whose name differs in the clifford simulator
+const std::unordered_map<string, string> CLIFFORD_GATE_ALIASES{
+    {"sdg", "s_dag"},
+    {"id", "i"}};
+
+string clifford_gate_name(const string& name) {
+  auto it = CLIFFORD_GATE_ALIASES.find(name);
+  return it == CLIFFORD_GATE_ALIASES.end() ? name : it->second;
+}
+
+// check the condition of cif with the latest measurement result of each cbit
+template <size_t word_size>
+bool check_cif(const circuit_simulator<word_size>& cs,
+               const vector<pos_t>& cbits, const uint condition) {
+  std::unordered_map<size_t, bool> creg;
+  for (auto& record : cs.current_measurement_record().storage) {
+    creg[std::get<1>(record)] = std::get<2>(record);
+  }
+  uint out = 0;
+  for (auto cbit : cbits) {
+    out *= 2;
+    auto it = creg.find(cbit);
+    out += it != creg.end() && it->second;
+  }
+  return out == condition;
+}
+
 template <size_t word_size>
 void apply_measure(circuit_simulator<word_size>& cs, const vector<pos_t>& qbits,
                    const vector<pos_t>& cbits) {
@@ -141,20 +177,29 @@ void apply_measure(circuit_simulator<word_size>& cs, const vector<pos_t>& qbits,
 template <size_t word_size>
 void apply_op(Instruction& op, circuit_simulator<word_size>& cs) {
   // TODO: support args
-  switch (OPMAP.at(op.name())) {
-  case Opname::measure:
+  if (op.name() == "measure") {
     apply_measure(cs, op.qbits(), op.cbits());
-    break;
-  case Opname::reset:
+  } else if (op.name() == "reset") {
     for (auto qubit : op.qbits()) {
       cs.do_circuit_instruction(
           {"reset", std::vector<size_t>{static_cast<size_t>(qubit)}});
     }
-    break;
-  default:
+  } else if (CLIFFORD_PAULI_CHANNELS.count(op.name())) {
+    auto qubits = op.positions();
+    cs.do_circuit_instruction(
+        {CLIFFORD_PAULI_CHANNELS.at(op.name()),
+         std::vector<size_t>(qubits.begin(), qubits.end()), op.paras()});
+  } else if (op.name() == "cif") {
+    if (check_cif(cs, op.cbits(), op.condition())) {
+      for (const auto& op_h : op.instructions()) {
+        apply_op(*op_h, cs);
+      }
+    }
+  } else {
     auto qubits = op.positions();
     cs.do_circuit_instruction(
-        {op.name(), std::vector<size_t>(qubits.begin(), qubits.end())});
+        {clifford_gate_name(op.name()),
+         std::vector<size_t>(qubits.begin(), qubits.end())});
   }
 }
 
@@ -168,3 +213,92 @@ void simulate(Circuit & circuit, circuit_simulator<word_size>& cs) {
     apply_op(*op, cs);
   }
 }
+
+// number of shots of a chunk of the parallel shot executor, the shots of a
+// chunk share a random number generator
+const size_t CLIFFORD_SHOT_CHUNK = 64;
+
+// simulate the shots independently, e.g. for circuits with classical control
+// args:
+//   circuit: the quantum circuit, its measurements are simulated
+//   shots: the number of shots
+//   seed: the random seed, the chunk of shots i is seeded by (seed, i), so the
+//   outcomes do not depend on the number of threads
+// return:
+//   the counts of the outcomes, whose bits are the latest results of the
+//   measured cbits, ordered by cbit with the smallest cbit being the most
+//   significant bit
+template <size_t word_size>
+std::map<uint, uint> simulate_shots(Circuit& circuit, size_t shots,
+                                    size_t seed = 42) {
+  std::map<uint, uint> outcount;
+  long long num_chunks = (shots + CLIFFORD_SHOT_CHUNK - 1) / CLIFFORD_SHOT_CHUNK;
+
+#pragma omp parallel if (num_chunks > 1)
+  {
+    // the tableau of each thread is reset in place between the shots
+    circuit_simulator<word_size> cs(circuit.qubit_num());
+    std::map<uint, uint> local_count;
+
+#pragma omp for schedule(dynamic)
+    for (long long chunk = 0; chunk < num_chunks; chunk++) {
+      std::seed_seq seq{seed, static_cast<size_t>(chunk)};
+      cs.rng.seed(seq);
+      size_t begin = chunk * CLIFFORD_SHOT_CHUNK;
+      size_t end = std::min(shots, begin + CLIFFORD_SHOT_CHUNK);
+      for (size_t i = begin; i < end; i++) {
+        cs.reset_tableau();
+        cs.sim_record.clear();
+        simulate(circuit, cs);
+
+        std::map<size_t, bool> creg;
+        for (auto& measure_result : cs.current_measurement_record().storage) {
+          creg[std::get<1>(measure_result)] = std::get<2>(measure_result);
+        }
+        uint outcome = 0;
+        for (auto& [cbit, result] : creg) {
+          outcome *= 2;
+          outcome += result;
+        }
+        local_count[outcome]++;
+      }
+    }
+
+#pragma omp critical
+    for (auto& [outcome, count] : local_count) {
+      outcount[outcome] += count;
+    }
+  }
+  return outcount;
+}
+
+// convert circuit to the instruction set of the clifford simulator, the
+// measurements keep their cbits as arguments
+quantum_circuit clifford_circuit(Circuit& circuit) {
+  quantum_circuit qc;
+  for (auto& op : circuit.instructions()) {
+    if (op->name() == "measure") {
+      auto qbits = op->qbits();
+      auto cbits = op->cbits();
+      for (size_t i = 0; i < qbits.size(); i++) {
+        qc.append("measure", {qbits[i]}, {static_cast<double>(cbits[i])});
+      }
+    } else if (op->name() == "reset") {
+      for (auto qubit : op->qbits()) {
+        qc.append("reset", {qubit});
+      }
+    } else if (op->name() == "cif") {
+      throw std::runtime_error(
+          "classical control can not be converted to clifford circuit");
+    } else {
+      auto qubits = op->positions();
+      std::vector<size_t> targets(qubits.begin(), qubits.end());
+      if (CLIFFORD_PAULI_CHANNELS.count(op->name())) {
+        qc.append(CLIFFORD_PAULI_CHANNELS.at(op->name()), targets, op->paras());
+      } else {
+        qc.append(clifford_gate_name(op->name()), targets);
+      }
+    }
+  }
+  return qc;
+}
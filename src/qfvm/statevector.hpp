@@ -5,6 +5,7 @@
 #include <cmath>
 #include <functional>
 #include <iostream>
+#include <map>
 #include <omp.h>
 #include <random>
 #include <stdlib.h>
@@ -92,11 +93,20 @@ public:
 
   // Expectation and measurement
   double expect_pauli(string paulistr, vector<pos_t> const& posv);
-  std::unordered_map<std::string, int> measure_samples(vector<std::pair<uint, uint>> meas, int shots);
+  // expectation of the pauli with bit q of x_mask and z_mask being its x and z
+  // parts on qubit q, Y being both
+  double expect_pauli_mask(size_t x_mask, size_t z_mask) const;
+  // sample measurement outcomes, the bits of an outcome are ordered by cbit
+  // with the smallest cbit being the most significant bit
+  std::map<uint64_t, uint64_t> measure_samples(vector<std::pair<uint, uint>> const& meas, int shots);
   
   // Measure and Reset
   std::pair<uint, double> sample_measure_probs(vector<pos_t> const& qbits);
   vector<double> probabilities() const;
+  // marginal probabilities and reduced density matrix of qubits, qubits[0]
+  // being the most significant bit of the result
+  vector<double> marginal_probabilities(vector<pos_t> const& qubits) const;
+  vector<complex<double>> reduced_density_matrix(vector<pos_t> const& qubits) const;
   void apply_diagonal_matrix(vector<pos_t> const& qbits,
                              vector<std::complex<double>> const& mdiag);
   void update(vector<pos_t> const& qbits, const uint final_state,
@@ -1049,6 +1059,64 @@ vector<double> StateVector<real_t>::probabilities() const {
 
 
 
+template <class real_t>
+vector<double> StateVector<real_t>::marginal_probabilities(vector<pos_t> const& qubits) const {
+  const size_t k = qubits.size();
+  vector<double> probs(1ULL << k, 0.);
+#pragma omp parallel if (size_ > (1ULL << 16))
+  {
+    vector<double> local(1ULL << k, 0.);
+#pragma omp for
+    for (long long j = 0; j < (long long)size_; j++) {
+      size_t index = 0;
+      for (size_t i = 0; i < k; i++)
+        index = (index << 1) | ((j >> qubits[i]) & 1);
+      local[index] += std::norm(data_[j]);
+    }
+#pragma omp critical
+    for (size_t i = 0; i < local.size(); i++)
+      probs[i] += local[i];
+  }
+  return probs;
+}
+
+template <class real_t>
+vector<complex<double>> StateVector<real_t>::reduced_density_matrix(vector<pos_t> const& qubits) const {
+  const size_t k = qubits.size();
+  const size_t dim = 1ULL << k;
+  // offset of each basis state of the qubits in the state vector
+  vector<size_t> offsets(dim, 0);
+  for (size_t a = 0; a < dim; a++)
+    for (size_t i = 0; i < k; i++)
+      if ((a >> (k - 1 - i)) & 1)
+        offsets[a] |= 1ULL << qubits[i];
+  const size_t mask = offsets[dim - 1];
+
+  // the upper triangle, summed over the indices with all the qubits being 0
+  vector<complex<double>> rho(dim * dim, 0.);
+#pragma omp parallel if (size_ > (1ULL << 16))
+  {
+    vector<complex<double>> local(dim * dim, 0.);
+#pragma omp for
+    for (long long j = 0; j < (long long)size_; j++) {
+      if (j & mask)
+        continue;
+      for (size_t a = 0; a < dim; a++) {
+        complex<double> amp = data_[j | offsets[a]];
+        for (size_t b = a; b < dim; b++)
+          local[a * dim + b] += amp * std::conj(complex<double>(data_[j | offsets[b]]));
+      }
+    }
+#pragma omp critical
+    for (size_t i = 0; i < local.size(); i++)
+      rho[i] += local[i];
+  }
+  for (size_t a = 0; a < dim; a++)
+    for (size_t b = 0; b < a; b++)
+      rho[a * dim + b] = std::conj(rho[b * dim + a]);
+  return rho;
+}
+
 vector<std::complex<double>> convert(const vector<std::complex<double>>& v) {
   vector<std::complex<double>> ret(v.size(), 0.);
   for (size_t i = 0; i < v.size(); ++i)
@@ -1280,8 +1348,6 @@ double StateVector<real_t>::expect_pauli(string paulistr,
                                          vector<pos_t> const& posv) {
   size_t flip_mask = 0;
   size_t z_mask = 0;
-  size_t y_phase_num = 0;
-  uint flip_q = 0;
 
   for (uint i = 0; i < posv.size(); i++) {
     uint q = posv[i];
@@ -1290,13 +1356,10 @@ double StateVector<real_t>::expect_pauli(string paulistr,
       break;
     case 'X': {
       flip_mask += 1ll << q;
-      flip_q = std::max(flip_q, q);
       break;
     }
     case 'Y': {
       flip_mask += 1ll << q;
-      flip_q = std::max(flip_q, q);
-      y_phase_num++;
       z_mask += 1ll << q;
       break;
     }
@@ -1307,6 +1370,12 @@ double StateVector<real_t>::expect_pauli(string paulistr,
     }
   }
 
+  return expect_pauli_mask(flip_mask, z_mask);
+}
+
+template <class real_t>
+double StateVector<real_t>::expect_pauli_mask(size_t flip_mask,
+                                              size_t z_mask) const {
   if (!flip_mask) {
     size_t rsize = size_;
     double val = 0.;
@@ -1318,6 +1387,8 @@ double StateVector<real_t>::expect_pauli(string paulistr,
     }
     return val;
   } else {
+    uint flip_q = 63 - __builtin_clzll(flip_mask);
+    size_t y_phase_num = __builtin_popcountll(flip_mask & z_mask);
     double val = 0.;
     size_t rsize = size_ >> 1;
 #pragma omp parallel for reduction(+ : val)
@@ -1411,34 +1482,47 @@ void StateVector<real_t>::apply_reset(vector<pos_t> const& qbits) {
 
  //sample results
 template <class real_t>
-std::unordered_map<std::string, int> StateVector<real_t>::measure_samples(vector<std::pair<uint, uint>> meas, int shots){
-    std::unordered_map<std::string, int> counts;
+std::map<uint64_t, uint64_t> StateVector<real_t>::measure_samples(vector<std::pair<uint, uint>> const& meas, int shots){
+    std::map<uint64_t, uint64_t> counts;
+    if (shots <= 0 || meas.empty())
+        return counts;
+
+    // position of each cbit among the measured cbits
+    std::map<uint, uint> ranks;
+    for (auto& it : meas)
+        ranks[it.second] = 0;
+    uint num_bits = 0;
+    for (auto& it : ranks)
+        it.second = num_bits++;
+
+    // sweep the cumulative probabilities once with the sorted random numbers,
+    // the samples come out sorted by basis index
     auto rands = Qfutil::randomDoubleArr(shots);
-
-#pragma omp for
-    for (int i = 0;i < shots;++i){
-        std::string bitstring(meas.size(), '0');
-        double rand = rands[i];
-        double p = .0;
-        size_t sample;
-        for (sample = 0;sample < size_;++sample){
-            p += std::real(data_[sample] * std::conj(data_[sample]));
-            if (rand < p){
+    std::sort(rands.begin(), rands.end());
+    vector<std::pair<size_t, uint64_t>> samples;
+    double p = .0;
+    size_t sample = 0;
+    for (double rand : rands){
+        while (sample + 1 < size_){
+            double next = p + std::norm(data_[sample]);
+            if (rand < next)
                 break;
-            }
-        }
-        for (auto it : meas){
-            size_t bit = (sample >> it.first) & 1;
-            bitstring.replace(it.second, 1, std::to_string(bit).c_str());
+            p = next;
+            sample++;
         }
-        
-        if (counts.count(bitstring) > 0){
-#pragma omp atomic
-            counts[bitstring] += 1;
-        }else{
-#pragma omp critical
-        counts[bitstring] = 1;
+        if (!samples.empty() && samples.back().first == sample)
+            samples.back().second++;
+        else
+            samples.push_back(std::make_pair(sample, 1));
+    }
+
+    for (auto& [index, count] : samples){
+        uint64_t outcome = 0;
+        for (auto& it : meas){
+            if ((index >> it.first) & 1)
+                outcome |= uint64_t(1) << (num_bits - 1 - ranks[it.second]);
         }
+        counts[outcome] += count;
     }
     return counts;
 }
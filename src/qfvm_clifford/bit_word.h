@@ -505,6 +505,7 @@ template <> struct bit_word<256> {
                                    (__m256i*)data, stride);
     inplace_transpose_256_step<32>(_mm256_set1_epi64x(0x00000000FFFFFFFFull),
                                    (__m256i*)data, stride);
+    inplace_transpose_64_and_128_step(data, stride);
   }
 };
 #endif
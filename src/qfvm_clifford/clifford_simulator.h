@@ -6,7 +6,10 @@
 #include "table.h"
 #include "tableau.h"
 #include <cstddef>
+#include <cstdint>
 #include <ios>
+#include <map>
+#include <numeric>
 #include <ostream>
 #include <tuple>
 
@@ -111,6 +114,10 @@ template <size_t word_size> struct circuit_simulator {
         std::bernoulli_distribution d(ci.args[0]);
         if (d(rng))
           unpack_vector<1>(pair.second, sim_tableau, ci.targets);
+      } else if (PAULI_CHANNEL_GATE == pair.first) {
+        std::bernoulli_distribution d(ci.args[0]);
+        if (d(rng))
+          unpack_vector<1>(pair.second, sim_tableau, ci.targets, rng);
       } else {
         throw std::runtime_error("unknown gate");
       }
@@ -139,6 +146,10 @@ template <size_t word_size> struct circuit_simulator {
       std::bernoulli_distribution d(ci.args[0]);
       if (d(rng))
         unpack_vector<1>(pair.second, sim_tableau, ci.targets);
+    } else if (PAULI_CHANNEL_GATE == pair.first) {
+      std::bernoulli_distribution d(ci.args[0]);
+      if (d(rng))
+        unpack_vector<1>(pair.second, sim_tableau, ci.targets, rng);
     } else {
       throw std::runtime_error("unknown gate");
     }
@@ -153,6 +164,145 @@ template <size_t word_size> struct circuit_simulator {
     }
   }
 
+  // basis of the directions along which terminal Z-basis measurements vary
+  //
+  // Measuring Z[qubit] on the current state is the same as measuring
+  // stabilizer[qubit] on |0...0>. A random Z-type frame Z^v leaves |0...0>
+  // invariant, and it flips the outcome of stabilizer[qubit] exactly when v
+  // hits the x part of it. So the outcomes vary along the column space of the
+  // (measurements x qubits) matrix of x parts, which is reduced here by
+  // gaussian elimination.
+  // args:
+  //   qubits: the measured qubits, in the order of the outcome bits
+  // return:
+  //   the generators, each one is a bit mask over the outcome bits
+  std::vector<packed_bit_word<word_size>>
+  terminal_measurement_generators(const std::vector<size_t>& qubits) const {
+    size_t num_measures = qubits.size();
+    std::vector<packed_bit_word_slice<word_size>> xs_rows;
+    for (auto qubit : qubits)
+      xs_rows.push_back(sim_tableau.stabilizer[qubit].xs);
+
+    std::vector<packed_bit_word<word_size>> basis;
+    std::vector<size_t> pivots;
+    packed_bit_word<word_size> column(num_measures);
+    for (size_t k = 0; k < sim_tableau.num_qubits; k++) {
+      if (basis.size() == num_measures)
+        break;
+
+      for (size_t p = 0; p < num_measures; p++)
+        column[p] = xs_rows[p][k];
+
+      // every basis vector is zero at the pivots of its predecessors, so a
+      // single forward pass reduces the column
+      for (size_t b = 0; b < basis.size(); b++)
+        if (column[pivots[b]])
+          column ^= basis[b];
+
+      if (!column.is_not_all_zero())
+        continue;
+
+      size_t pivot = 0;
+      while (!column[pivot])
+        pivot++;
+      basis.push_back(column);
+      pivots.push_back(pivot);
+    }
+
+    return basis;
+  }
+
+  // sample terminal Z-basis measurements from the current tableau, without
+  // simulating the circuit once per sample. The outcomes are uniformly
+  // distributed over the affine subspace reference + span(generators), where
+  // the reference is a single measured outcome. Samples are drawn word_size
+  // at a time, with every bit of a random word being the coefficient of a
+  // generator in one sample. The tableau is collapsed by the reference
+  // measurement.
+  // args:
+  //   measures: the (qubit, cbit) pairs of the terminal measurements
+  //   num_samples: the number of samples
+  // return:
+  //   the counts of the outcomes, whose bits are ordered by cbit with the
+  //   smallest cbit being the most significant bit
+  std::map<uint64_t, size_t> sample_terminal_measurements(
+      const std::vector<std::pair<size_t, size_t>>& measures,
+      size_t num_samples) {
+    std::map<uint64_t, size_t> counts;
+    size_t num_measures = measures.size();
+    if (num_measures == 0 || num_samples == 0)
+      return counts;
+
+    // make sure the order is the same with other simulators
+    std::vector<size_t> order(num_measures);
+    std::iota(order.begin(), order.end(), 0);
+    std::stable_sort(order.begin(), order.end(), [&](size_t a, size_t b) {
+      return measures[a].second < measures[b].second;
+    });
+    std::vector<size_t> qubits;
+    for (auto index : order)
+      qubits.push_back(measures[index].first);
+
+    auto generators = terminal_measurement_generators(qubits);
+    size_t rank = generators.size();
+
+    std::vector<bool> reference(num_measures);
+    for (size_t p = 0; p < num_measures; p++)
+      reference[p] = sim_tableau.measure_gate(rng, qubits[p]).value();
+
+    if (rank == 0) {
+      uint64_t outcome = 0;
+      for (size_t p = 0; p < num_measures; p++)
+        outcome = (outcome << 1) | reference[p];
+      counts[outcome] = num_samples;
+      return counts;
+    }
+
+    // the generators flipping each outcome bit
+    std::vector<std::vector<size_t>> flips(num_measures);
+    for (size_t g = 0; g < rank; g++)
+      for (size_t p = 0; p < num_measures; p++)
+        if (generators[g][p])
+          flips[p].push_back(g);
+
+    packed_bit_word<word_size> coins(rank * word_size);
+    packed_bit_word<word_size> block(num_measures * word_size);
+    for (size_t start = 0; start < num_samples; start += word_size) {
+      coins.randomize(rank * word_size, rng);
+      for (size_t p = 0; p < num_measures; p++) {
+        bit_word<word_size> word{};
+        for (auto g : flips[p])
+          word ^= coins.bw[g];
+        block.bw[p] = word;
+      }
+
+      size_t block_size = std::min(word_size, num_samples - start);
+      for (size_t s = 0; s < block_size; s++) {
+        uint64_t outcome = 0;
+        for (size_t p = 0; p < num_measures; p++)
+          outcome = (outcome << 1) | (block[p * word_size + s] ^ reference[p]);
+        counts[outcome]++;
+      }
+    }
+
+    return counts;
+  }
+
+  // expectation values of pauli observables on the current state
+  // args:
+  //   observables: the (paulis, qubits) pairs of the observables
+  // return:
+  //   the expectation of each observable, which is 0 or +-1
+  std::vector<int> pauli_expectations(
+      const std::vector<std::pair<std::string, std::vector<size_t>>>&
+          observables) const {
+    std::vector<int> expectations;
+    expectations.reserve(observables.size());
+    for (auto& [paulis, qubits] : observables)
+      expectations.push_back(sim_tableau.expectation(paulis, qubits));
+    return expectations;
+  }
+
   // reset the tableau to identity
   void reset_tableau() { sim_tableau.reset(); }
 
@@ -0,0 +1,273 @@
+#ifndef FRAME_SIMULATOR_H_
+#define FRAME_SIMULATOR_H_
+
+#include "circuit.h"
+#include "clifford_simulator.h"
+#include "packed_bit_word.h"
+#include "span_ref.h"
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
+#include <map>
+#include <random>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+// operation type of pauli frame simulator
+// FRAME_IDENTITY: operations that do not change the frame, e.g. pauli gates
+// FRAME_H, FRAME_H_YZ, FRAME_S, FRAME_CX, FRAME_SWAP: clifford gates
+// FRAME_MZ, FRAME_MX, FRAME_MY: measurements
+// FRAME_RESET: z-basis reset
+// FRAME_X_ERROR, FRAME_Y_ERROR, FRAME_Z_ERROR, FRAME_DEPOLARIZE1: pauli noise
+enum frame_op_type {
+  FRAME_IDENTITY,
+  FRAME_H,
+  FRAME_H_YZ,
+  FRAME_S,
+  FRAME_CX,
+  FRAME_SWAP,
+  FRAME_MZ,
+  FRAME_MX,
+  FRAME_MY,
+  FRAME_RESET,
+  FRAME_X_ERROR,
+  FRAME_Y_ERROR,
+  FRAME_Z_ERROR,
+  FRAME_DEPOLARIZE1
+};
+
+// the frame operation of each gate in gate map. A frame ignores signs, so the
+// pauli gates do not change it, and s, s_dag act the same on it.
+inline const std::unordered_map<std::string, frame_op_type> frame_op_map = {
+    {"i", FRAME_IDENTITY},
+    {"x", FRAME_IDENTITY},
+    {"y", FRAME_IDENTITY},
+    {"z", FRAME_IDENTITY},
+    {"h", FRAME_H},
+    {"h_yz", FRAME_H_YZ},
+    {"s", FRAME_S},
+    {"s_dag", FRAME_S},
+    {"cnot", FRAME_CX},
+    {"cx", FRAME_CX},
+    {"swap", FRAME_SWAP},
+    {"m", FRAME_MZ},
+    {"measure", FRAME_MZ},
+    {"mz", FRAME_MZ},
+    {"mx", FRAME_MX},
+    {"my", FRAME_MY},
+    {"r", FRAME_RESET},
+    {"reset", FRAME_RESET},
+    {"x_error", FRAME_X_ERROR},
+    {"y_error", FRAME_Y_ERROR},
+    {"z_error", FRAME_Z_ERROR},
+    {"depolarize1", FRAME_DEPOLARIZE1},
+};
+
+// circuit instruction compiled for the frame simulator
+struct frame_instruction {
+  frame_op_type op;
+  span_ref<const size_t> targets;
+  // probability of the error, only used by noise
+  double probability;
+
+  bool is_noise() const { return op >= FRAME_X_ERROR; }
+};
+
+// Pauli frame simulator, samples a batch of word_size shots at once.
+//
+// A noiseless reference sample is taken with the tableau simulator. Each shot
+// is then represented by a pauli frame, the pauli operator by which its state
+// differs from the reference state. Clifford gates conjugate the frame, noise
+// multiplies random paulis into it, and a measurement result is the reference
+// result flipped by the frame. All the shots of a batch are propagated
+// together, one bit of a word for each shot.
+//
+// The frame simulation is only valid when the circuit has no classical
+// control, since the shots can not take different branches.
+//
+// Reference: https://arxiv.org/abs/2103.02202
+template <size_t word_size> struct frame_simulator {
+  size_t num_qubits;
+
+  // x and z parts of the frames, the word of a qubit holds one bit for each
+  // shot of the batch
+  packed_bit_word<word_size> xs, zs;
+
+  // flips of the measurement results relative to the reference sample
+  packed_bit_word<word_size> record_flips;
+  size_t num_recorded;
+
+  std::mt19937_64 rng;
+
+  explicit frame_simulator(size_t num_qubits, size_t seed = 42)
+      : num_qubits(num_qubits), xs(num_qubits * word_size),
+        zs(num_qubits * word_size), record_flips(0), num_recorded(0), rng() {
+    rng.seed(seed);
+  }
+
+  // compile the quantum circuit to frame instructions
+  static std::vector<frame_instruction> compile(const quantum_circuit& qc) {
+    std::vector<frame_instruction> program;
+    qc.for_each_circuit_instruction([&](const circuit_instruction& ci) {
+      auto it = frame_op_map.find(ci.gate);
+      if (it == frame_op_map.end()) {
+        throw std::runtime_error("unknown gate");
+      }
+      double probability = ci.args.empty() ? 0.0 : ci.args[0];
+      program.push_back({it->second, ci.targets, probability});
+    });
+    return program;
+  }
+
+  // start a new batch. The z part is randomized, which does not change the
+  // initial state |0...0>, but randomizes the results of measurements that are
+  // not deterministic.
+  void reset_frame() {
+    for (size_t q = 0; q < num_qubits; q++) {
+      xs.bw[q] = bit_word<word_size>{};
+      zs.slice(q, 1).randomize(word_size, rng);
+    }
+    num_recorded = 0;
+  }
+
+  // call body with the index of each shot of the batch that is hit by an error
+  // with given probability, by skipping the shots without error
+  template <typename func> void for_each_error(double probability, func body) {
+    if (probability <= 0)
+      return;
+    if (probability >= 1) {
+      for (size_t s = 0; s < word_size; s++)
+        body(s);
+      return;
+    }
+    std::geometric_distribution<size_t> skip(probability);
+    for (size_t s = skip(rng); s < word_size; s += skip(rng) + 1)
+      body(s);
+  }
+
+  // do a frame instruction
+  void do_instruction(const frame_instruction& fi) {
+    size_t q = fi.targets[0];
+    switch (fi.op) {
+    case FRAME_IDENTITY:
+      break;
+    case FRAME_H:
+      std::swap(xs.bw[q], zs.bw[q]);
+      break;
+    case FRAME_H_YZ:
+      xs.bw[q] ^= zs.bw[q];
+      break;
+    case FRAME_S:
+      zs.bw[q] ^= xs.bw[q];
+      break;
+    case FRAME_CX:
+      xs.bw[fi.targets[1]] ^= xs.bw[q];
+      zs.bw[q] ^= zs.bw[fi.targets[1]];
+      break;
+    case FRAME_SWAP:
+      std::swap(xs.bw[q], xs.bw[fi.targets[1]]);
+      std::swap(zs.bw[q], zs.bw[fi.targets[1]]);
+      break;
+    case FRAME_MZ:
+      record_flips.bw[num_recorded++] = xs.bw[q];
+      zs.slice(q, 1).randomize(word_size, rng);
+      break;
+    case FRAME_MX:
+      record_flips.bw[num_recorded++] = zs.bw[q];
+      xs.slice(q, 1).randomize(word_size, rng);
+      break;
+    case FRAME_MY: {
+      record_flips.bw[num_recorded++] = xs.bw[q] ^ zs.bw[q];
+      packed_bit_word<word_size> coins(word_size);
+      coins.randomize(word_size, rng);
+      xs.bw[q] ^= coins.bw[0];
+      zs.bw[q] ^= coins.bw[0];
+      break;
+    }
+    case FRAME_RESET:
+      xs.bw[q] = bit_word<word_size>{};
+      zs.slice(q, 1).randomize(word_size, rng);
+      break;
+    case FRAME_X_ERROR:
+      for_each_error(fi.probability,
+                     [&](size_t s) { xs[q * word_size + s] ^= true; });
+      break;
+    case FRAME_Y_ERROR:
+      for_each_error(fi.probability, [&](size_t s) {
+        xs[q * word_size + s] ^= true;
+        zs[q * word_size + s] ^= true;
+      });
+      break;
+    case FRAME_Z_ERROR:
+      for_each_error(fi.probability,
+                     [&](size_t s) { zs[q * word_size + s] ^= true; });
+      break;
+    case FRAME_DEPOLARIZE1: {
+      std::uniform_int_distribution<int> pauli(1, 3);
+      for_each_error(fi.probability, [&](size_t s) {
+        int p = pauli(rng);
+        xs[q * word_size + s] ^= bool(p & 1);
+        zs[q * word_size + s] ^= bool(p & 2);
+      });
+      break;
+    }
+    }
+  }
+
+  // sample the quantum circuit
+  // args:
+  //   qc: the quantum circuit, measurements carry their cbit as argument
+  //   num_samples: the number of samples
+  // return:
+  //   the counts of the outcomes, whose bits are ordered by cbit with the
+  //   smallest cbit being the most significant bit
+  std::map<uint64_t, size_t> sample(const quantum_circuit& qc,
+                                    size_t num_samples) {
+    auto program = compile(qc);
+
+    // noiseless reference sample
+    circuit_simulator<word_size> cs(num_qubits, rng());
+    for (size_t i = 0; i < program.size(); i++) {
+      if (!program[i].is_noise())
+        cs.do_circuit_instruction(qc.instr_list[i]);
+    }
+    auto reference = cs.current_measurement_record();
+
+    std::map<uint64_t, size_t> counts;
+    size_t num_measures = reference.size();
+    if (num_measures == 0 || num_samples == 0)
+      return counts;
+
+    // the latest measurement of each cbit, ordered by cbit to be the same
+    // with other simulators
+    std::map<size_t, size_t> latest;
+    for (size_t index = 0; index < num_measures; index++)
+      latest[std::get<1>(reference[index])] = index;
+    std::vector<size_t> order;
+    for (auto& [cbit, index] : latest)
+      order.push_back(index);
+
+    record_flips = packed_bit_word<word_size>(num_measures * word_size);
+    for (size_t start = 0; start < num_samples; start += word_size) {
+      reset_frame();
+      for (auto& fi : program)
+        do_instruction(fi);
+
+      size_t block_size = std::min(word_size, num_samples - start);
+      for (size_t s = 0; s < block_size; s++) {
+        uint64_t outcome = 0;
+        for (auto index : order) {
+          bool flip = record_flips[index * word_size + s];
+          outcome = (outcome << 1) | (flip ^ std::get<2>(reference[index]));
+        }
+        counts[outcome]++;
+      }
+    }
+
+    return counts;
+  }
+};
+
+#endif
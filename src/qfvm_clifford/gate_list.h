@@ -41,19 +41,36 @@ ERROR_QUBIT_GATE(z_error, {
   return {};
 })
 
+// Single qubit depolarizing error, applies X, Y or Z uniformly at random. The
+// probability of the error is handled by the simulator.
+PAULI_CHANNEL_GATE(depolarize1, {
+  switch (std::uniform_int_distribution<int>(0, 2)(rng)) {
+  case 0:
+    t.x_error_gate(qubit);
+    break;
+  case 1:
+    t.y_error_gate(qubit);
+    break;
+  default:
+    t.z_error_gate(qubit);
+  }
+  return {};
+})
+
 SINGLE_QUBIT_GATE(h_yz, {
   t.stabilizer[qubit].mul_ignore_anti_commute(t.distabilizer[qubit]);
   t.z_gate(qubit);
   return {};
 })
 
-SINGLE_QUBIT_GATE(s_dag, {
+// The tableau is inverse, so the S gate maps the X observable to -Y
+SINGLE_QUBIT_GATE(s, {
   t.distabilizer[qubit].mul_ignore_anti_commute(t.stabilizer[qubit]);
   return {};
 })
 
-SINGLE_QUBIT_GATE(s, {
-  t.s_dag_gate(qubit);
+SINGLE_QUBIT_GATE(s_dag, {
+  t.s_gate(qubit);
   t.z_gate(qubit);
   return {};
 })
@@ -244,3 +261,4 @@ COLLAPSING_GATE(reset, {
 #undef TWO_QUBIT_GATE
 #undef COLLAPSING_GATE
 #undef ERROR_QUBIT_GATE
+#undef PAULI_CHANNEL_GATE
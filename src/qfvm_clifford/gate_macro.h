@@ -20,6 +20,11 @@
   template <size_t word_size>                                                  \
   result GATE_NAME##_gate(tableau<word_size>& t, const size_t qubit)           \
       __VA_ARGS__
+
+#define PAULI_CHANNEL_GATE(GATE_NAME, ...)                                     \
+  template <size_t word_size>                                                  \
+  result GATE_NAME##_gate(tableau<word_size>& t, std::mt19937_64& rng,         \
+                          const size_t qubit) __VA_ARGS__
 #endif
 
 #ifdef STRUCT_FUNCTION_REGISTRATION
@@ -46,6 +51,12 @@
     tableau<word_size>& t = *this;                                             \
     __VA_ARGS__                                                                \
   }
+
+#define PAULI_CHANNEL_GATE(GATE_NAME, ...)                                     \
+  result GATE_NAME##_gate(std::mt19937_64& rng, const size_t qubit) {          \
+    tableau<word_size>& t = *this;                                             \
+    __VA_ARGS__                                                                \
+  }
 #endif
 
 #ifdef GATE_MAP_REGISTRATION
@@ -62,4 +73,8 @@
 #define ERROR_QUBIT_GATE(GATE_NAME, ...)                                       \
   {STRINGIZE(GATE_NAME##_gate),                                                \
              {ERROR_QUBIT_GATE, GATE_NAME##_gate<word_size>}},
+
+#define PAULI_CHANNEL_GATE(GATE_NAME, ...)                                     \
+  {STRINGIZE(GATE_NAME##_gate),                                                \
+             {PAULI_CHANNEL_GATE, GATE_NAME##_gate<word_size>}},
 #endif
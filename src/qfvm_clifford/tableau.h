@@ -7,13 +7,17 @@
 #include "pauli_slice.h"
 #include "table.h"
 #include <algorithm>
+#include <bit>
 #include <cmath>
+#include <complex>
 #include <cstddef>
 #include <cstdint>
+#include <cstring>
 #include <functional>
 #include <math.h>
 #include <optional>
 #include <random>
+#include <stdexcept>
 #include <string>
 #include <unordered_map>
 #include <variant>
@@ -30,11 +34,14 @@ template <size_t word_size> struct tableau;
 // TWO_QUBIT_GATE: two qubit gate
 // COLLAPSING_GATE: measurement gate
 // ERROR_QUBIT_GATE: error gate, which has some probability to apply the gate
+// PAULI_CHANNEL_GATE: error gate, which has some probability to apply a random
+// pauli gate
 enum gate_type {
   SINGLE_QUBIT_GATE,
   TWO_QUBIT_GATE,
   COLLAPSING_GATE,
-  ERROR_QUBIT_GATE
+  ERROR_QUBIT_GATE,
+  PAULI_CHANNEL_GATE
 };
 
 // quantum gate function return type
@@ -46,7 +53,7 @@ using result = std::optional<bool>;
 // The type is used to represent the all the quantum gate function type, which
 // is for store gate map. The first type is for single qubit gate and error
 // qubit gate, the second type is for two qubit gate, the third type is for
-// collasping gate
+// collasping gate and pauli channel gate
 template <size_t word_size>
 using func_type = std::variant<
     std::function<result(tableau<word_size>& t, const size_t qubit)>,
@@ -152,7 +159,18 @@ template <size_t word_size> struct tableau {
     return tableau<word_size>(num_qubits);
   }
 
-  void reset() { *this = tableau<word_size>(num_qubits); }
+  // reset to the identity tableau in place, which keeps the allocated tables
+  void reset() {
+    for (auto* t : {&distabilizer, &stabilizer}) {
+      for (auto* bits : {&t->xs_t.data, &t->zs_t.data, &t->signs}) {
+        std::memset(bits->u8, 0, bits->num_bit_words * word_size / 8);
+      }
+    }
+    for (size_t q = 0; q < num_qubits; q++) {
+      distabilizer.xs_t[q][q] = true;
+      stabilizer.zs_t[q][q] = true;
+    }
+  }
   void reset(std::mt19937_64& rng, size_t qubit) { r_gate(rng, qubit); }
   // void reset_x(std::mt19937_64& rng, size_t qubit) { rx_gate(rng, qubit); }
   // void reset_y(std::mt19937_64& rng, size_t qubit) { ry_gate(rng, qubit); }
@@ -240,6 +258,145 @@ template <size_t word_size> struct tableau {
     return result;
   }
 
+  // expectation value of a pauli observable, which is 0 or +-1 on a
+  // stabilizer state. The observable is conjugated by the tableau into an
+  // observable on |0...0>, the rows are multiplied word by word. The
+  // expectation is then the sign if the result has no x part, otherwise 0.
+  // args:
+  //   paulis: the pauli operator on each qubit, one of 'I', 'X', 'Y' and 'Z'
+  //   qubits: the qubits of the pauli operators, which should be distinct
+  int expectation(const std::string& paulis,
+                  const std::vector<size_t>& qubits) const {
+    pauli_string<word_size> obs(num_qubits);
+    pauli_string_slice<word_size> obs_slice(obs);
+    for (size_t i = 0; i < qubits.size(); i++) {
+      switch (paulis[i]) {
+      case 'I':
+        break;
+      case 'X':
+        obs_slice *= distabilizer[qubits[i]];
+        break;
+      case 'Y':
+        obs_slice *= eval_y_obs(qubits[i]);
+        break;
+      case 'Z':
+        obs_slice *= stabilizer[qubits[i]];
+        break;
+      default:
+        throw std::invalid_argument("unknown pauli operator");
+      }
+    }
+
+    if (obs.xs.is_not_all_zero())
+      return 0;
+    return obs.sign ? -1 : 1;
+  }
+
+  // write the dense state vector of the stabilizer state into psi, which
+  // should have 2^num_qubits zero-initialized amplitudes. The amplitude of the
+  // basis state b is psi[b], qubit 0 being the least significant bit.
+  //
+  // The state is stabilized by U Z_q U^dagger, whose bits are read from the
+  // inverse tableau through the symplectic inverse, and whose sign is its
+  // expectation value. The generators are reduced so that k of them have
+  // independent x parts and the others are z-only. The z-only generators fix a
+  // basis state b0 in the support, and the state is the uniform superposition
+  // of g|b0> over the 2^k products g of the other generators, which are
+  // enumerated in gray code order with one generator applied per amplitude.
+  void to_state_vector(std::complex<double>* psi) const {
+    if (num_qubits >= 64)
+      throw std::invalid_argument("too many qubits for a state vector");
+
+    // pauli operator i^log_i X^x Z^z
+    struct generator {
+      uint64_t x, z;
+      uint8_t log_i;
+      generator& operator*=(const generator& other) {
+        log_i = (log_i + other.log_i + 2 * std::popcount(z & other.x)) & 3;
+        x ^= other.x;
+        z ^= other.z;
+        return *this;
+      }
+    };
+
+    size_t n = num_qubits;
+    std::vector<generator> gens(n);
+    for (size_t q = 0; q < n; q++) {
+      generator& g = gens[q];
+      g.x = g.z = 0;
+      std::string paulis;
+      std::vector<size_t> qubits;
+      for (size_t j = 0; j < n; j++) {
+        bool x = stabilizer.xs_t[j][q];
+        bool z = distabilizer.xs_t[j][q];
+        g.x |= uint64_t(x) << j;
+        g.z |= uint64_t(z) << j;
+        if (x || z) {
+          paulis.push_back(x ? (z ? 'Y' : 'X') : 'Z');
+          qubits.push_back(j);
+        }
+      }
+      int sign = expectation(paulis, qubits);
+      g.log_i = ((sign < 0 ? 2 : 0) + std::popcount(g.x & g.z)) & 3;
+    }
+
+    // reduce the x parts, the first k generators have independent x parts
+    size_t k = 0;
+    for (size_t q = 0; q < n && k < n; q++) {
+      uint64_t bit = uint64_t(1) << q;
+      size_t pivot = k;
+      while (pivot < n && !(gens[pivot].x & bit))
+        pivot++;
+      if (pivot == n)
+        continue;
+      std::swap(gens[k], gens[pivot]);
+      for (size_t i = 0; i < n; i++) {
+        if (i != k && (gens[i].x & bit))
+          gens[i] *= gens[k];
+      }
+      k++;
+    }
+
+    // reduce the z parts of the z-only generators, then each pivot bit of b0
+    // is fixed by the sign of its generator
+    std::vector<uint64_t> pivots;
+    size_t r = k;
+    for (size_t q = 0; q < n && r < n; q++) {
+      uint64_t bit = uint64_t(1) << q;
+      size_t pivot = r;
+      while (pivot < n && !(gens[pivot].z & bit))
+        pivot++;
+      if (pivot == n)
+        continue;
+      std::swap(gens[r], gens[pivot]);
+      for (size_t i = k; i < n; i++) {
+        if (i != r && (gens[i].z & bit))
+          gens[i] *= gens[r];
+      }
+      pivots.push_back(bit);
+      r++;
+    }
+    uint64_t b0 = 0;
+    for (size_t i = 0; i < pivots.size(); i++) {
+      if (gens[k + i].log_i & 2)
+        b0 |= pivots[i];
+    }
+
+    const std::complex<double> powers[4] = {{1, 0}, {0, 1}, {-1, 0}, {0, -1}};
+    double amplitude = std::pow(2.0, -0.5 * k);
+    uint64_t b = b0;
+    uint8_t log_i = 0;
+    uint64_t num_terms = uint64_t(1) << k;
+    for (uint64_t step = 1;; step++) {
+      psi[b] = amplitude * powers[log_i];
+      if (step == num_terms)
+        break;
+      const generator& g = gens[std::countr_zero(step)];
+      log_i = (log_i + g.log_i + 2 * std::popcount(g.z & b)) & 3;
+      b ^= g.x;
+    }
+  }
+
   // collapse the qubit along z axis
   // args:
   //   t_trans: the transpose of the tableau
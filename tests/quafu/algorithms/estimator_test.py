@@ -80,3 +80,41 @@ class TestEstimator:
         estimator = Estimator(circ)
         expectation = estimator.run(test_ising, None)
         assert math.isclose(expectation, 1.0)
+
+    @pytest.mark.skipif(
+        sys.platform == "darwin", reason="Avoid error on MacOS arm arch."
+    )
+    def test_run_batch_sim(self):
+        circ = QuantumCircuit(2)
+        circ.rx(0, 0.1)
+        circ.ry(1, 0.2)
+        observables = [
+            Hamiltonian([PauliOp("Z0")]),
+            Hamiltonian([PauliOp("Z1")]),
+            Hamiltonian([PauliOp("Z0 Z1"), PauliOp("Z0", 0.5)]),
+        ]
+        params = np.array([[0.3, 1.2], [2.0, -0.7], [0.0, 0.0]])
+        estimator = Estimator(circ)
+        res = estimator.run_batch(observables, params)
+        cos = np.cos(params)
+        expected = np.stack(
+            [cos[:, 0], cos[:, 1], cos[:, 0] * cos[:, 1] + 0.5 * cos[:, 0]], axis=1
+        )
+        assert np.allclose(res, expected)
+        assert np.isclose(estimator.run(observables[2], [0.3, 1.2]), expected[0, 2])
+
+    @patch("quafu.users.userapi.User._load_account_token", autospec=True)
+    @patch("quafu.users.userapi.User.get_available_backends", autospec=True)
+    @patch("quafu.tasks.tasks.Task.send", autospec=True)
+    def test_run_batch(self, mock_send, mock_backends, mock_load_account):
+        """Test Estimator.run_batch on real machines"""
+        mock_send.return_value = TEST_EXE_RES
+        mock_backends.return_value = {"ScQ-P10": None}
+        circ, test_ising = self.build_circuit()
+        estimator = Estimator(circ, backend="ScQ-P10")
+        expectation = estimator.run(test_ising, None)
+        res = estimator.run_batch(
+            [test_ising, test_ising], np.zeros((3, 0)), max_workers=2
+        )
+        assert res.shape == (3, 2)
+        assert np.allclose(res, expectation)
@@ -13,12 +13,16 @@
 # limitations under the License.
 
 import sys
+from unittest.mock import patch
 
+import numpy as np
 import pytest
 from quafu.algorithms.estimator import Estimator
 from quafu.algorithms.gradients import ParamShift
+from quafu.algorithms.gradients.vjp import jacobian, run_circ, vjp
 from quafu.algorithms.hamiltonian import Hamiltonian
 from quafu.circuits.quantum_circuit import QuantumCircuit
+from quafu.elements.element_gates import RZGate
 
 
 class TestParamShift:
@@ -40,3 +44,94 @@ class TestParamShift:
 
         grads = grad(ham, params)
         print(grads)
+
+    @pytest.mark.skipif(
+        sys.platform == "darwin", reason="Avoid error on MacOS arm arch."
+    )
+    def test_jacobian(self):
+        circ = QuantumCircuit(2)
+        circ.rx(0, 0.5)
+        circ.ry(1, 0.5)
+        circ.cnot(0, 1)
+        params = np.array([[0.2, 0.6], [1.0, -0.3]])
+
+        from quafu.algorithms import estimator
+
+        with patch.object(estimator, "simulate", wraps=estimator.simulate) as sim:
+            jac = jacobian(circ, params)
+            # one simulation for each of the 2 * 2 shifted parameter sets of each batch
+            assert sim.call_count == 8
+
+        # <Z0> = cos(a), <Z1> = cos(a) cos(b)
+        a, b = params[:, 0], params[:, 1]
+        expected = np.zeros((2, 2, 2))
+        expected[:, 0, 0] = -np.sin(a)
+        expected[:, 1, 0] = -np.sin(a) * np.cos(b)
+        expected[:, 1, 1] = -np.cos(a) * np.sin(b)
+        assert np.allclose(jac, expected)
+        grads = ParamShift(Estimator(circ), max_workers=2).jacobian(
+            [Hamiltonian.from_pauli_list([("Z1", 1)])], params
+        )
+        assert np.allclose(grads[:, 0], expected[:, 1])
+        assert np.allclose(
+            run_circ(circ, [1.0, -0.3]), [np.cos(1.0), np.cos(1.0) * np.cos(-0.3)]
+        )
+
+    @pytest.mark.skipif(
+        sys.platform == "darwin", reason="Avoid error on MacOS arm arch."
+    )
+    def test_vjp(self):
+        params = np.random.randn(3, 4)
+        dy = np.random.randn(3, 3)
+        for phase in [False, True]:
+            circ = QuantumCircuit(3)
+            circ.h(0)
+            circ.rx(0, 0.1)
+            circ.ry(1, 0.2)
+            circ.cnot(0, 2)
+            if phase:
+                # not supported by the adjoint method, estimated by parameter shift
+                circ.p(2, 0.3)
+            else:
+                circ << RZGate(2, 0.3).ctrl_by([1])
+            circ.rz(2, 0.4)
+            circ.cnot(2, 0)
+
+            expected = np.zeros(params.shape)
+            eps = 1e-6
+            for b in range(3):
+                for j in range(4):
+                    shift = np.zeros(4)
+                    shift[j] = eps
+                    diff = run_circ(circ, params[b] + shift) - run_circ(
+                        circ, params[b] - shift
+                    )
+                    expected[b, j] = diff @ dy[b] / (2 * eps)
+            assert np.allclose(vjp(circ, params, dy), expected, atol=1e-6)
+
+    def test_vjp_barrier(self):
+        circ = QuantumCircuit(3)
+        for layer in range(2):
+            for i in range(3):
+                circ.ry(i, 0.1 * i + layer)
+            circ.cnot(0, 1)
+            circ.cnot(1, 2)
+            circ.barrier([0, 1, 2])
+        params = np.random.randn(2, 6)
+        dy = np.random.randn(2, 3)
+        # the barriers do not disable the adjoint method
+        with patch("quafu.algorithms.gradients.vjp.ParamShift") as param_shift:
+            res = vjp(circ, params, dy)
+        param_shift.assert_not_called()
+
+        expected = np.zeros(params.shape)
+        eps = 1e-6
+        for b in range(2):
+            for j in range(6):
+                shift = np.zeros(6)
+                shift[j] = eps
+                diff = run_circ(circ, params[b] + shift) - run_circ(
+                    circ, params[b] - shift
+                )
+                expected[b, j] = diff @ dy[b] / (2 * eps)
+        assert np.allclose(res, expected, atol=1e-6)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import numpy as np
+import pytest
 from quafu.algorithms.hamiltonian import Hamiltonian, PauliOp
 
 M_0 = np.array(
@@ -290,3 +291,138 @@ class TestHamiltonian:
         h = Hamiltonian.from_pauli_list([("Z1 Y2", 1), ("Y0 Z2", 1), ("X1 Z2", 1)])
         m = h.get_matrix(3).toarray()
         assert np.array_equal(m, M_2)
+
+    def test_paulis_view(self):
+        h = Hamiltonian([PauliOp("Z0 Z1", 0.5), PauliOp("X2")])
+        assert isinstance(h.paulis, tuple)
+        assert [str(p) for p in (2 * h).paulis] == ["Z0*Z1", "2.0*X2"]
+        with pytest.raises(AttributeError):
+            h.paulis.append(PauliOp("Y0"))
+
+    def test_algebra(self):
+        a = Hamiltonian.from_pauli_list(
+            [("X0 Y1", 0.5), ("Z2", 1.0), ("Y0 Z1 X2", -2.0)]
+        )
+        b = Hamiltonian.from_pauli_list([("Z0 X1", 1.5j), ("Y2", 1.0), ("X0", 0.3)])
+        ma, mb = a.get_matrix(3).toarray(), b.get_matrix(3).toarray()
+        assert np.allclose((a * b).get_matrix(3).toarray(), ma @ mb)
+        assert np.allclose((a + b).get_matrix(3).toarray(), ma + mb)
+        assert np.allclose((a - 2 * b).get_matrix(3).toarray(), ma - 2 * mb)
+        assert np.allclose(a.commutator(b).get_matrix(3).toarray(), ma @ mb - mb @ ma)
+        assert len(a - a) == 0
+
+        # X0 X1 and Y0 Y1 commute, X0 and Y0 Y1 do not
+        c = Hamiltonian.from_pauli_list([("X0 X1", 1), ("X0", 1)])
+        d = Hamiltonian.from_pauli_list([("Y0 Y1", 1)])
+        assert c.commutes(d).tolist() == [[True], [False]]
+        assert str(PauliOp("X0") * PauliOp("X0")) == "I"
+        assert str(PauliOp("X0") * PauliOp("Y0")) == "1j*Z0"
+
+    def test_from_symplectic(self):
+        x = np.array([[1, 0, 1], [0, 0, 0]])
+        z = np.array([[1, 1, 0], [0, 1, 0]])
+        h = Hamiltonian.from_symplectic(x, z, [1.0, 2.0])
+        assert str(h) == "Y0*Z1*X2+2.0*Z1"
+
+        rng = np.random.default_rng(0)
+        num_terms, num_qubits = 100000, 70
+        x = rng.random((num_terms, num_qubits)) < 0.1
+        z = rng.random((num_terms, num_qubits)) < 0.1
+        h = Hamiltonian.from_symplectic(x, z, rng.random(num_terms))
+        assert h.x.shape == (num_terms, 2)
+        h = h + h
+        assert len(h) <= num_terms
+
+    @staticmethod
+    def reference_matrix(h, num_qubits, big_endian):
+        from functools import reduce
+
+        from quafu.algorithms.hamiltonian import PauliMats
+
+        expected = 0
+        for pauli in h.paulis:
+            ops = ["I"] * num_qubits
+            for p, q in zip(pauli.paulistr, pauli.pos):
+                ops[q] = p
+            if not big_endian:
+                ops = ops[::-1]
+            mats = [PauliMats[op].toarray() for op in ops]
+            expected = expected + pauli.coeff * reduce(np.kron, mats)
+        return expected
+
+    def test_matrix_and_operator(self):
+        rng = np.random.default_rng(1)
+        num_qubits = 4
+        paulis = []
+        for _ in range(12):
+            qubits = rng.choice(num_qubits, size=rng.integers(1, 4), replace=False)
+            label = " ".join(rng.choice(list("XYZ")) + str(q) for q in qubits)
+            paulis.append((label, rng.normal()))
+        h = Hamiltonian.from_pauli_list(paulis)
+
+        for big_endian in [False, True]:
+            m = h.get_matrix(num_qubits, big_endian).toarray()
+            assert np.allclose(m, self.reference_matrix(h, num_qubits, big_endian))
+
+            for precompute in [True, False]:
+                op = h.get_linear_operator(num_qubits, big_endian, precompute)
+                v = rng.normal(size=2**num_qubits) + 1j * rng.normal(
+                    size=2**num_qubits
+                )
+                assert np.allclose(op.matvec(v), m @ v)
+                assert np.allclose(op.rmatvec(v), m.conj().T @ v)
+
+    def test_matrix_many_terms(self):
+        # groups of more than 4 * num_qubits terms flipping the same qubits are
+        # summed by a Walsh-Hadamard transform
+        rng = np.random.default_rng(2)
+        num_qubits = 6
+        paulis = [
+            ("Z%d Z%d" % (i, j), rng.normal())
+            for i in range(num_qubits)
+            for j in range(i + 1, num_qubits)
+        ]
+        paulis += [
+            ("Z%d Z%d Z%d" % (i, j, k), rng.normal())
+            for i in range(num_qubits)
+            for j in range(i + 1, num_qubits)
+            for k in range(j + 1, num_qubits)
+        ]
+        for mask in range(2 ** (num_qubits - 1)):
+            zs = [" Z%d" % q for q in range(1, num_qubits) if (mask >> q - 1) & 1]
+            paulis.append(("Y0" + "".join(zs), rng.normal()))
+        h = Hamiltonian.from_pauli_list(paulis)
+
+        for big_endian in [False, True]:
+            expected = self.reference_matrix(h, num_qubits, big_endian)
+            assert np.allclose(h.get_matrix(num_qubits, big_endian).toarray(), expected)
+            v = rng.normal(size=2**num_qubits) + 1j * rng.normal(size=2**num_qubits)
+            for precompute in [True, False]:
+                op = h.get_linear_operator(num_qubits, big_endian, precompute)
+                assert np.allclose(op.matvec(v), expected @ v)
+
+    def test_group_commuting(self):
+        h = Hamiltonian.from_pauli_list(
+            [
+                ("X0 X1", 1.0),
+                ("Y0 Y1", 2.0),
+                ("Z0 Z1", 3.0),
+                ("Z0", 4.0),
+                ("X1", 5.0),
+                ("Z2", 6.0),
+            ]
+        )
+        groups = h.group_commuting()
+        assert len(groups) == 3
+        assert np.allclose(
+            Hamiltonian.concatenate(groups).simplify().get_matrix(3).toarray(),
+            h.get_matrix(3).toarray(),
+        )
+        for g in groups:
+            assert np.all(g.commutes(g))
+
+        # XX, YY and ZZ commute, but not qubit-wise
+        groups = h.group_commuting(qubitwise=False)
+        assert len(groups) == 2
+        for g in groups:
+            assert np.all(g.commutes(g))
@@ -167,6 +167,39 @@ class TestLayers:
         model = ModelQuantumNeuralNetworkNative(qnn)
         self._model_grad(model, batch_size)
 
+    def test_backprop(self):
+        """Compare backprop with the torch simulator to parameter shift"""
+        features = torch.randn(4, 3, requires_grad=True, dtype=torch.double)
+        dy = torch.randn(4, 2, dtype=torch.double)
+        grads = []
+        outputs = []
+        for diff_method in ["parameter-shift", "backprop"]:
+            out = TorchTransformer.execute(
+                self.circ, features, method="external", diff_method=diff_method
+            )
+            (grad,) = torch.autograd.grad(out, features, dy)
+            outputs.append(out.detach().numpy())
+            grads.append(grad.numpy())
+        assert np.allclose(outputs[0], outputs[1])
+        assert np.allclose(grads[0], grads[1])
+
+    def test_torch_layer_qnn_backprop(self):
+        weights = np.random.randn(2, 2)
+        entangle_layer = BasicEntangleLayers(weights, 2)
+        qnn = QuantumNeuralNetwork(2, entangle_layer, diff_method="backprop")
+        model = ModelQuantumNeuralNetworkNative(qnn)
+        self._model_grad(model, 1)
+
+        features = torch.randn(
+            256, qnn.num_parameters, requires_grad=True, dtype=torch.double
+        )
+        out = TorchTransformer.execute(
+            qnn, features, method="external", diff_method="backprop"
+        )
+        assert out.shape == (256, 2)
+        out.sum().backward()
+        assert features.grad.shape == features.shape
+
     @pytest.mark.skip(reason="github env doesn't have token")
     def test_torch_layer_qnn_real_machine(self):
         """Use QuantumNeuralNetwork ansatz"""
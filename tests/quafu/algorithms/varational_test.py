@@ -106,6 +106,9 @@ class TestVariational:
         print(grads_ps)
         print(grads_ad)
 
+        grads_threads = grad_para_shift(pq, hamil, max_workers=3)
+        assert np.allclose(grads_threads, grads_ps)
+
     def test_ctrl_adjoint(self):
         pq = QuantumCircuit(4)
         theta = [Parameter("theta_%d" % (i), i + 1) for i in range(4)]
@@ -20,6 +20,33 @@ import pytest
 from base import BaseTest
 
 from quafu import QuantumCircuit, simulate
+from quafu.algorithms.hamiltonian import Hamiltonian
+from quafu.elements.element_gates import (
+    CPGate,
+    CRZGate,
+    CXGate,
+    CYGate,
+    CZGate,
+    ISwapGate,
+    MCXGate,
+    PhaseGate,
+    RXGate,
+    RXXGate,
+    RYGate,
+    RYYGate,
+    RZGate,
+    RZZGate,
+    SXdgGate,
+    SXGate,
+    SYdgGate,
+    SYGate,
+    U3Gate,
+)
+from quafu.elements.noise import AmplitudeDamping
+from quafu.exceptions import QuafuError
+from quafu.simulators.clifford import canonicalize_clifford, clifford_angle, is_clifford
+from quafu.simulators.cost_model import choose_simulator
+from quafu.simulators.default_simulator import py_simulate, reduced_density_matrix
 
 
 class BellCircuits:
@@ -44,6 +71,16 @@ class BellCircuits:
         qc.h(2)
         return qc
 
+    @staticmethod
+    def ghz_measure_atlast(num):
+        """Return a GHZ circuit."""
+        qc = QuantumCircuit(num, num)
+        qc.h(0)
+        for i in range(num - 1):
+            qc.cx(i, i + 1)
+        qc.measure(list(range(num)))
+        return qc
+
     @staticmethod
     def bell_no_measure():
         """Return a Bell circuit."""
@@ -266,6 +303,55 @@ class TestSimulatorBasis(BaseTest):
 
     
 
+class TestPySimulator:
+    """Test numpy simulator"""
+
+    @staticmethod
+    def random_circuit(num, depth, seed=0):
+        rng = np.random.default_rng(seed)
+        qc = QuantumCircuit(num)
+        for _ in range(depth):
+            a, b, c = [int(q) for q in rng.choice(num, 3, replace=False)]
+            theta = float(rng.random())
+            gates = [
+                U3Gate(a, theta, 2 * theta, 3 * theta),
+                CXGate(a, b),
+                CRZGate(a, b, theta),
+                RXXGate(a, b, theta),
+                MCXGate([a, b], c),
+                ISwapGate(a, b),
+            ]
+            qc << gates[rng.integers(len(gates))]
+        return qc
+
+    def test_statevector(self):
+        qc = self.random_circuit(5, 50)
+        qc.barrier([0, 1])
+        psi = py_simulate(qc)
+        reference = simulate(qc, shots=0).get_statevector()
+        assert np.allclose(psi, reference)
+
+    def test_batch(self):
+        qc = self.random_circuit(4, 30, seed=1)
+        states = np.random.default_rng(2).normal(size=(3, 16)) + 0j
+        results = py_simulate(qc, states)
+        assert results.shape == (3, 16)
+        for state, result in zip(states, results):
+            reference = simulate(qc, psi=np.copy(state), shots=0).get_statevector()
+            assert np.allclose(result, reference)
+
+    def test_reduced_density_matrix(self):
+        qc = self.random_circuit(4, 30, seed=3)
+        psi = py_simulate(qc)
+        # the density matrix of the full state, with qubit 3 the most significant
+        rho = np.outer(psi, psi.conj()).reshape([2] * 8)
+        # trace out qubits 1 and 3, i.e. axes 2 and 0
+        rho = np.einsum("abcdaecf->bdef", rho).reshape(4, 4)
+        assert np.allclose(reduced_density_matrix(psi, [2, 0]), rho)
+        swap = np.eye(4)[[0, 2, 1, 3]]
+        assert np.allclose(reduced_density_matrix(psi, [0, 2]), swap @ rho @ swap)
+
+
 class TestCliffordSimulatorBasis(BaseTest):
     """Test C++ Clifford simulator"""
 
@@ -343,3 +429,265 @@ class TestCliffordSimulatorBasis(BaseTest):
         )
         counts = result.counts 
         self.assertDictAlmostEqual(counts, {"0101": 10})
+
+    def test_ghz_measure_atlast(self):
+        self.circuit = BellCircuits.ghz_measure_atlast(30)
+        shots = 100000
+        result = simulate(
+            qc=self.circuit, shots=shots, simulator="clifford"
+        )
+        counts = result.counts
+        assert set(counts.keys()) == {"0" * 30, "1" * 30}
+        assert sum(counts.values()) == shots
+        assert abs(counts["0" * 30] / shots - 0.5) < 0.01
+
+    def test_measure_atlast_subspace(self):
+        qc = QuantumCircuit(4, 4)
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.h(2)
+        qc.s(2)
+        qc.h(2)
+        qc.x(3)
+        qc.measure([0, 1, 2, 3], [3, 1, 2, 0])
+        shots = 20000
+        result = simulate(qc=qc, shots=shots, simulator="clifford")
+        counts = result.counts
+        assert set(counts.keys()) == {"1000", "1010", "1101", "1111"}
+        for value in counts.values():
+            assert abs(value / shots - 0.25) < 0.02
+
+    def test_pauli_expects(self):
+        qc = QuantumCircuit(3)
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.s(1)
+        qc.h(2)
+        qc.s(2)
+        qc.swap(0, 2)
+        hamiltonian = Hamiltonian.from_pauli_list(
+            [("Z1 Z2", 1.0), ("X1 Y2", 0.5), ("Y1 X2", -2.0), ("Y0", 1.0), ("X0", 1.0), ("Z0 X1", 1.0)]
+        )
+        expects = simulate(
+            qc=qc, shots=1, simulator="clifford", hamiltonian=hamiltonian
+        )["pauli_expects"]
+        reference = simulate(
+            qc=qc, shots=1, simulator="statevector", hamiltonian=hamiltonian
+        )["pauli_expects"]
+        assert np.allclose(expects, np.real(reference))
+        assert np.allclose(expects, [1.0, 0.5, -2.0, 1.0, 0.0, 0.0])
+
+        # terms beyond the qubits of the state
+        for label in ("Z4", "X20", "Y70"):
+            with pytest.raises(ValueError):
+                simulate(qc=qc, hamiltonian=Hamiltonian.from_pauli_list([("Z0", 1.0), (label, 1.0)]))
+
+    def test_ghz_pauli_expects(self):
+        num = 300
+        qc = QuantumCircuit(num)
+        qc.h(0)
+        for i in range(num - 1):
+            qc.cx(i, i + 1)
+        hamiltonian = Hamiltonian.from_pauli_list(
+            [("Z%d Z%d" % (i, i + 1), 1.0) for i in range(num - 1)]
+            + [(" ".join("X%d" % i for i in range(num)), 1.0), ("Z0", 1.0)]
+        )
+        expects = simulate(
+            qc=qc, shots=1, simulator="clifford", hamiltonian=hamiltonian
+        )["pauli_expects"]
+        assert expects == [1.0] * num + [0.0]
+
+    def test_clifford_angle(self):
+        assert clifford_angle(0.0) == 0
+        assert clifford_angle(np.pi / 2) == 1
+        assert clifford_angle(-np.pi / 2) == 3
+        assert clifford_angle(5 * np.pi) == 2
+        assert clifford_angle(np.pi / 2 + 1e-12) == 1
+        assert clifford_angle(np.pi / 4) is None
+
+    def test_canonicalize_clifford(self):
+        gates = [
+            SXGate(0),
+            SXdgGate(0),
+            SYGate(0),
+            SYdgGate(0),
+            CZGate(0, 1),
+            CYGate(1, 0),
+            ISwapGate(0, 1),
+            CPGate(0, 1, np.pi),
+            CPGate(1, 0, 2 * np.pi),
+        ]
+        for k in range(-2, 5):
+            theta = k * np.pi / 2
+            gates += [RXGate(1, theta), RYGate(0, theta), RZGate(1, theta), PhaseGate(0, theta)]
+            gates += [RXXGate(0, 1, theta), RYYGate(1, 0, theta), RZZGate(0, 1, theta)]
+            gates += [U3Gate(1, theta, np.pi / 2, -theta)]
+        for gate in gates:
+            qc = QuantumCircuit(2)
+            qc << gate
+            new_qc = canonicalize_clifford(qc)
+            assert new_qc is not None, gate.name
+            assert all(g.name.lower() in ("x", "y", "z", "h", "s", "sdg", "cx", "swap") for g in new_qc.gates)
+            psi = np.arange(1, 5) / np.sqrt(30) + 0j
+            expected = simulate(qc, psi=np.copy(psi), shots=0).get_statevector()
+            actual = simulate(new_qc, psi=np.copy(psi), shots=0).get_statevector()
+            overlap = np.vdot(expected, actual)
+            assert np.isclose(abs(overlap), 1.0), gate.name
+
+    def test_is_clifford(self):
+        qc = QuantumCircuit(2)
+        qc.h(0)
+        qc.rz(0, np.pi / 2)
+        qc.cx(0, 1)
+        qc.measure([0, 1])
+        assert is_clifford(qc)
+        qc.t(1)
+        assert not is_clifford(qc)
+        qc = QuantumCircuit(2)
+        qc.rx(0, 0.3)
+        assert not is_clifford(qc)
+        qc = QuantumCircuit(2)
+        qc.cp(0, 1, np.pi / 2)
+        assert not is_clifford(qc)
+
+    def test_auto(self):
+        num = 24
+        qc = QuantumCircuit(num)
+        qc.ry(0, np.pi / 2)
+        for i in range(num - 1):
+            qc.cx(i, i + 1)
+        qc.rzz(1, 2, -np.pi / 2)
+        qc.sdg(2)
+        qc.measure([0, 1, 2])
+        result = simulate(qc=qc, shots=1000, simulator="auto")
+        assert result["simulator"] == "clifford"
+        assert set(result.counts.keys()) == {"000", "111"}
+        assert result["cost_estimates"]["clifford"] < result["cost_estimates"]["statevector"]
+        qc = QuantumCircuit(3)
+        qc.rx(0, 0.1)
+        qc.cx(0, 1)
+        qc.measure([0, 1])
+        assert simulate(qc=qc, shots=10, simulator="auto")["simulator"] == "statevector"
+        psi = np.zeros(8, dtype=complex)
+        psi[0] = 1.0
+        qc = QuantumCircuit(3)
+        qc.h(0)
+        assert simulate(qc=qc, psi=psi, simulator="auto")["simulator"] == "statevector"
+
+        # the clifford simulator saves no state vector
+        ghz = QuantumCircuit(3)
+        ghz.h(0)
+        ghz.cx(0, 1)
+        ghz.cx(1, 2)
+        expected = np.zeros(8, dtype=complex)
+        expected[[0, 7]] = 1 / np.sqrt(2)
+        result = simulate(qc=ghz, simulator="auto")
+        assert result["simulator"] != "clifford"
+        assert np.allclose(result.get_statevector(), expected)
+        ghz.measure([0, 1, 2])
+        assert choose_simulator(ghz, shots=0)[0] != "clifford"
+
+    def test_auto_cost_model(self):
+        num = 12
+        qc = QuantumCircuit(num)
+        for _ in range(10):
+            for i in range(num - 1):
+                qc.h(i)
+                qc.cx(i, i + 1)
+        qc.t(0)
+        assert choose_simulator(qc)[0] == "hybrid"
+
+        qc = QuantumCircuit(40)
+        qc.h(0)
+        qc.cx(0, 39)
+        qc.measure([0, 39])
+        assert choose_simulator(qc)[0] == "clifford"
+        qc.t(0)
+        with pytest.raises(QuafuError):
+            choose_simulator(qc)
+
+        qc = QuantumCircuit(2)
+        qc.h(0)
+        qc << AmplitudeDamping(0, 0.1)
+        qc.measure([0, 1])
+        simulator, costs = choose_simulator(qc)
+        assert simulator == "noisy statevetor"
+        assert np.isinf(costs["statevector"]) and np.isinf(costs["clifford"])
+
+    def test_hybrid(self):
+        num = 6
+        qc = QuantumCircuit(num)
+        qc.h(0)
+        for i in range(num - 1):
+            qc.cx(i, i + 1)
+        qc.barrier(list(range(num)))
+        qc.s(2)
+        qc.ry(3, np.pi / 2)
+        qc.sx(4)
+        qc.t(1)
+        qc.h(1)
+        qc.rx(0, 0.3)
+        qc.cx(1, 5)
+        hamiltonian = Hamiltonian.from_pauli_list([("Z0 Z1", 1.0), ("X1 Y2", 0.5), ("X3", 1.0)])
+        result = simulate(qc=qc, simulator="hybrid", hamiltonian=hamiltonian)
+        reference = simulate(qc=qc, hamiltonian=hamiltonian)
+        assert result["simulator"] == "hybrid"
+        overlap = np.vdot(reference.get_statevector(), result.get_statevector())
+        assert np.isclose(abs(overlap), 1.0)
+        assert np.allclose(result["pauli_expects"], reference["pauli_expects"])
+
+        qc.measure([0, 1, 5])
+        counts = simulate(qc=qc, shots=1000, simulator="hybrid").counts
+        probs = simulate(qc=qc, shots=0).probabilities
+        for key, value in counts.items():
+            assert abs(value / 1000 - probs[int(key, 2)]) < 0.06
+
+        psi = np.zeros(2**num, dtype=complex)
+        psi[0] = 1.0
+        with pytest.raises(QuafuError):
+            simulate(qc=qc, psi=psi, simulator="hybrid")
+
+
+class TestSimuResultCounts:
+    """Test array backed counts of simulation results"""
+
+    def test_sparse_cbits(self):
+        qc = QuantumCircuit(3)
+        qc.x(1)
+        qc.measure([0, 1], [0, 3])
+        result = simulate(qc, shots=10)
+        outcomes, counts = result.get_counts_array()
+        assert list(outcomes) == [0b01] and list(counts) == [10]
+        assert result.counts == {"01": 10}
+
+    def test_helpers(self):
+        qc = QuantumCircuit(3)
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.x(2)
+        qc.measure([0, 1, 2])
+        shots = 4000
+        result = simulate(qc, shots=shots)
+        assert result._meta_data["counts"] is None
+        assert np.allclose(result.calc_marginal_probabilities([2]), [0, 1])
+        assert np.allclose(result.calc_expectations([[0, 1], [2], [0]]), [1, -1, 0], atol=0.1)
+        outcomes, probs = result.calc_counts_probabilities()
+        assert set(outcomes) == {0b001, 0b111}
+        assert np.isclose(np.sum(probs), 1)
+        assert set(result.counts) == {"001", "111"}
+
+        result["counts"] = {"001": 3, "111": 1}
+        assert np.allclose(result.calc_marginal_probabilities([0]), [0.75, 0.25])
+
+    def test_reduced_state(self):
+        qc = QuantumCircuit(4)
+        for q, theta in enumerate([0.3, 1.1, 2.0, 0.7]):
+            qc.ry(q, theta)
+        qc.cx(0, 2)
+        qc.cx(3, 1)
+        qc.measure([3, 0, 2], [0, 1, 2])
+        result = simulate(qc, shots=1)
+        psi = result.get_statevector()
+        rho = reduced_density_matrix(psi, [3, 0, 2])
+        assert np.allclose(result.calc_density_matrix(), rho)
+        assert np.allclose(result.probabilities, np.real(np.diag(rho)))
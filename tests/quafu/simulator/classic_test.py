@@ -181,4 +181,52 @@ class TestSimulatorClassic(BaseTest):
         count = result.counts
         self.assertAlmostEqual(probs[0], 1)
         self.assertAlmostEqual(probs[1], 0)
-        self.assertDictAlmostEqual(count, {"10": 10})
\ No newline at end of file
+        self.assertDictAlmostEqual(count, {"10": 10})
+    def test_clifford_cif(self):
+        for circuit, expected in [
+            (ClassicalCircuits.cif_true(), {"11": 10}),
+            (ClassicalCircuits.cif_false(), {"00": 10}),
+            (ClassicalCircuits.cif_list_true(), {"111": 10}),
+            (ClassicalCircuits.cif_list_false(), {"110": 10}),
+        ]:
+            result = simulate(qc=circuit, shots=10, simulator="clifford")
+            self.assertDictAlmostEqual(result.counts, expected)
+
+    def test_clifford_remeasure(self):
+        qc = QuantumCircuit(1, 1)
+        qc.x(0)
+        qc.measure([0], [0])
+        qc.x(0)
+        qc.measure([0], [0])
+        result = simulate(qc=qc, shots=10, simulator="clifford")
+        self.assertDictAlmostEqual(result.counts, {"0": 10})
+
+    def test_clifford_teleport_cif(self):
+        qc = QuantumCircuit(3, 3)
+        qc.x(0)
+        qc.h(1)
+        qc.cx(1, 2)
+        qc.cx(0, 1)
+        qc.h(0)
+        qc.measure([0, 1], [0, 1])
+        with qc.cif([1], 1):
+            qc.x(2)
+        with qc.cif([0], 1):
+            qc.z(2)
+        qc.measure([2], [2])
+        result = simulate(qc=qc, shots=200, simulator="auto")
+        assert result["simulator"] == "clifford"
+        assert all(key[2] == "1" for key in result.counts)
+
+    def test_clifford_cif_shots(self):
+        qc = QuantumCircuit(2, 2)
+        qc.h(0)
+        qc.measure([0], [0])
+        with qc.cif([0], 1):
+            qc.x(1)
+        qc.measure([1], [1])
+        shots = 2000
+        counts = simulate(qc=qc, shots=shots, simulator="clifford").counts
+        assert set(counts.keys()) == {"00", "11"}
+        assert sum(counts.values()) == shots
+        assert abs(counts["11"] / shots - 0.5) < 0.05
@@ -1,7 +1,11 @@
-from quafu.elements.noise import Depolarizing, AmplitudeDamping
-from quafu.elements.element_gates import HGate, XGate, CXGate
-from quafu.simulators.simulator import NoiseSVSimulator
-from quafu import QuantumCircuit
+import numpy as np
+import pytest
+from quafu.elements.noise import BitFlip, Dephasing, Depolarizing, AmplitudeDamping
+from quafu.elements.element_gates import HGate, XGate, CXGate, RXGate
+from quafu.exceptions import QuafuError
+from quafu.simulators.noise_model import NoiseModel, ReadoutErrorModel
+from quafu.simulators.simulator import NoisePlan, NoiseSVSimulator
+from quafu import QuantumCircuit, simulate
 from quafu.algorithms.hamiltonian import Hamiltonian, PauliOp
 
 
@@ -30,4 +34,196 @@ class NoisySimuTest:
         res.plot_probabilities(from_counts=True)
 
 if __name__ == "__main__":
-    NoisySimuTest().test_noise_simu()
\ No newline at end of file
+    NoisySimuTest().test_noise_simu()
+
+class TestCliffordNoisySimu:
+    def test_bitflip(self):
+        q = QuantumCircuit(1)
+        q << BitFlip(0, 0.2)
+        q.measure([0])
+        shots = 100000
+        counts = simulate(q, shots=shots, simulator="clifford").counts
+        assert abs(counts["1"] / shots - 0.2) < 0.01
+
+    def test_pauli_channels(self):
+        q = QuantumCircuit(3)
+        q << Depolarizing(0, 0.3)
+        q << HGate(1) << Dephasing(1, 0.1) << HGate(1)
+        q << XGate(2)
+        q.measure([0, 1, 2])
+        shots = 100000
+        counts = simulate(q, shots=shots, simulator="clifford").counts
+        assert all(key[2] == "1" for key in counts)
+        flip0 = sum(v for k, v in counts.items() if k[0] == "1") / shots
+        flip1 = sum(v for k, v in counts.items() if k[1] == "1") / shots
+        assert abs(flip0 - 0.2) < 0.01
+        assert abs(flip1 - 0.1) < 0.01
+
+    def test_noisy_ghz(self):
+        num = 300
+        q = QuantumCircuit(num)
+        q << HGate(0)
+        for i in range(num - 1):
+            q << CXGate(i, i + 1)
+        q << BitFlip(num - 1, 0.1)
+        q.measure([0, num - 1])
+        shots = 100000
+        counts = simulate(q, shots=shots, simulator="clifford").counts
+        assert set(counts.keys()) == {"00", "01", "10", "11"}
+        odd = (counts["01"] + counts["10"]) / shots
+        assert abs(odd - 0.1) < 0.01
+
+    def test_unsupported_channel(self):
+        q = QuantumCircuit(1)
+        q << AmplitudeDamping(0, 0.1)
+        q.measure([0])
+        with pytest.raises(QuafuError):
+            simulate(q, shots=10, simulator="clifford")
+
+    def test_bitflip_pauli_expects(self):
+        q = QuantumCircuit(2)
+        q << HGate(1)
+        q << BitFlip(0, 0.2)
+        q.measure([0, 1])
+        hamiltonian = Hamiltonian.from_pauli_list([("Z0", 1.0), ("X1", 1.0)])
+        expects = simulate(q, shots=20000, simulator="clifford", hamiltonian=hamiltonian)["pauli_expects"]
+        assert abs(expects[0] - 0.6) < 0.02
+        assert expects[1] == 1.0
+
+
+class TestNoiseSVSimulator:
+    def test_sample_choices(self):
+        q = QuantumCircuit(2)
+        q << BitFlip(0, 0.3) << HGate(1) << Dephasing(1, 0.5)
+        choices, shots = NoisePlan(q).sample_choices(1000)
+        assert choices.shape == (4, 2)
+        assert sum(shots) == 1000
+
+    def test_plan(self):
+        q = QuantumCircuit(2)
+        q << HGate(0) << CXGate(0, 1) << BitFlip(1, 0.3) << XGate(0) << AmplitudeDamping(0, 0.1) << HGate(1)
+        plan = NoisePlan(q)
+        assert [len(step) if isinstance(step, list) else step for step in plan.steps] == [2, 0, 1, 1, 1]
+        ops = plan.trajectory([0])
+        assert len(ops) == 3
+        assert [g.name for g in ops[0].instructions] == ["H", "CX", "X", "X"]
+        assert ops[1] is plan.channels[1]
+        assert [g.name for g in ops[2].instructions] == ["H"]
+
+    def test_grouped_shots(self):
+        q = QuantumCircuit(2)
+        q << XGate(0) << BitFlip(0, 0.2) << BitFlip(1, 0.1)
+        q.measure([0, 1])
+        shots = 20000
+        hamil = Hamiltonian([PauliOp("Z0"), PauliOp("Z1")])
+        res = NoiseSVSimulator().run(q, shots=shots, hamiltonian=hamil)
+        counts = res["counts"]
+        assert sum(counts.values()) == shots
+        flip0 = sum(v for k, v in counts.items() if k[0] == "0") / shots
+        flip1 = sum(v for k, v in counts.items() if k[1] == "1") / shots
+        assert abs(flip0 - 0.2) < 0.015
+        assert abs(flip1 - 0.1) < 0.015
+        assert abs(res["pauli_expects"][0] - (2 * flip0 - 1)) < 1e-9
+        assert abs(res["pauli_expects"][1] - (1 - 2 * flip1)) < 1e-9
+
+    def test_kraus_after_unitary_channels(self):
+        q = QuantumCircuit(2)
+        q << XGate(0) << Depolarizing(0, 0.1)
+        q << XGate(1) << AmplitudeDamping(1, 0.2)
+        q.measure([0, 1])
+        shots = 20000
+        counts = NoiseSVSimulator().run(q, shots=shots)["counts"]
+        decay = sum(v for k, v in counts.items() if k[1] == "0") / shots
+        flip = sum(v for k, v in counts.items() if k[0] == "0") / shots
+        assert abs(decay - 0.2) < 0.015
+        assert abs(flip - 0.2 / 3) < 0.015
+
+    def test_kraus_probabilities(self):
+        q = QuantumCircuit(2)
+        q << HGate(0) << RXGate(1, 1.0) << AmplitudeDamping(0, 0.3) << AmplitudeDamping(1, 0.3)
+        q.measure([0, 1])
+        shots = 20000
+        counts = NoiseSVSimulator().run(q, shots=shots)["counts"]
+        excited0 = sum(v for k, v in counts.items() if k[0] == "1") / shots
+        excited1 = sum(v for k, v in counts.items() if k[1] == "1") / shots
+        assert abs(excited0 - 0.5 * 0.7) < 0.015
+        assert abs(excited1 - np.sin(0.5) ** 2 * 0.7) < 0.015
+
+    def test_parallel_groups(self):
+        q = QuantumCircuit(3)
+        q << HGate(0) << CXGate(0, 1) << Depolarizing(1, 0.1) << RXGate(2, 0.3) << BitFlip(2, 0.1)
+        q.measure([0, 1, 2])
+        res = NoiseSVSimulator(max_workers=2).run(q, shots=1000)
+        assert sum(res["counts"].values()) == 1000
+
+
+class TestNoiseModel:
+    def test_channels(self):
+        model = NoiseModel()
+        model.add_channel("bitflip", (0.1,), gates=["cnot"])
+        model.add_channel("depolarizing", (0.2,), qubits=[1])
+        channels = model.channels(CXGate(0, 1))
+        assert [(c.name, c.pos, c.paras) for c in channels] == [
+            ("BitFlip", [0], [0.1]),
+            ("BitFlip", [1], [0.1]),
+            ("Depolarizing", [1], [0.2]),
+        ]
+        assert model.channels(HGate(0)) == []
+        assert model.channels(XGate(1))[0] is channels[2]
+        with pytest.raises(ValueError):
+            model.add_channel("hgate", (0.1,))
+        with pytest.raises(ValueError):
+            model.add_channel("bitflip", (0.1,), gates=["foo"])
+
+    def test_simulate(self):
+        q = QuantumCircuit(2)
+        q << XGate(0) << CXGate(0, 1)
+        q.measure([0, 1])
+        shots = 20000
+        for p in (0.1, 0.3):
+            model = NoiseModel().add_channel("bitflip", (p,), gates=["x"])
+            for simulator in ("noisy statevetor", "noisy statevector", "clifford"):
+                counts = simulate(q, shots=shots, simulator=simulator, noise_model=model).counts
+                assert abs(counts.get("00", 0) / shots - p) < 0.015
+        assert not q.noised
+        assert len(q.instructions) == 3
+
+    def test_statevector(self):
+        q = QuantumCircuit(1)
+        q << XGate(0)
+        model = NoiseModel().add_channel("bitflip", (0.1,))
+        with pytest.raises(QuafuError):
+            simulate(q, noise_model=model)
+        assert simulate(q, simulator="auto", noise_model=model)["simulator"] != "statevector"
+
+
+class TestReadoutError:
+    def test_qubit_error(self):
+        q = QuantumCircuit(3)
+        q << XGate(0) << XGate(2)
+        q.measure([0, 1, 2], [2, 0, 1])
+        shots = 50000
+        model = ReadoutErrorModel().add_qubit_error(0, 0.0, 0.1).add_qubit_error(1, 0.2, 0.0)
+        counts = simulate(q, shots=shots, readout_error=model).counts
+        assert sum(counts.values()) == shots
+        # cbit 0 is qubit 1, cbit 1 is qubit 2, cbit 2 is qubit 0
+        assert all(key[1] == "1" for key in counts)
+        assert abs(sum(v for k, v in counts.items() if k[0] == "1") / shots - 0.2) < 0.01
+        assert abs(sum(v for k, v in counts.items() if k[2] == "0") / shots - 0.1) < 0.01
+
+    def test_correlated_error(self):
+        # qubits 0 and 1 read 11 as 00 with probability 0.3
+        matrix = np.eye(4)
+        matrix[:, 3] = [0.3, 0, 0, 0.7]
+        model = ReadoutErrorModel().add_correlated_error([0, 1], matrix)
+        counts = model.apply({"110": 10000, "010": 5000}, {0: 0, 1: 1, 2: 2})
+        assert counts["010"] == 5000
+        assert abs(counts["000"] / 10000 - 0.3) < 0.02
+        assert counts["000"] + counts["110"] == 10000
+        with pytest.raises(ValueError):
+            ReadoutErrorModel().add_correlated_error([0, 1], np.ones((4, 4)))
+
+    def test_integer_counts(self):
+        model = ReadoutErrorModel().add_qubit_error(1, 1.0, 1.0)
+        # cbit 1 is the least significant bit
+        assert model.apply({0b01: 3, 0b10: 2}, {0: 0, 1: 1}) == {0b00: 3, 0b11: 2}
@@ -14,6 +14,7 @@
 
 import json
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 from quafu.backends.backends import Backend
@@ -21,7 +22,7 @@ from quafu.exceptions import ServerError
 from quafu.exceptions.quafu_error import CircuitError, CompileError
 from quafu.exceptions.user_error import UserError
 
-from quafu import QuantumCircuit, Task, User
+from quafu import ExecResult, QuantumCircuit, Task, User
 
 DUMMY_API_TOKEN = "123456"
 
@@ -100,3 +101,37 @@ class TestTask(unittest.TestCase):
         mock_post.return_value = DUMMY_TASK_RES_FAILED_COMPILE
         with self.assertRaisesRegex(CompileError, "Dummy compile error"):
             task.send(DUMMY_CIRC)
+
+    @patch("quafu.users.userapi.User.get_available_backends")
+    @patch("quafu.utils.client_wrapper.ClientWrapper.post")
+    def test_send_concurrently(self, mock_post, mock_get_available_backends):
+        mock_get_available_backends.return_value = DUMMY_BACKENDS
+        mock_post.return_value = MockSucceededResponse()
+        task = Task(user=User(api_token=DUMMY_API_TOKEN))
+        task.config(backend="ScQ-P10")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: task.send(DUMMY_CIRC, group="g"), range(64)))
+        self.assertEqual(len(task.get_history()["g"]), 64)
+
+
+class TestExecResult(unittest.TestCase):
+    def test_lazy_parsing(self):
+        res = ExecResult(DUMMY_TASK_RES_DATA)
+        self.assertIsNone(res._transpiled_circuit)
+        self.assertEqual(res.measures, {108: 0, 109: 1})
+        self.assertEqual(res.counts["00"], 998)
+        self.assertAlmostEqual(sum(res.probabilities.values()), 1)
+        self.assertIsNone(res._transpiled_circuit)
+        self.assertEqual(res.measures, res.transpiled_circuit.measures)
+
+    def test_swapped_cbits(self):
+        data = dict(DUMMY_TASK_RES_DATA)
+        data["openqasm"] = (
+            data["openqasm"].replace("c[0];", "c[2];").replace("c[1];", "c[0];")
+        )
+        data["openqasm"] = data["openqasm"].replace("creg c[2]", "creg c[3]")
+        data["res"] = "{'10': 3, '01': 1}"
+        res = ExecResult(data)
+        self.assertEqual(res.measures, {108: 2, 109: 0})
+        self.assertEqual(res.logicalq_res, {"01": 3, "10": 1})
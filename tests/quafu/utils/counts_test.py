@@ -0,0 +1,60 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from quafu.utils.basis import (
+    CountsArray,
+    get_baselocal,
+    measure_obs,
+    measure_obs_list,
+    popcount,
+    reduce_probs,
+)
+
+
+def reference_probs(bits, res):
+    probs = np.zeros(2 ** len(bits))
+    for key, value in res.items():
+        probs[int("".join(key[b] for b in bits), 2)] += value
+    return probs / np.sum(probs)
+
+
+def random_counts(num, outcomes, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 2, size=(outcomes, num))
+    return {"".join(map(str, key)): int(rng.integers(1, 100)) for key in keys}
+
+
+class TestCountsArray:
+    def test_popcount(self):
+        words = np.array([0, 1, 2**63 + 5, 2**64 - 1], dtype=np.uint64)
+        assert list(popcount(words)) == [0, 1, 3, 64]
+        assert np.allclose(get_baselocal(2), [1, -1, -1, 1])
+
+    def test_reduce_probs(self):
+        res = random_counts(6, 40)
+        for bits in ([0], [5, 1], [2, 3, 4]):
+            assert np.allclose(reduce_probs(bits, res), reference_probs(bits, res))
+
+    def test_expectations(self):
+        res = random_counts(130, 50, seed=1)
+        obslist = [[0], [3, 70], [1, 64, 129], list(range(0, 130, 7))]
+        counts = CountsArray.from_dict(res)
+        expects = measure_obs_list(obslist, counts)
+        for obs, expect in zip(obslist, expects):
+            probs = reference_probs(obs, res)
+            parity = np.array([(-1) ** bin(i).count("1") for i in range(len(probs))])
+            assert np.isclose(expect, probs @ parity)
+            assert np.isclose(measure_obs(obs, res), expect)
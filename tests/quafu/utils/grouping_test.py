@@ -0,0 +1,98 @@
+# (C) Copyright 2023 Beijing Academy of Quantum Information Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from quafu.algorithms.hamiltonian import PauliOp, diff, intersec, merge_paulis
+from quafu.exceptions import QuafuError
+from quafu.results.results import merge_measure
+from quafu.utils.grouping import (
+    STRATEGIES,
+    color_graph,
+    conflict_graph,
+    group_paulis,
+    pack_paulis,
+)
+
+
+def random_obslist(num, terms, k, seed=0):
+    rng = np.random.default_rng(seed)
+    obslist = []
+    for _ in range(terms):
+        pos = sorted(rng.choice(num, k, replace=False).tolist())
+        obslist.append(["".join(rng.choice(list("XYZ"), k)), pos])
+    return obslist
+
+
+def reference_conflict(obslist, qubitwise):
+    paulis = [dict(zip(obs[1], obs[0])) for obs in obslist]
+    adjacency = np.zeros((len(obslist), len(obslist)), dtype=bool)
+    for i, a in enumerate(paulis):
+        for j, b in enumerate(paulis):
+            differ = [q for q in a if q in b and a[q] != b[q]]
+            adjacency[i, j] = len(differ) > 0 if qubitwise else len(differ) % 2 == 1
+    return adjacency
+
+
+class TestGrouping:
+    def test_conflict_graph(self):
+        # qubits beyond 64 span several words
+        obslist = random_obslist(70, 60, 3) + [["XY", [0, 69]], ["XZ", [0, 69]]]
+        x, z = pack_paulis(obslist)
+        assert x.shape == (62, 2)
+        for qubitwise in (True, False):
+            assert np.array_equal(
+                conflict_graph(x, z, qubitwise), reference_conflict(obslist, qubitwise)
+            )
+
+    @pytest.mark.parametrize("strategy", STRATEGIES)
+    def test_coloring(self, strategy):
+        obslist = random_obslist(10, 300, 3)
+        x, z = pack_paulis(obslist)
+        adjacency = conflict_graph(x, z)
+        colors = color_graph(adjacency, strategy)
+        assert not np.any(adjacency & (colors[:, None] == colors[None, :]))
+        assert set(colors) == set(range(colors.max() + 1))
+        groups = group_paulis(x, z, strategy=strategy)
+        assert np.array_equal(np.sort(np.concatenate(groups)), np.arange(len(obslist)))
+
+    def test_unknown_strategy(self):
+        with pytest.raises(QuafuError):
+            color_graph(np.zeros((2, 2), dtype=bool), "random")
+
+    def test_merge_measure(self):
+        obslist = random_obslist(12, 500, 4, seed=1)
+        measure_basis, targlist = merge_measure(obslist)
+        for obs, mi in zip(obslist, targlist):
+            basis = dict(zip(measure_basis[mi][1], measure_basis[mi][0]))
+            assert all(basis[q] == p for p, q in zip(obs[0], obs[1]))
+        assert len(measure_basis) <= len(merge_measure(obslist, "sequential")[0])
+
+        measure_basis, targlist = merge_measure(
+            [["X", [0]], ["Z", [1]], ["ZX", [1, 0]], ["Y", [0]]]
+        )
+        assert len(measure_basis) == 2
+        assert targlist[0] == targlist[2] != targlist[3]
+        assert measure_basis[targlist[0]] == ["XZ", [0, 1]]
+
+    def test_merge_paulis(self):
+        paulis = [PauliOp("X0 Z1"), PauliOp("Z1 Y2"), PauliOp("Y2"), PauliOp("X1")]
+        measure_basis, targlist = merge_paulis(paulis)
+        assert len(measure_basis) == 2
+        assert targlist[0] == targlist[1] != targlist[3]
+        assert str(measure_basis[targlist[0]]) == "X0*Z1*Y2"
+
+    def test_legacy_helpers(self):
+        assert intersec([0, 2, 3, 2], [2, 5, 0]) == ([0, 2, 2], [0, 1, 3], [2, 0, 0])
+        assert diff([0, 2, 3, 4], [2, 5, 0]) == ([3, 4], [2, 3])